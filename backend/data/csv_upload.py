@@ -1,8 +1,12 @@
+import io
+import os
 import hashlib
 import random
 import polars as pl
 from datetime import datetime
 from pathlib import Path
+from typing import BinaryIO, Callable
+from postgrest.exceptions import APIError
 from supabase.client import Client
 from data.schemas.df_schemas import GAME_DATA_MAP
 
@@ -10,6 +14,18 @@ from data.schemas.df_schemas import GAME_DATA_MAP
 TABLE_GAMES = 'games'
 TABLE_UPLOADED_CSVS = 'uploaded_csvs'
 
+# games_pkey columns; rows already present under this key are skipped, not re-inserted
+GAMES_CONFLICT_COLUMNS = 'game_code,date_started,date_ended,player_id,profit,tips,total_tips'
+
+RPC_ALLOCATE_UNKNOWN_PLAYER_IDS = 'allocate_unknown_player_ids'
+
+CSV_UPLOAD_BATCH_SIZE = int(os.getenv('CSV_UPLOAD_BATCH_SIZE', '1000'))
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+# A CSV to ingest: a file on disk, its bytes, or a binary file object (e.g. a spooled upload)
+CsvSource = str | Path | bytes | BinaryIO
+
 
 def normalize_aggregated_csv(df: pl.DataFrame) -> pl.DataFrame:
     """Normalize aggregated CSV schema to match the standard per-game schema."""
@@ -67,26 +83,13 @@ def normalize_aggregated_csv(df: pl.DataFrame) -> pl.DataFrame:
     return df
 
 
-def _get_next_unknown_counter(supabase: Client) -> int:
-    """Query the games table for the highest existing #UNKN ID and return the next number."""
-    try:
-        response = (
-            supabase.table(TABLE_GAMES)
-            .select('player_id')
-            .like('player_id', '#UNKN%')
-            .execute()
-        )
-        if response.data:
-            max_num = 0
-            for row in response.data:
-                pid = row['player_id']
-                suffix = pid.replace('#UNKN', '')
-                if suffix.isdigit():
-                    max_num = max(max_num, int(suffix))
-            return max_num + 1
-        return 1
-    except Exception:
-        return 1
+def allocate_unknown_player_ids(supabase: Client, count: int) -> int:
+    """Reserve count consecutive #UNKN numbers in one round trip and return the first.
+
+    Errors propagate: guessing a number could reuse an ID another upload already holds.
+    """
+    response = supabase.rpc(RPC_ALLOCATE_UNKNOWN_PLAYER_IDS, {'block_size_param': count}).execute()
+    return int(response.data)
 
 
 def rename_unknown_players(df: pl.DataFrame, supabase: Client) -> pl.DataFrame:
@@ -100,7 +103,7 @@ def rename_unknown_players(df: pl.DataFrame, supabase: Client) -> pl.DataFrame:
     if not any(mask):
         return df
 
-    counter = _get_next_unknown_counter(supabase)
+    counter = allocate_unknown_player_ids(supabase, sum(mask))
 
     new_names = list(player_names)
     player_ids = df.get_column('ID').to_list()
@@ -120,10 +123,43 @@ def rename_unknown_players(df: pl.DataFrame, supabase: Client) -> pl.DataFrame:
     return df
 
 
-def calculate_csv_hash(csv_path: str | Path) -> str:
-    with open(csv_path, 'rb') as f:
-        file_hash = hashlib.sha256(f.read()).hexdigest()
-    return file_hash
+def calculate_csv_hash(csv_source: CsvSource) -> str:
+    """SHA-256 of the CSV bytes, read in chunks; file objects are rewound afterwards."""
+    hasher = hashlib.sha256()
+    if isinstance(csv_source, bytes):
+        hasher.update(csv_source)
+    elif isinstance(csv_source, (str, Path)):
+        with open(csv_source, 'rb') as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+                hasher.update(chunk)
+    else:
+        csv_source.seek(0)
+        for chunk in iter(lambda: csv_source.read(_HASH_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+        csv_source.seek(0)
+    return hasher.hexdigest()
+
+
+def detect_separator(csv_source: CsvSource) -> str:
+    """';' when the header line uses semicolons and no commas, otherwise ','."""
+    if isinstance(csv_source, bytes):
+        header = csv_source.split(b'\n', 1)[0]
+    elif isinstance(csv_source, (str, Path)):
+        with open(csv_source, 'rb') as f:
+            header = f.readline()
+    else:
+        csv_source.seek(0)
+        header = csv_source.readline()
+        csv_source.seek(0)
+    return ';' if b';' in header and b',' not in header else ','
+
+
+def read_csv_source(csv_source: CsvSource) -> pl.DataFrame:
+    """Parse the CSV once, with the separator picked from its header line."""
+    separator = detect_separator(csv_source)
+    if isinstance(csv_source, bytes):
+        csv_source = io.BytesIO(csv_source)
+    return pl.read_csv(csv_source, separator=separator)
 
 
 def is_csv_uploaded(supabase: Client, csv_hash: str) -> bool:
@@ -134,7 +170,14 @@ def is_csv_uploaded(supabase: Client, csv_hash: str) -> bool:
         return False
 
 
-def mark_csv_as_uploaded(supabase: Client, csv_hash: str, filename: str, row_count: int, game_code: str | None = None):
+def mark_csv_as_uploaded(
+    supabase: Client,
+    csv_hash: str,
+    filename: str,
+    row_count: int,
+    game_code: str | None = None,
+    date_range: tuple[str, str] | None = None,
+):
     try:
         record = {
             'csv_hash': csv_hash,
@@ -144,6 +187,9 @@ def mark_csv_as_uploaded(supabase: Client, csv_hash: str, filename: str, row_cou
         }
         if game_code is not None:
             record['game_code'] = game_code
+        if date_range is not None:
+            # Read by the API to invalidate cached reports covering these dates
+            record['min_date_started'], record['max_date_ended'] = date_range
         supabase.table(TABLE_UPLOADED_CSVS).insert(record).execute()
     except Exception as e:
         pass
@@ -151,19 +197,27 @@ def mark_csv_as_uploaded(supabase: Client, csv_hash: str, filename: str, row_cou
 
 def upload_csv_to_games(
     supabase: Client,
-    csv_path: str | Path,
+    csv_source: CsvSource,
     filename: str | None = None,
     overrides: dict | None = None,
+    batch_size: int | None = None,
+    progress: Callable[[dict], None] | None = None,
 ) -> dict:
-
-    csv_path = Path(csv_path)
-    if not csv_path.exists():
-        raise FileNotFoundError(f"CSV file not found: {csv_path}")
+    """Ingest one CSV, given as a path, its bytes, or a seekable binary file object.
+
+    progress, if given, is called with running counts once the CSV is parsed and after every batch.
+    """
+
+    if isinstance(csv_source, (str, Path)):
+        csv_source = Path(csv_source)
+        if not csv_source.exists():
+            raise FileNotFoundError(f"CSV file not found: {csv_source}")
+        if filename is None:
+            filename = csv_source.name
+    elif filename is None:
+        raise ValueError('filename is required when uploading from bytes or a file object')
     
-    if filename is None:
-        filename = csv_path.name
-    
-    csv_hash = calculate_csv_hash(csv_path)
+    csv_hash = calculate_csv_hash(csv_source)
     
     if is_csv_uploaded(supabase, csv_hash):
         return {
@@ -174,10 +228,7 @@ def upload_csv_to_games(
             'message': f"CSV '{filename}' has already been uploaded"
         }
     
-    # Try comma first; if it produces a single column, retry with semicolon
-    df = pl.read_csv(csv_path)
-    if df.width == 1 and ';' in df.columns[0]:
-        df = pl.read_csv(csv_path, separator=';')
+    df = read_csv_source(csv_source)
     df = normalize_aggregated_csv(df)
 
     # Apply any caller-provided overrides (e.g. specific GameCode, dates, GameType)
@@ -266,32 +317,65 @@ def upload_csv_to_games(
     
     rows_inserted = 0
     rows_skipped = 0
+    row_errors = []
+    
+    def insert_rows(rows: list[dict]) -> int:
+        response = supabase.table(TABLE_GAMES).upsert(
+            rows,
+            on_conflict=GAMES_CONFLICT_COLUMNS,
+            ignore_duplicates=True,
+            count='exact',
+        ).execute()
+        return response.count if response.count is not None else len(response.data or [])
     
-    batch_size = 100
+    # INSERT ... ON CONFLICT (games_pkey) DO NOTHING: one request per batch whether or not it
+    # overlaps existing games. Only newly inserted rows are counted (and returned), and only
+    # those reach player_ledger/ledger_totals through the games_ledger_* triggers.
+    # A batch the database rejects is retried row by row so one bad row cannot take the
+    # rest with it; network errors still propagate.
+    batch_size = batch_size or CSV_UPLOAD_BATCH_SIZE
+    counts = {
+        'rows_parsed': len(records),
+        'batches_total': -(-len(records) // batch_size),
+        'batches_inserted': 0,
+        'rows_inserted': 0,
+        'rows_skipped': 0,
+    }
+    if progress:
+        progress(dict(counts))
     for i in range(0, len(records), batch_size):
         batch = records[i:i + batch_size]
         try:
-            response = supabase.table(TABLE_GAMES).insert(batch).execute()
-            rows_inserted += len(response.data) if response.data else 0
-        except Exception as e:
-            error_str = str(e).lower()
-            if 'duplicate' in error_str or 'unique' in error_str or 'primary key' in error_str:
-                for record in batch:
-                    try:
-                        supabase.table(TABLE_GAMES).insert(record).execute()
-                        rows_inserted += 1
-                    except Exception:
-                        rows_skipped += 1
-            else:
-                raise
+            inserted = insert_rows(batch)
+            rows_inserted += inserted
+            rows_skipped += len(batch) - inserted
+        except APIError:
+            for row_number, record in enumerate(batch, i + 1):
+                try:
+                    inserted = insert_rows([record])
+                    rows_inserted += inserted
+                    rows_skipped += 1 - inserted
+                except APIError as e:
+                    row_errors.append({'row': row_number, 'player_id': record.get('player_id'), 'error': e.message or str(e)})
+        if progress:
+            counts.update(batches_inserted=counts['batches_inserted'] + 1, rows_inserted=rows_inserted, rows_skipped=rows_skipped)
+            progress(dict(counts))
     
     game_code = first_row_values.get('GameCode')
-    mark_csv_as_uploaded(supabase, csv_hash, filename, len(records), game_code=game_code)
+    date_range = (df_final.get_column('date_started').min(), df_final.get_column('date_ended').max())
+    mark_csv_as_uploaded(supabase, csv_hash, filename, len(records), game_code=game_code, date_range=date_range)
     
+    message = f"Successfully uploaded {rows_inserted} rows from '{filename}'"
+    if row_errors:
+        message += f"; {len(row_errors)} rows failed"
     return {
         'success': True,
         'rows_processed': len(records),
         'rows_inserted': rows_inserted,
         'rows_skipped': rows_skipped,
-        'message': f"Successfully uploaded {rows_inserted} rows from '{filename}'"
+        'rows_failed': len(row_errors),
+        'row_errors': row_errors,
+        'date_started_min': date_range[0],
+        'date_ended_max': date_range[1],
+        'message': message
     }
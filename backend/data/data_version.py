@@ -0,0 +1,50 @@
+import os
+import time
+import asyncio
+from supabase.client import Client
+from data.db import run_query
+
+RPC_GET_DATA_VERSION = 'get_data_version'
+
+# Bursts of report requests (several tabs refreshing together) share one version lookup
+DATA_VERSION_TTL_SECONDS = float(os.getenv('DATA_VERSION_TTL_SECONDS', '5'))
+
+
+class DataVersion:
+    """Version of the report inputs: uploads, games and reference tables (see get_data_version)."""
+
+    def __init__(self, supabase: Client, ttl_seconds: float = DATA_VERSION_TTL_SECONDS):
+        self._supabase = supabase
+        self._ttl_seconds = ttl_seconds
+        self._lock = asyncio.Lock()
+        self._components: dict | None = None
+        self._fetched_at = 0.0
+        self.lookups = 0
+        self.fetches = 0
+
+    def _fresh(self) -> bool:
+        return self._components is not None and time.monotonic() - self._fetched_at < self._ttl_seconds
+
+    async def components(self) -> dict:
+        """{'token', 'uploads_max_id', 'uploads_count', 'reference'} as returned by the RPC."""
+        self.lookups += 1
+        if self._fresh():
+            return self._components
+        async with self._lock:
+            if self._fresh():
+                return self._components
+            response = await run_query(self._supabase.rpc(RPC_GET_DATA_VERSION, {}))
+            self._components = dict(response.data)
+            self._fetched_at = time.monotonic()
+            self.fetches += 1
+            return self._components
+
+    async def get(self) -> str:
+        return (await self.components())['token']
+
+    def invalidate(self):
+        """Drop the cached version after a write made through this process."""
+        self._components = None
+
+    def stats(self) -> dict:
+        return {'lookups': self.lookups, 'fetches': self.fetches, 'ttl_seconds': self._ttl_seconds}
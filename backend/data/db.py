@@ -0,0 +1,34 @@
+import os
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+SUPABASE_IO_WORKERS = int(os.getenv('SUPABASE_IO_WORKERS', '16'))
+
+# The supabase-py client is synchronous; every PostgREST round trip runs on this
+# bounded pool so a slow query never stalls the event loop.
+_executor = ThreadPoolExecutor(max_workers=SUPABASE_IO_WORKERS, thread_name_prefix='supabase-io')
+
+
+async def run_sync(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking callable on the Supabase I/O pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def run_query(query) -> Any:
+    """Execute a PostgREST query/RPC builder off the event loop."""
+    return await run_sync(query.execute)
+
+
+async def gather_queries(*queries) -> list[Any]:
+    """Execute independent query builders concurrently, preserving argument order."""
+    return list(await asyncio.gather(*(run_query(q) for q in queries)))
+
+
+def shutdown_executor():
+    _executor.shutdown(wait=True, cancel_futures=True)
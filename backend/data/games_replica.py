@@ -0,0 +1,361 @@
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+from pathlib import Path
+import pytz
+import polars as pl
+from supabase.client import Client
+
+backend_dir = Path(__file__).parent.parent
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+from data.db import run_query, run_sync
+from data.csv_upload import TABLE_UPLOADED_CSVS
+from data.games_stream import iter_games_pages, fetch_all_games
+
+logger = logging.getLogger(__name__)
+
+# Unset disables the replica and every reader falls back to PostgREST.
+# One replica directory per process: the API runs a single uvicorn worker.
+GAMES_REPLICA_DIR = os.getenv('GAMES_REPLICA_DIR', '')
+
+# How often a read may poll uploaded_csvs for uploads made by other processes (email ingestor)
+GAMES_REPLICA_SYNC_INTERVAL_SECONDS = float(os.getenv('GAMES_REPLICA_SYNC_INTERVAL_SECONDS', '30'))
+
+ACCOUNTING_TZ = 'America/Chicago'
+
+# Game codes refetched per get_games_page call during an incremental sync
+_SYNC_GAME_CODE_CHUNK = 200
+_UPLOADS_PAGE_SIZE = 1000
+
+_TIMESTAMP_COLUMNS = ('date_started', 'date_ended', 'created_at')
+
+GAMES_REPLICA_SCHEMA = {
+    'rank': pl.Int64,
+    'game_code': pl.Utf8,
+    'club_code': pl.Utf8,
+    'player_id': pl.Utf8,
+    'player_name': pl.Utf8,
+    'date_started': pl.Datetime('us', 'UTC'),
+    'date_ended': pl.Datetime('us', 'UTC'),
+    'game_type': pl.Utf8,
+    'big_blind': pl.Float64,
+    'profit': pl.Float64,
+    'tips': pl.Float64,
+    'buy_in': pl.Float64,
+    'total_tips': pl.Float64,
+    'hands': pl.Int64,
+    'created_at': pl.Datetime('us', 'UTC'),
+}
+
+
+def accounting_week(ts: datetime) -> date:
+    """Thursday (America/Chicago) that starts the accounting week containing ts."""
+    local = ts.astimezone(pytz.timezone(ACCOUNTING_TZ)).date()
+    return local - timedelta(days=(local.weekday() - 3) % 7)
+
+
+def _as_utc(value: date | datetime | None) -> datetime | None:
+    if value is None or isinstance(value, datetime):
+        return value
+    # PostgREST compares a bare date against timestamptz as midnight UTC; match that
+    return datetime(value.year, value.month, value.day, tzinfo=pytz.UTC)
+
+
+def rows_to_frame(rows: list[dict]) -> pl.DataFrame:
+    """Typed games frame from PostgREST rows, with the accounting week of each game."""
+    if not rows:
+        return pl.DataFrame(schema={**GAMES_REPLICA_SCHEMA, 'week': pl.Date})
+
+    df = pl.DataFrame(rows, infer_schema_length=None)
+    df = df.select([
+        (
+            pl.col(col).str.to_datetime('%Y-%m-%dT%H:%M:%S%.f%:z', time_unit='us', time_zone='UTC')
+            if col in _TIMESTAMP_COLUMNS
+            else pl.col(col).cast(dtype)
+        ) if col in df.columns else pl.lit(None, dtype=dtype).alias(col)
+        for col, dtype in GAMES_REPLICA_SCHEMA.items()
+    ])
+    local_started = pl.col('date_started').dt.convert_time_zone(ACCOUNTING_TZ)
+    return df.with_columns(
+        (local_started.dt.date() - pl.duration(days=(local_started.dt.weekday() - 4) % 7)).alias('week')
+    )
+
+
+def to_api_rows(lf: pl.LazyFrame) -> pl.LazyFrame:
+    """Render timestamps as the ISO strings PostgREST returns so replica rows are drop-in replacements."""
+    names = lf.collect_schema().names() if hasattr(lf, 'collect_schema') else lf.columns
+    return lf.with_columns([
+        pl.col(col).dt.strftime('%Y-%m-%dT%H:%M:%S%.f%:z' if col == 'created_at' else '%Y-%m-%dT%H:%M:%S%:z')
+        for col in _TIMESTAMP_COLUMNS if col in names
+    ])
+
+
+class GamesReplica:
+    """On-disk Parquet copy of the games table, one file per accounting week.
+
+    The replica is bootstrapped from a full keyset scan of games, then kept current by
+    watching uploaded_csvs: every new upload names its game_code, and each affected game is
+    refetched and rewritten into its week file. Games changed outside an upload (SQL editor)
+    are only picked up by a rebuild.
+    """
+
+    def __init__(self, supabase: Client, root: str | Path, sync_interval_seconds: float = GAMES_REPLICA_SYNC_INTERVAL_SECONDS):
+        self._supabase = supabase
+        self._root = Path(root)
+        self._games_dir = self._root / 'games'
+        self._state_path = self._root / 'state.json'
+        self._sync_interval_seconds = sync_interval_seconds
+        self._lock = asyncio.Lock()
+        self._state = self._load_state()
+        self._last_check = 0.0
+        self.syncs = 0
+        self.games_refreshed = 0
+        self.last_sync_seconds: float | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self._state.get('bootstrapped_at') is not None
+
+    def _load_state(self) -> dict:
+        try:
+            return json.loads(self._state_path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        tmp_path = self._state_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self._state))
+        os.replace(tmp_path, self._state_path)
+
+    def _week_path(self, week: date, games_dir: Path | None = None) -> Path:
+        return (games_dir or self._games_dir) / f'week={week.isoformat()}.parquet'
+
+    def _week_files(self, start_week: date | None = None, end_week: date | None = None) -> list[Path]:
+        """Partition pruning: week files whose accounting week can hold rows in the range."""
+        files = []
+        for path in sorted(self._games_dir.glob('week=*.parquet')):
+            week = date.fromisoformat(path.stem.split('=', 1)[1])
+            if start_week is not None and week < start_week:
+                continue
+            if end_week is not None and week > end_week:
+                continue
+            files.append(path)
+        return files
+
+    def _write_week(self, week: date, df: pl.DataFrame, games_dir: Path | None = None):
+        path = self._week_path(week, games_dir)
+        if df.height == 0:
+            path.unlink(missing_ok=True)
+            return
+        # Sorted by start time so row-group statistics prune date filters within a week
+        df = df.sort(['date_started', 'game_code', 'player_id'])
+        tmp_path = path.with_suffix('.tmp')
+        df.write_parquet(tmp_path, compression='zstd', statistics=True)
+        os.replace(tmp_path, path)
+
+    async def _latest_upload_id(self) -> int:
+        response = await run_query(
+            self._supabase.table(TABLE_UPLOADED_CSVS).select('id').order('id', desc=True).limit(1)
+        )
+        return int(response.data[0]['id']) if response.data else 0
+
+    async def rebuild(self) -> dict:
+        """Replace the replica with a full copy of games."""
+        async with self._lock:
+            started = time.monotonic()
+            # Watermark first: uploads landing during the scan are replayed by the next sync
+            watermark = await self._latest_upload_id()
+
+            pages = []
+            async for page in iter_games_pages(self._supabase):
+                pages.append(await run_sync(rows_to_frame, page))
+            df = pl.concat(pages) if pages else rows_to_frame([])
+
+            staging_dir = self._root / 'games.staging'
+            await run_sync(self._write_all_weeks, df, staging_dir)
+
+            old_dir = self._root / 'games.old'
+            shutil.rmtree(old_dir, ignore_errors=True)
+            if self._games_dir.exists():
+                os.replace(self._games_dir, old_dir)
+            os.replace(staging_dir, self._games_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+            now = datetime.now(pytz.UTC).isoformat()
+            self._state = {'last_upload_id': watermark, 'bootstrapped_at': now, 'synced_at': now}
+            self._save_state()
+            self._last_check = time.monotonic()
+            self.last_sync_seconds = round(time.monotonic() - started, 3)
+            logger.info('Games replica rebuilt: %s rows in %ss', df.height, self.last_sync_seconds)
+            return {'rows': df.height, 'weeks': len(self._week_files()), 'seconds': self.last_sync_seconds}
+
+    def _write_all_weeks(self, df: pl.DataFrame, games_dir: Path):
+        shutil.rmtree(games_dir, ignore_errors=True)
+        games_dir.mkdir(parents=True)
+        for week in df.get_column('week').unique().to_list():
+            self._write_week(week, df.filter(pl.col('week') == week).drop('week'), games_dir)
+
+    async def sync(self) -> dict:
+        """Refetch the games named by uploads newer than the watermark and rewrite their weeks."""
+        if not self.ready:
+            return await self.rebuild()
+
+        async with self._lock:
+            started = time.monotonic()
+            last_upload_id = self._state.get('last_upload_id', 0)
+            game_codes = set()
+            while True:
+                response = await run_query(
+                    self._supabase.table(TABLE_UPLOADED_CSVS)
+                    .select('id,game_code')
+                    .gt('id', last_upload_id)
+                    .order('id')
+                    .limit(_UPLOADS_PAGE_SIZE)
+                )
+                uploads = response.data or []
+                for upload in uploads:
+                    last_upload_id = max(last_upload_id, int(upload['id']))
+                    if upload.get('game_code'):
+                        game_codes.add(str(upload['game_code']))
+                if len(uploads) < _UPLOADS_PAGE_SIZE:
+                    break
+
+            if game_codes:
+                codes = sorted(game_codes)
+                rows = []
+                for i in range(0, len(codes), _SYNC_GAME_CODE_CHUNK):
+                    rows.extend(await fetch_all_games(self._supabase, game_codes=codes[i:i + _SYNC_GAME_CODE_CHUNK]))
+                await run_sync(self._replace_games, codes, rows_to_frame(rows))
+                self.games_refreshed += len(codes)
+
+            self._state['last_upload_id'] = last_upload_id
+            self._state['synced_at'] = datetime.now(pytz.UTC).isoformat()
+            self._save_state()
+            self._last_check = time.monotonic()
+            self.syncs += 1
+            self.last_sync_seconds = round(time.monotonic() - started, 3)
+            return {'games': len(game_codes), 'last_upload_id': last_upload_id, 'seconds': self.last_sync_seconds}
+
+    def _replace_games(self, game_codes: list[str], fresh: pl.DataFrame):
+        """Drop every stored row of these games and write their current rows, touching only affected weeks."""
+        self._games_dir.mkdir(parents=True, exist_ok=True)
+        weeks = set(fresh.get_column('week').unique().to_list())
+        # A game may already be stored under another week (dates edited) or no longer exist at all
+        for path in self._week_files():
+            stored_codes = pl.read_parquet(path, columns=['game_code']).get_column('game_code')
+            if stored_codes.is_in(game_codes).any():
+                weeks.add(date.fromisoformat(path.stem.split('=', 1)[1]))
+
+        for week in weeks:
+            path = self._week_path(week)
+            kept = (
+                pl.read_parquet(path).filter(~pl.col('game_code').is_in(game_codes))
+                if path.exists() else rows_to_frame([]).drop('week')
+            )
+            week_rows = fresh.filter(pl.col('week') == week).drop('week')
+            self._write_week(week, pl.concat([kept, week_rows]))
+
+    async def ensure_fresh(self):
+        """Sync when new uploads have landed since the last check; polls at most once per interval."""
+        if not self.ready or time.monotonic() - self._last_check < self._sync_interval_seconds:
+            return
+        self._last_check = time.monotonic()
+        if await self._latest_upload_id() > self._state.get('last_upload_id', 0):
+            await self.sync()
+
+    def request_sync(self):
+        """Make the next read check uploaded_csvs instead of waiting out the poll interval."""
+        self._last_check = 0.0
+
+    def scan(
+        self,
+        start_date: date | datetime | None = None,
+        end_date: date | datetime | None = None,
+        club_code: str | None = None,
+        player_ids: list[str] | None = None,
+        columns: list[str] | None = None,
+    ) -> pl.LazyFrame:
+        """Lazy scan with the same filters as fetch_all_games; only weeks that can match are opened.
+
+        Filters and the column projection are pushed down into the Parquet reader.
+        """
+        start = _as_utc(start_date)
+        end = _as_utc(end_date)
+
+        files = self._week_files(
+            accounting_week(start) if start is not None else None,
+            accounting_week(end) if end is not None else None,
+        )
+        if not files:
+            lf = rows_to_frame([]).drop('week').lazy()
+        else:
+            lf = pl.scan_parquet([str(f) for f in files])
+
+        if start is not None:
+            lf = lf.filter(pl.col('date_started') >= start)
+        if end is not None:
+            lf = lf.filter(pl.col('date_ended') <= end)
+        if club_code is not None:
+            lf = lf.filter(pl.col('club_code') == club_code)
+        if player_ids is not None:
+            lf = lf.filter(pl.col('player_id').is_in(player_ids))
+        if columns is not None:
+            lf = lf.select(columns)
+        return to_api_rows(lf)
+
+    def stats(self) -> dict:
+        files = self._week_files() if self._games_dir.exists() else []
+        return {
+            'ready': self.ready,
+            'last_upload_id': self._state.get('last_upload_id'),
+            'bootstrapped_at': self._state.get('bootstrapped_at'),
+            'synced_at': self._state.get('synced_at'),
+            'weeks': len(files),
+            'bytes': sum(f.stat().st_size for f in files),
+            'syncs': self.syncs,
+            'games_refreshed': self.games_refreshed,
+            'last_sync_seconds': self.last_sync_seconds,
+        }
+
+
+def create_games_replica(supabase: Client) -> GamesReplica | None:
+    if not GAMES_REPLICA_DIR:
+        return None
+    Path(GAMES_REPLICA_DIR).mkdir(parents=True, exist_ok=True)
+    return GamesReplica(supabase, GAMES_REPLICA_DIR)
+
+
+if __name__ == '__main__':
+    import argparse
+    from dotenv import load_dotenv
+    from supabase.client import create_client
+
+    parser = argparse.ArgumentParser(description='Rebuild or sync the local Parquet replica of games.')
+    parser.add_argument('command', choices=['rebuild', 'sync'])
+    parser.add_argument('--dir', default=GAMES_REPLICA_DIR, help='Replica directory (default: GAMES_REPLICA_DIR)')
+    args = parser.parse_args()
+
+    load_dotenv()  # Load .env as base
+    app_env = os.getenv('APP_ENV', 'development')
+    env_file = backend_dir / f'.env.{app_env}'
+    if env_file.exists():
+        load_dotenv(env_file, override=True)  # Override with env-specific values
+    SUPABASE_URL = os.getenv('SUPABASE_URL', '')
+    SUPABASE_KEY = os.getenv('SUPABASE_KEY', '')
+    replica_dir = args.dir or os.getenv('GAMES_REPLICA_DIR', '')
+
+    if not SUPABASE_URL or not SUPABASE_KEY or not replica_dir:
+        print("ERROR: Missing SUPABASE_URL, SUPABASE_KEY or GAMES_REPLICA_DIR. Check .env file.")
+        sys.exit(1)
+
+    Path(replica_dir).mkdir(parents=True, exist_ok=True)
+    replica = GamesReplica(create_client(SUPABASE_URL, SUPABASE_KEY), replica_dir)
+    result = asyncio.run(replica.rebuild() if args.command == 'rebuild' else replica.sync())
+    print(result)
@@ -0,0 +1,85 @@
+import os
+import json
+from datetime import date
+from typing import AsyncIterator
+from supabase.client import Client
+from data.db import run_query
+
+RPC_GET_GAMES_PAGE = 'get_games_page'
+
+# Must not exceed PostgREST's max-rows setting, otherwise a short page is mistaken for the last one
+GAMES_PAGE_SIZE = int(os.getenv('GAMES_PAGE_SIZE', '1000'))
+
+# games_pkey columns; the keyset cursor is the last row's values for these columns
+GAMES_KEYSET_COLUMNS = ('game_code', 'date_started', 'date_ended', 'player_id', 'profit', 'tips', 'total_tips')
+
+
+async def iter_games_pages(
+    supabase: Client,
+    start_date: date | None = None,
+    end_date: date | None = None,
+    club_code: str | None = None,
+    player_ids: list[str] | None = None,
+    game_codes: list[str] | None = None,
+    page_size: int = GAMES_PAGE_SIZE,
+) -> AsyncIterator[list[dict]]:
+    """Yield pages of games rows, resuming each page from the previous one's last row.
+
+    Rows come in date_started order when start_date is given and in games_pkey order otherwise.
+    """
+    params = {
+        'start_date_param': start_date.isoformat() if start_date else None,
+        'end_date_param': end_date.isoformat() if end_date else None,
+        'club_code_param': club_code,
+        'player_ids_param': player_ids,
+        'game_codes_param': game_codes,
+        'page_size_param': page_size,
+    }
+
+    while True:
+        response = await run_query(supabase.rpc(RPC_GET_GAMES_PAGE, params))
+        rows = response.data or []
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        last_row = rows[-1]
+        params.update({f'after_{col}': last_row[col] for col in GAMES_KEYSET_COLUMNS})
+
+
+async def fetch_all_games(supabase: Client, **filters) -> list[dict]:
+    """Collect every matching games row across keyset pages."""
+    rows = []
+    async for page in iter_games_pages(supabase, **filters):
+        rows.extend(page)
+    return rows
+
+
+async def primed(pages: AsyncIterator[list[dict]]) -> AsyncIterator[list[dict]]:
+    """Fetch the first page eagerly so query errors surface before a streaming response starts."""
+    first_page = await anext(pages, None)
+
+    async def chained():
+        if first_page is not None:
+            yield first_page
+        async for page in pages:
+            yield page
+
+    return chained()
+
+
+async def stream_json(pages: AsyncIterator[list[dict]]) -> AsyncIterator[bytes]:
+    """Encode pages as the standard {'data': [...], 'count': n} body without materialising the list."""
+    yield b'{"data":['
+    count = 0
+    async for page in pages:
+        for row in page:
+            yield (b',' if count else b'') + json.dumps(row).encode()
+            count += 1
+    yield f'],"count":{count}}}'.encode()
+
+
+async def stream_ndjson(pages: AsyncIterator[list[dict]]) -> AsyncIterator[bytes]:
+    """Encode pages as newline-delimited JSON, one games row per line."""
+    async for page in pages:
+        yield ''.join(json.dumps(row) + '\n' for row in page).encode()
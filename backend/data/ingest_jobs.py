@@ -0,0 +1,244 @@
+import os
+import time
+import uuid
+import base64
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+from postgrest.exceptions import APIError
+from supabase.client import Client
+from data.db import run_query, run_sync
+from data.csv_upload import upload_csv_to_games, calculate_csv_hash
+from data.schemas.df_schemas import User
+
+logger = logging.getLogger(__name__)
+
+TABLE_INGEST_JOBS = 'ingest_jobs'
+RPC_CLAIM_INGEST_JOB = 'claim_ingest_job'
+RPC_SUBMIT_INGEST_JOB = 'submit_ingest_job'
+RPC_GET_INGEST_JOB_PAYLOAD = 'get_ingest_job_payload'
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+
+# The CSV itself lives in ingest_job_payloads and is only read by the worker that claims the job
+JOB_STATUS_COLUMNS = (
+    'id,status,filename,csv_hash,created_by,created_by_email,rows_parsed,batches_total,batches_inserted,'
+    'rows_inserted,rows_skipped,result,error,attempts,created_at,started_at,finished_at,updated_at'
+)
+
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', '2'))
+
+# Idle workers check for jobs submitted through other processes this often
+INGEST_POLL_SECONDS = float(os.getenv('INGEST_POLL_SECONDS', '5'))
+
+# A running job whose worker has not heartbeated for this long is handed to another worker
+INGEST_JOB_LEASE_SECONDS = int(os.getenv('INGEST_JOB_LEASE_SECONDS', '300'))
+INGEST_JOB_MAX_ATTEMPTS = int(os.getenv('INGEST_JOB_MAX_ATTEMPTS', '3'))
+
+_PROGRESS_INTERVAL_SECONDS = 1.0
+
+_UNIQUE_VIOLATION = '23505'
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class IngestJobQueue:
+    """Background CSV ingestion: jobs persisted in ingest_jobs, run by a bounded pool of asyncio workers.
+
+    Each job's CSV bytes are kept in ingest_job_payloads until it finishes. Workers claim jobs with claim_ingest_job and
+    heartbeat while running, so a job whose process died is claimed again after its lease expires
+    and re-run from the start. on_success is awaited with (job, result) after a successful upload.
+    """
+
+    def __init__(
+        self,
+        supabase: Client,
+        on_success: Callable[[dict, dict], Awaitable[None]] | None = None,
+        workers: int = INGEST_WORKERS,
+        poll_seconds: float = INGEST_POLL_SECONDS,
+        lease_seconds: int = INGEST_JOB_LEASE_SECONDS,
+        max_attempts: int = INGEST_JOB_MAX_ATTEMPTS,
+    ):
+        self._supabase = supabase
+        self._on_success = on_success
+        self._workers = workers
+        self._poll_seconds = poll_seconds
+        self._lease_seconds = lease_seconds
+        self._max_attempts = max_attempts
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self.running = 0
+        self.succeeded = 0
+        self.failed = 0
+
+    def start(self):
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self._workers)]
+
+    async def stop(self):
+        """Cancel the workers; jobs they were running are re-claimed after their lease expires."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, content: bytes, filename: str, user: User) -> dict:
+        """Queue a CSV for ingestion. A file that is already queued or running returns that job instead."""
+        csv_hash = await run_sync(calculate_csv_hash, content)
+        job_id = str(uuid.uuid4())
+        try:
+            # base64 rather than PostgREST's hex bytea format, which doubles the size
+            await run_query(self._supabase.rpc(RPC_SUBMIT_INGEST_JOB, {
+                'id_param': job_id,
+                'filename_param': filename,
+                'csv_hash_param': csv_hash,
+                'csv_base64_param': base64.b64encode(content).decode(),
+                'created_by_param': user.id,
+                'created_by_email_param': user.email,
+            }))
+        except APIError as e:
+            if e.code != _UNIQUE_VIOLATION:
+                raise
+            response = await run_query(
+                self._supabase.table(TABLE_INGEST_JOBS)
+                .select(JOB_STATUS_COLUMNS)
+                .eq('csv_hash', csv_hash)
+                .in_('status', [JOB_QUEUED, JOB_RUNNING])
+                .limit(1)
+            )
+            if response.data:
+                return response.data[0]
+            # The other job finished in between; queue this one as usual
+            return await self.submit(content, filename, user)
+
+        self._wakeup.set()
+        return await self.get(job_id)
+
+    async def get(self, job_id: str) -> dict | None:
+        response = await run_query(
+            self._supabase.table(TABLE_INGEST_JOBS)
+            .select(JOB_STATUS_COLUMNS)
+            .eq('id', job_id)
+            .limit(1)
+        )
+        return response.data[0] if response.data else None
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logger.error('Failed to claim ingest job: %s', e)
+                job = None
+
+            if job is not None:
+                await self._run(job)
+                continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _claim(self) -> dict | None:
+        response = await run_query(self._supabase.rpc(RPC_CLAIM_INGEST_JOB, {
+            'lease_seconds_param': self._lease_seconds,
+            'max_attempts_param': self._max_attempts,
+        }))
+        return response.data[0] if response.data else None
+
+    def _update(self, job: dict, values: dict):
+        # Matching on attempts keeps a worker whose lease was taken over from writing over the new run
+        return (
+            self._supabase.table(TABLE_INGEST_JOBS)
+            .update({**values, 'updated_at': _now()}, returning='minimal')
+            .eq('id', job['id'])
+            .eq('attempts', job['attempts'])
+        )
+
+    async def _run(self, job: dict):
+        self.running += 1
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        last_progress = 0.0
+
+        def report_progress(counts: dict):
+            # Called from the upload thread; throttled, and never allowed to fail the upload
+            nonlocal last_progress
+            if time.monotonic() - last_progress < _PROGRESS_INTERVAL_SECONDS and counts['batches_inserted'] < counts['batches_total']:
+                return
+            last_progress = time.monotonic()
+            try:
+                self._update(job, {**counts, 'heartbeat_at': _now()}).execute()
+            except Exception as e:
+                logger.warning('Failed to record progress for ingest job %s: %s', job['id'], e)
+
+        try:
+            payload = await run_query(self._supabase.rpc(RPC_GET_INGEST_JOB_PAYLOAD, {'job_id_param': job['id']}))
+            if not payload.data:
+                raise RuntimeError('CSV payload is missing')
+            result = await run_sync(
+                upload_csv_to_games,
+                self._supabase,
+                base64.b64decode(payload.data),
+                job['filename'],
+                progress=report_progress,
+            )
+        except ValueError as e:
+            await self._finish(job, JOB_FAILED, error=str(e))
+            return
+        except Exception as e:
+            logger.error('Ingest job %s failed: %s', job['id'], e, exc_info=True)
+            await self._finish(job, JOB_FAILED, error='Failed to upload CSV')
+            return
+        finally:
+            heartbeat.cancel()
+            self.running -= 1
+
+        if not result['success']:
+            await self._finish(job, JOB_FAILED, result=result, error=result['message'])
+            return
+
+        await self._finish(job, JOB_SUCCEEDED, result=result)
+        if self._on_success is not None:
+            try:
+                await self._on_success(job, result)
+            except Exception as e:
+                logger.error('Post-upload hook failed for ingest job %s: %s', job['id'], e, exc_info=True)
+
+    async def _finish(self, job: dict, status: str, result: dict | None = None, error: str | None = None):
+        if status == JOB_SUCCEEDED:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        # Finishing a job deletes its payload (ingest_jobs_delete_finished_payload trigger)
+        values = {'status': status, 'result': result, 'error': error, 'finished_at': _now()}
+        try:
+            await run_query(self._update(job, values))
+        except Exception as e:
+            # The job stays running and is re-claimed after its lease; re-running it is harmless
+            logger.error('Failed to record outcome of ingest job %s: %s', job['id'], e)
+
+    async def _heartbeat(self, job: dict):
+        while True:
+            await asyncio.sleep(self._lease_seconds / 3)
+            try:
+                await run_query(self._update(job, {'heartbeat_at': _now()}))
+            except Exception as e:
+                logger.warning('Failed to heartbeat ingest job %s: %s', job['id'], e)
+
+    def stats(self) -> dict:
+        return {
+            'workers': len(self._tasks),
+            'running': self.running,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'lease_seconds': self._lease_seconds,
+        }
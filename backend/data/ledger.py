@@ -0,0 +1,80 @@
+import os
+import sys
+from pathlib import Path
+from supabase.client import Client
+
+TABLE_PLAYER_LEDGER = 'player_ledger'
+TABLE_LEDGER_TOTALS = 'ledger_totals'
+RPC_GET_PLAYER_LIFETIME_PROFITS = 'get_player_lifetime_profits'
+
+# Players per lookup; must not exceed PostgREST's max-rows setting, which caps each response
+LEDGER_LOOKUP_CHUNK_SIZE = int(os.getenv('LEDGER_LOOKUP_CHUNK_SIZE', '1000'))
+
+# The ledger itself is maintained by statement-level triggers on games
+# (see sql/supabase_player_ledger_table.sql); these helpers only read, rebuild and verify it.
+
+
+async def fetch_lifetime_profits(supabase: Client, player_ids: list[str], chunk_size: int = LEDGER_LOOKUP_CHUNK_SIZE) -> list[dict]:
+    """Ledger rows (player_id, lifetime_profit) for player_ids, looked up in concurrent chunks."""
+    # Imported here so 'python data/ledger.py' still runs before backend/ is on sys.path
+    from data.db import gather_queries
+
+    responses = await gather_queries(*(
+        supabase.rpc(RPC_GET_PLAYER_LIFETIME_PROFITS, {'player_ids_param': player_ids[i:i + chunk_size]})
+        for i in range(0, len(player_ids), chunk_size)
+    ))
+    return [row for response in responses for row in response.data or []]
+
+
+def rebuild_ledger(supabase: Client) -> int:
+    """Recompute the ledger from the games table. Returns the number of players written."""
+    response = supabase.rpc('rebuild_player_ledger', {}).execute()
+    return int(response.data or 0)
+
+
+def verify_ledger(supabase: Client) -> list[dict]:
+    """Return every ledger row that disagrees with a fresh aggregate of games (empty when consistent)."""
+    response = supabase.rpc('verify_player_ledger', {}).execute()
+    return response.data or []
+
+
+if __name__ == '__main__':
+    import os
+    import argparse
+    from dotenv import load_dotenv
+    from supabase.client import create_client
+
+    backend_dir = Path(__file__).parent.parent
+    if str(backend_dir) not in sys.path:
+        sys.path.insert(0, str(backend_dir))
+
+    parser = argparse.ArgumentParser(description='Rebuild or verify the per-player games ledger.')
+    parser.add_argument('command', choices=['rebuild', 'verify'])
+    args = parser.parse_args()
+
+    load_dotenv()  # Load .env as base
+    app_env = os.getenv('APP_ENV', 'development')
+    env_file = backend_dir / f'.env.{app_env}'
+    if env_file.exists():
+        load_dotenv(env_file, override=True)  # Override with env-specific values
+    SUPABASE_URL = os.getenv('SUPABASE_URL', '')
+    SUPABASE_KEY = os.getenv('SUPABASE_KEY', '')
+
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        print("ERROR: Missing required environment variables. Check .env file.")
+        sys.exit(1)
+
+    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+    if args.command == 'rebuild':
+        players = rebuild_ledger(supabase)
+        print(f"Ledger rebuilt for {players} players")
+    else:
+        mismatches = verify_ledger(supabase)
+        if not mismatches:
+            print("Ledger matches the games table")
+            sys.exit(0)
+        for row in mismatches:
+            print(row)
+        print(f"{len(mismatches)} ledger rows disagree with the games table; run 'rebuild' to repair")
+        sys.exit(1)
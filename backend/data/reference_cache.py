@@ -0,0 +1,148 @@
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+import polars as pl
+from supabase.client import Client
+from data.db import run_query
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_CACHE_TTL_SECONDS = float(os.getenv('REFERENCE_CACHE_TTL_SECONDS', '300'))
+
+# Small, rarely-changing tables served from memory, keyed by their primary key
+REFERENCE_TABLE_KEYS = {
+    'agents': 'agent_id',
+    'players': 'player_id',
+    'real_name_mapping': 'id',
+    'agent_deal_percent_rules': 'id',
+}
+
+
+@dataclass
+class ReferenceTable:
+    name: str
+    key: str
+    by_key: dict
+    version: int
+    loaded_at: float
+    _frame: pl.DataFrame | None = field(default=None, repr=False)
+
+    @property
+    def rows(self) -> list[dict]:
+        """All rows; callers must copy a row before modifying it."""
+        return list(self.by_key.values())
+
+    @property
+    def frame(self) -> pl.DataFrame:
+        if self._frame is None:
+            rows = self.rows
+            self._frame = pl.DataFrame(rows, infer_schema_length=None) if rows else pl.DataFrame()
+        return self._frame
+
+
+class ReferenceCache:
+    """In-process cache of the reference tables with write-through patching and a TTL fallback.
+
+    API upserts patch the cached table directly; writes made outside the API (SQL editor,
+    other services) become visible once the entry is older than the TTL.
+    """
+
+    def __init__(self, supabase: Client, ttl_seconds: float = REFERENCE_CACHE_TTL_SECONDS):
+        self._supabase = supabase
+        self._ttl_seconds = ttl_seconds
+        self._tables: dict[str, ReferenceTable] = {}
+        self._locks = {name: asyncio.Lock() for name in REFERENCE_TABLE_KEYS}
+        self._versions = {name: 0 for name in REFERENCE_TABLE_KEYS}
+        self.hits = 0
+        self.misses = 0
+        self.patches = 0
+        self.invalidations = 0
+
+    def _fresh(self, entry: ReferenceTable | None) -> bool:
+        return entry is not None and time.monotonic() - entry.loaded_at < self._ttl_seconds
+
+    async def get(self, table: str) -> ReferenceTable:
+        entry = self._tables.get(table)
+        if self._fresh(entry):
+            self.hits += 1
+            return entry
+
+        # Single-flight: concurrent misses wait for one load instead of each querying
+        async with self._locks[table]:
+            entry = self._tables.get(table)
+            if self._fresh(entry):
+                self.hits += 1
+                return entry
+
+            self.misses += 1
+            version_before = self._versions[table]
+            response = await run_query(self._supabase.table(table).select('*'))
+            key = REFERENCE_TABLE_KEYS[table]
+            # A patch or invalidate during the query means these rows may predate that write
+            stale = self._versions[table] != version_before
+            self._versions[table] += 1
+            entry = ReferenceTable(
+                name=table,
+                key=key,
+                by_key={row[key]: row for row in response.data or []},
+                version=self._versions[table],
+                loaded_at=time.monotonic(),
+            )
+            if stale:
+                # Serve them to this caller only; the next get() loads again
+                self._tables.pop(table, None)
+            else:
+                self._tables[table] = entry
+            return entry
+
+    async def get_many(self, *tables: str) -> list[ReferenceTable]:
+        return list(await asyncio.gather(*(self.get(t) for t in tables)))
+
+    def patch(self, table: str, row: dict):
+        """Write-through: replace one row in the cached table after a successful upsert."""
+        entry = self._tables.get(table)
+        self._versions[table] += 1
+        if entry is None:
+            return
+        by_key = dict(entry.by_key)
+        by_key[row[entry.key]] = row
+        # Keep loaded_at so the TTL still bounds staleness from writes made elsewhere
+        self._tables[table] = ReferenceTable(
+            name=table,
+            key=entry.key,
+            by_key=by_key,
+            version=self._versions[table],
+            loaded_at=entry.loaded_at,
+        )
+        self.patches += 1
+
+    def invalidate(self, table: str | None = None):
+        tables = [table] if table else list(REFERENCE_TABLE_KEYS)
+        for name in tables:
+            self._versions[name] += 1
+            self._tables.pop(name, None)
+        self.invalidations += 1
+
+    def version(self, table: str) -> int:
+        return self._versions[table]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'patches': self.patches,
+            'invalidations': self.invalidations,
+            'ttl_seconds': self._ttl_seconds,
+            'tables': {
+                name: {
+                    'rows': len(entry.by_key),
+                    'version': entry.version,
+                    'age_seconds': round(time.monotonic() - entry.loaded_at, 1),
+                }
+                for name, entry in self._tables.items()
+            },
+        }
@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from supabase.client import Client
+from data.db import run_query
+from data.csv_upload import TABLE_UPLOADED_CSVS
+from data.data_version import DataVersion
+from utils.datetime_utils import get_last_thursday_12am_texas
+
+logger = logging.getLogger(__name__)
+
+REPORT_CACHE_MAX_BYTES = int(os.getenv('REPORT_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+# Ranges reaching into the current week can still gain games without any re-upload into the past
+REPORT_CACHE_OPEN_TTL_SECONDS = float(os.getenv('REPORT_CACHE_OPEN_TTL_SECONDS', '60'))
+
+
+@dataclass
+class _Entry:
+    data: list[dict]
+    size: int
+    pinned: bool
+    stored_at: float
+    start: date
+    end: date
+
+
+class ReportCache:
+    """LRU cache of report RPC results keyed by (function, start, end, group_by), bounded by size.
+
+    Ranges that end before the current accounting week are closed: their entries are pinned
+    (no TTL) and dropped only when an upload lands games inside the range or reference data
+    changes. Uploads are seen either directly (invalidate_range after an API upload) or through
+    new uploaded_csvs rows, which record each upload's date range; the data version tells us
+    when to look. Open ranges expire after a short TTL.
+    """
+
+    def __init__(
+        self,
+        supabase: Client,
+        data_version: DataVersion,
+        max_bytes: int = REPORT_CACHE_MAX_BYTES,
+        open_ttl_seconds: float = REPORT_CACHE_OPEN_TTL_SECONDS,
+    ):
+        self._supabase = supabase
+        self._data_version = data_version
+        self._max_bytes = max_bytes
+        self._open_ttl_seconds = open_ttl_seconds
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        self._locks: dict[tuple, asyncio.Lock] = {}
+        self._lock_users: dict[tuple, int] = {}
+        self._reconcile_lock = asyncio.Lock()
+        self._bytes = 0
+        # Bumped by every invalidation; a result computed across one is returned but not stored
+        self._generation = 0
+        self._seen_version: dict | None = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    async def get(self, function: str, start: date, end: date, group_by: str | None = None) -> list[dict]:
+        """Result of a report RPC over [start, end], from cache when still valid."""
+        await self._reconcile()
+
+        key = (function, start, end, group_by)
+        entry = self._valid_entry(key)
+        if entry is not None:
+            self.hits += 1
+            return entry.data
+
+        # Single-flight per key: concurrent misses share one RPC. The lock is dropped only once
+        # no coroutine holds or waits on it, so a late waiter never ends up with a second lock.
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._lock_users[key] = self._lock_users.get(key, 0) + 1
+        try:
+            async with lock:
+                entry = self._valid_entry(key)
+                if entry is not None:
+                    self.hits += 1
+                    return entry.data
+
+                self.misses += 1
+                generation = self._generation
+                response = await run_query(self._supabase.rpc(function, {
+                    'start_date_param': start.isoformat(),
+                    'end_date_param': end.isoformat(),
+                }))
+                data = response.data or []
+                if generation == self._generation:
+                    self._store(key, data, pinned=end < get_last_thursday_12am_texas().date())
+                return data
+        finally:
+            self._lock_users[key] -= 1
+            if self._lock_users[key] == 0:
+                del self._lock_users[key]
+                del self._locks[key]
+
+    def _valid_entry(self, key: tuple) -> _Entry | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if not entry.pinned and time.monotonic() - entry.stored_at >= self._open_ttl_seconds:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: tuple, data: list[dict], pinned: bool):
+        # Serialized size as a proxy for memory; only relative sizes matter for eviction
+        size = len(json.dumps(data, default=str))
+        if size > self._max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _Entry(data=data, size=size, pinned=pinned, stored_at=time.monotonic(), start=key[1], end=key[2])
+        self._bytes += size
+        while self._bytes > self._max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def invalidate_range(self, date_started: date | datetime | str | None, date_ended: date | datetime | str | None):
+        """Drop every entry whose range could include games dated between date_started and date_ended."""
+        if date_started is None or date_ended is None:
+            self.clear()
+            return
+        first, last = _as_date(date_started), _as_date(date_ended)
+        # A day of slack either side: report bounds are dates compared against timestamps
+        stale = [
+            key for key, entry in self._entries.items()
+            if entry.start <= last + timedelta(days=1) and entry.end >= first - timedelta(days=1)
+        ]
+        for key in stale:
+            self._remove(key)
+        self._generation += 1
+        self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+        self._generation += 1
+        self.invalidations += 1
+
+    async def _reconcile(self):
+        """Apply uploads and reference changes made since the last check, including other processes'."""
+        try:
+            version = await self._data_version.components()
+        except Exception as e:
+            # Without a version we cannot tell what changed, so nothing cached can be trusted
+            logger.warning('Data version lookup failed, clearing report cache: %s', e)
+            self.clear()
+            return
+
+        if version is self._seen_version:
+            return
+        async with self._reconcile_lock:
+            seen = self._seen_version
+            if version is seen:
+                return
+            if seen is None:
+                self._seen_version = version
+                return
+
+            if version['reference'] != seen['reference'] or version['uploads_max_id'] < seen['uploads_max_id']:
+                self.clear()
+            elif version['uploads_max_id'] > seen['uploads_max_id']:
+                response = await run_query(
+                    self._supabase.table(TABLE_UPLOADED_CSVS)
+                    .select('id,min_date_started,max_date_ended')
+                    .gt('id', seen['uploads_max_id'])
+                    .lte('id', version['uploads_max_id'])
+                )
+                for upload in response.data or []:
+                    self.invalidate_range(upload.get('min_date_started'), upload.get('max_date_ended'))
+            elif version['uploads_count'] != seen['uploads_count']:
+                # Uploads were deleted; their games may have been too
+                self.clear()
+            self._seen_version = version
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'entries': len(self._entries),
+            'pinned': sum(1 for e in self._entries.values() if e.pinned),
+            'bytes': self._bytes,
+            'max_bytes': self._max_bytes,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'open_ttl_seconds': self._open_ttl_seconds,
+        }
+
+
+def _as_date(value: date | datetime | str) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
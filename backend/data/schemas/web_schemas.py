@@ -32,3 +32,6 @@ class UpsertDealRuleRequest(BaseModel):
     threshold: float
     deal_percent: float
 
+class TelegramMessageItem(BaseModel):
+    agent_id: int
+    message: str
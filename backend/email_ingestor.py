@@ -1,55 +1,85 @@
 import os
+import re
+import time
+import random
+import csv
+import base64
+import quopri
+import itertools
 import email
 import email.message
 import imaplib
 import logging
-import tempfile
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from typing import Any
-from email.utils import parsedate_to_datetime
 import polars as pl
 from supabase.client import Client
 
 logger = logging.getLogger(__name__)
 
 from data.schemas.df_schemas import GAME_DATA_MAP
-from data.csv_upload import upload_csv_to_games
+from data.csv_upload import upload_csv_to_games, calculate_csv_hash, detect_separator
 
 GMAIL_IMAP_SERVER = 'imap.gmail.com'
 GMAIL_IMAP_PORT = 993
 DEFAULT_STATE_TABLE = 'email_ingestor_state'
 
+# Messages whose structure is fetched per IMAP round trip
+IMAP_FETCH_BATCH_SIZE = int(os.getenv('IMAP_FETCH_BATCH_SIZE', '100'))
 
-def get_last_run_time(supabase: Client, state_table: str = DEFAULT_STATE_TABLE) -> datetime | None:
+# Attachments validated and uploaded in parallel; IMAP itself stays on the calling thread
+EMAIL_INGEST_WORKERS = int(os.getenv('EMAIL_INGEST_WORKERS', '4'))
+
+# Daemon mode re-issues IDLE this often; servers may drop an IDLE held for 30 minutes (RFC 2177)
+IMAP_IDLE_TIMEOUT_SECONDS = int(os.getenv('IMAP_IDLE_TIMEOUT_SECONDS', '600'))
+IMAP_RECONNECT_BACKOFF_MAX_SECONDS = float(os.getenv('IMAP_RECONNECT_BACKOFF_MAX_SECONDS', '300'))
+
+# Daemon mode retries emails whose fetch or upload failed after at most this long, new mail or not
+EMAIL_RETRY_SECONDS = int(os.getenv('EMAIL_RETRY_SECONDS', '60'))
+
+REQUIRED_CSV_COLUMNS = ['Rank', 'Player', 'ID', 'Profit', 'Tips', 'BuyIn']
+
+
+def get_ingestor_state(supabase: Client, state_table: str = DEFAULT_STATE_TABLE) -> dict[str, Any]:
+    """The saved checkpoint: {'last_run_time', 'uid_validity', 'last_uid'}, empty before the first run."""
     try:
-        response = supabase.table(state_table).select('last_run_time').eq('id', 1).execute()
+        response = supabase.table(state_table).select('last_run_time,uid_validity,last_uid').eq('id', 1).execute()
         if response.data and len(response.data) > 0:
-            last_run_str = response.data[0].get('last_run_time')
-            if last_run_str:
-                return datetime.fromisoformat(last_run_str.replace('Z', '+00:00'))
+            state = dict(response.data[0])
+            if state.get('last_run_time'):
+                state['last_run_time'] = datetime.fromisoformat(state['last_run_time'].replace('Z', '+00:00'))
+            return state
     except Exception as e:
-        logger.error("Failed to fetch last run time from '%s': %s", state_table, e)
-    return None
+        logger.error("Failed to fetch ingestor state from '%s': %s", state_table, e)
+    return {}
 
 
-def update_last_run_time(supabase: Client, run_time: datetime, state_table: str = DEFAULT_STATE_TABLE):
+def update_ingestor_state(
+    supabase: Client,
+    run_time: datetime,
+    uid_validity: int | None,
+    last_uid: int | None,
+    state_table: str = DEFAULT_STATE_TABLE
+):
     try:
         run_time_iso = run_time.isoformat()
-        response = supabase.table(state_table).update({
+        values = {
             'last_run_time': run_time_iso,
+            'uid_validity': uid_validity,
+            'last_uid': last_uid,
             'updated_at': run_time_iso
-        }).eq('id', 1).execute()
+        }
+        response = supabase.table(state_table).update(values).eq('id', 1).execute()
         
         if not response.data:
             supabase.table(state_table).insert({
                 'id': 1,
-                'last_run_time': run_time_iso,
                 'created_at': run_time_iso,
-                'updated_at': run_time_iso
+                **values
             }).execute()
     except Exception as e:
-        logger.error("Failed to update last run time in '%s': %s", state_table, e)
+        logger.error("Failed to update ingestor state in '%s': %s", state_table, e)
 
 
 def connect_imap(user_email: str, app_password: str) -> imaplib.IMAP4_SSL:
@@ -59,160 +89,254 @@ def connect_imap(user_email: str, app_password: str) -> imaplib.IMAP4_SSL:
     return mail
 
 
-def search_emails_with_csv_attachments(
+def get_uid_validity(mail: imaplib.IMAP4_SSL) -> int | None:
+    """UIDVALIDITY of the selected mailbox, as reported by SELECT."""
+    _, data = mail.response('UIDVALIDITY')
+    if not data or data[0] is None:
+        return None
+    return int(data[0])
+
+
+def search_new_email_uids(
     mail: imaplib.IMAP4_SSL,
-    after_date: datetime | None = None
-) -> list[str]:
-    """Search for emails with CSV attachments after the given date."""
-    search_criteria = ['ALL']
+    state: dict[str, Any],
+    uid_validity: int | None
+) -> list[int]:
+    """UIDs of messages that arrived after the checkpoint, in ascending order.
 
-    if after_date:
-        date_str = after_date.strftime('%d-%b-%Y')
-        search_criteria = [f'SINCE {date_str}']
+    UIDs only carry over between runs while the mailbox keeps its UIDVALIDITY. Without a usable
+    checkpoint this falls back to SINCE the last run's date (or every message); already uploaded
+    CSVs are still skipped by their hash.
+    """
+    last_uid = state.get('last_uid')
+    if last_uid is not None and uid_validity is not None and state.get('uid_validity') == uid_validity:
+        criteria = ('UID', f'{last_uid + 1}:*')
+    elif state.get('last_run_time'):
+        criteria = ('SINCE', state['last_run_time'].strftime('%d-%b-%Y'))
+    else:
+        criteria = ('ALL',)
 
-    status, message_ids = mail.search(None, *search_criteria)
-    
-    if status != 'OK' or not message_ids or not message_ids[0]:
+    status, data = mail.uid('SEARCH', *criteria)
+    if status != 'OK' or not data or not data[0]:
         return []
-    
-    return [uid.decode() if isinstance(uid, bytes) else uid for uid in message_ids[0].split()]
 
+    uids = sorted(int(uid) for uid in data[0].split())
+    if criteria[0] == 'UID':
+        # 'n:*' always matches the newest message, even when its UID is below n
+        uids = [uid for uid in uids if uid > last_uid]
+    return uids
 
-def get_email_message(mail: imaplib.IMAP4_SSL, uid: str) -> email.message.Message:
-    """Fetch and parse an email message by UID."""
-    status, msg_data = mail.fetch(uid, '(RFC822)')
-    if status != 'OK' or not msg_data or not msg_data[0]:
-        raise ValueError(f"Failed to fetch email {uid}")
-    
-    raw_email = msg_data[0][1]
-    if isinstance(raw_email, bytes):
-        return email.message_from_bytes(raw_email)
-    else:
-        return email.message_from_string(str(raw_email))
+
+# One token of an IMAP response: parenthesis, quoted string, {n} literal marker, NIL or atom.
+# Atoms may carry a bracketed section with spaces, e.g. BODY[HEADER.FIELDS (SUBJECT)].
+_IMAP_TOKEN = re.compile(rb'''\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|\{(\d+)\}|([^\s()"\[]*\[[^\]]*\][^\s()]*|[^\s()"]+))''')
+
+
+def _parse_imap_response(data: list) -> list:
+    """Parse imaplib response data (lines and (line, literal) tuples) into nested lists of bytes."""
+    stack: list[list] = [[]]
+    for item in data:
+        text, literal = (item[0], item[1]) if isinstance(item, tuple) else (item, None)
+        pos = 0
+        while True:
+            match = _IMAP_TOKEN.match(text, pos)
+            if not match or match.end() == pos:
+                break
+            pos = match.end()
+            opened, closed, quoted, literal_size, atom = match.groups()
+            if opened:
+                stack.append([])
+            elif closed:
+                finished = stack.pop()
+                stack[-1].append(finished)
+            elif quoted is not None:
+                stack[-1].append(re.sub(rb'\\(.)', rb'\1', quoted))
+            elif literal_size is not None:
+                # The literal's bytes arrive as the second element of this tuple
+                stack[-1].append(literal)
+            elif atom.upper() == b'NIL':
+                stack[-1].append(None)
+            else:
+                stack[-1].append(atom)
+    return stack[0]
+
+
+def _fetch_items(data: list) -> list[dict[str, Any]]:
+    """Each untagged FETCH response as a dict of upper-cased data item name to value."""
+    items = []
+    for value in _parse_imap_response(data):
+        if isinstance(value, list):
+            items.append({
+                key.decode().upper(): val
+                for key, val in zip(value[::2], value[1::2])
+                if isinstance(key, bytes)
+            })
+    return items
+
+
+def _text(value: bytes | None) -> str:
+    return value.decode('utf-8', errors='replace') if value is not None else ''
+
+
+def _attachment_filename(disposition: list | None, content_params: list | None) -> str | None:
+    """The filename email.message would report for a part with these BODYSTRUCTURE parameters."""
+    part = email.message.Message()
+    for header, value, params in (
+        ('Content-Disposition', disposition[0] if disposition else None, disposition[1] if disposition and len(disposition) > 1 else None),
+        ('Content-Type', b'application/octet-stream', content_params),
+    ):
+        if value is None:
+            continue
+        rendered = [_text(value)]
+        for key, val in zip((params or [])[::2], (params or [])[1::2]):
+            escaped = _text(val).replace('\\', '\\\\').replace('"', '\\"')
+            rendered.append(f'{_text(key)}="{escaped}"')
+        part[header] = '; '.join(rendered)
+    return part.get_filename()
+
+
+def find_csv_parts(body: list, section: str = '', is_message_body: bool = True) -> list[dict[str, Any]]:
+    """CSV attachment parts in a parsed BODYSTRUCTURE, with the section number to fetch each by."""
+    if body and isinstance(body[0], list):
+        # Child parts come first, then the subtype and the multipart's own extension fields
+        parts = []
+        for i, child in enumerate(itertools.takewhile(lambda b: isinstance(b, list), body), 1):
+            parts.extend(find_csv_parts(child, f'{section}.{i}' if section else str(i), False))
+        return parts
+
+    if is_message_body:
+        section = f'{section}.1' if section else '1'
+
+    media_type, media_subtype = _text(body[0]).lower(), _text(body[1]).lower()
+    parts = []
+    # Extension fields follow the basic ones; text parts add a line count, message/rfc822
+    # parts an envelope, nested body and line count
+    extension = 7 + (1 if media_type == 'text' else 0) + (3 if (media_type, media_subtype) == ('message', 'rfc822') else 0)
+    disposition = body[extension + 1] if len(body) > extension + 1 else None
+    if isinstance(disposition, list) and _text(disposition[0]).lower() == 'attachment':
+        filename = _attachment_filename(disposition, body[2])
+        if filename and filename.lower().endswith('.csv'):
+            parts.append({
+                'section': section,
+                'filename': filename,
+                'encoding': _text(body[5]).lower(),
+            })
+
+    if (media_type, media_subtype) == ('message', 'rfc822') and len(body) > 8 and isinstance(body[8], list):
+        parts.extend(find_csv_parts(body[8], section, True))
+    return parts
+
+
+def fetch_csv_parts(mail: imaplib.IMAP4_SSL, uids: list[int]) -> dict[int, list[dict[str, Any]]]:
+    """BODYSTRUCTURE of a batch of messages in one FETCH, reduced to their CSV attachment parts."""
+    status, data = mail.uid('FETCH', ','.join(str(uid) for uid in uids), '(UID BODYSTRUCTURE)')
+    if status != 'OK':
+        raise ValueError(f"Failed to fetch structure of emails {uids[0]}-{uids[-1]}")
+
+    parts_by_uid = {}
+    for item in _fetch_items(data):
+        if 'UID' in item and isinstance(item.get('BODYSTRUCTURE'), list):
+            parts_by_uid[int(item['UID'])] = find_csv_parts(item['BODYSTRUCTURE'])
+    return parts_by_uid
 
 
-def get_csv_attachments(message: email.message.Message) -> list[dict[str, Any]]:
-    """Extract CSV attachments from an email message."""
+def _decode_part(payload: bytes, encoding: str) -> bytes:
+    if encoding == 'base64':
+        return base64.b64decode(payload)
+    if encoding == 'quoted-printable':
+        return quopri.decodestring(payload)
+    return payload
+
+
+def get_csv_attachments(mail: imaplib.IMAP4_SSL, uid: int, parts: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Download only the given CSV parts of a message, without setting its \\Seen flag."""
+    sections = ' '.join(f"BODY.PEEK[{part['section']}]" for part in parts)
+    status, data = mail.uid('FETCH', str(uid), f'({sections})')
+    if status != 'OK':
+        raise ValueError(f"Failed to fetch attachments of email {uid}")
+
+    payloads = {}
+    for item in _fetch_items(data):
+        for key, value in item.items():
+            if key.startswith('BODY[') and isinstance(value, bytes):
+                payloads[key[len('BODY['):key.index(']')]] = value
+
     attachments = []
-    
-    def extract_attachments(part: email.message.Message):
-        if part.get_content_disposition() == 'attachment':
-            filename = part.get_filename()
-            if filename and filename.lower().endswith('.csv'):
-                payload = part.get_payload(decode=True)
-                if payload:
-                    attachments.append({
-                        'filename': filename,
-                        'data': payload
-                    })
-        
-        if part.is_multipart():
-            for subpart in part.walk():
-                if subpart != part:  # Avoid processing the same part twice
-                    extract_attachments(subpart)
-    
-    extract_attachments(message)
+    for part in parts:
+        payload = payloads.get(part['section'])
+        data = _decode_part(payload, part['encoding']) if payload else None
+        if data:
+            attachments.append({
+                'filename': part['filename'],
+                'data': data
+            })
     return attachments
 
 
-def validate_csv_columns(csv_path: Path) -> bool:
-    """Validate that CSV has the required columns matching GAME_DATA_MAP."""
+def validate_csv_columns(data: bytes) -> bool:
+    """Validate from the header line alone that the CSV has the columns matching GAME_DATA_MAP."""
+    header, _, rows = data.partition(b'\n')
+    if not rows.strip():
+        return False
+    
     try:
-        df = pl.read_csv(csv_path)
-        
-        if df.is_empty():
-            return False
-        
-        required_columns = ['Rank', 'Player', 'ID', 'Profit', 'Tips', 'BuyIn']
-        missing_required = [col for col in required_columns if col not in df.columns]
-        if missing_required:
-            return False
-        
-        game_data_map_keys = set(GAME_DATA_MAP.keys())
-        csv_columns = set(df.columns)
-        matching_columns = game_data_map_keys.intersection(csv_columns)
-        
-        if len(matching_columns) < len(required_columns):
-            return False
-        
-        return True
-    except Exception as e:
+        columns = next(csv.reader([header.decode('utf-8-sig').rstrip('\r')], delimiter=detect_separator(header)))
+    except (UnicodeDecodeError, csv.Error, StopIteration):
         return False
-
-
-def process_email_attachments(
-    mail: imaplib.IMAP4_SSL,
-    supabase: Client,
-    uid: str,
-    message: email.message.Message,
-    dry_run: bool = False
-) -> dict[str, Any]:
-    """Process CSV attachments from an email message."""
-    results = {
-        'email_id': uid,
-        'email_subject': message.get('Subject', ''),
-        'attachments_processed': 0,
-        'attachments_uploaded': 0,
-        'attachments_skipped': 0,
-        'errors': []
-    }
     
-    attachments = get_csv_attachments(message)
-    results['attachments_found'] = len(attachments)
+    missing_required = [col for col in REQUIRED_CSV_COLUMNS if col not in columns]
+    if missing_required:
+        return False
     
-    for attachment in attachments:
-        filename = attachment['filename']
-        file_data = attachment['data']
-        
-        try:
-            with tempfile.NamedTemporaryFile(mode='wb', suffix='.csv', delete=False) as tmp_file:
-                tmp_path = Path(tmp_file.name)
-                tmp_file.write(file_data)
-                tmp_file.flush()
-            
-            if not validate_csv_columns(tmp_path):
-                results['attachments_skipped'] += 1
-                results['errors'].append(f"{filename}: Invalid CSV columns")
-                tmp_path.unlink()
-                continue
-            
-            if dry_run:
-                results['attachments_processed'] += 1
-                results['errors'].append(f"{filename}: DRY RUN - would upload")
-                tmp_path.unlink()
-                continue
-
-            upload_result = upload_csv_to_games(supabase, tmp_path, filename)
-            
-            if upload_result.get('success'):
-                results['attachments_uploaded'] += 1
-            else:
-                results['attachments_skipped'] += 1
-                results['errors'].append(f"{filename}: {upload_result.get('message', 'Upload failed')}")
-            
-            results['attachments_processed'] += 1
-            tmp_path.unlink()
-            
-        except Exception as e:
-            results['attachments_skipped'] += 1
-            results['errors'].append(f"{filename}: {str(e)}")
-            if 'tmp_path' in locals():
-                try:
-                    tmp_path.unlink()
-                except Exception:
-                    pass  # Best-effort cleanup; not critical
+    matching_columns = set(GAME_DATA_MAP.keys()).intersection(columns)
+    if len(matching_columns) < len(REQUIRED_CSV_COLUMNS):
+        return False
     
-    return results
+    return True
 
 
-def run_email_ingestor(
+def process_attachment(supabase: Client, attachment: dict[str, Any], dry_run: bool = False) -> dict[str, Any]:
+    """Validate and upload one CSV attachment; the CSV is parsed once, by the upload itself.
+
+    'skipped' means the CSV itself was rejected and retrying cannot help; 'failed' means the
+    upload did not get through (Supabase or network error) and the email should be fetched again.
+    """
+    filename = attachment['filename']
+    try:
+        if not validate_csv_columns(attachment['data']):
+            return {'status': 'skipped', 'error': f"{filename}: Invalid CSV columns"}
+        
+        if dry_run:
+            return {'status': 'dry_run', 'error': f"{filename}: DRY RUN - would upload"}
+        
+        upload_result = upload_csv_to_games(supabase, attachment['data'], filename)
+        if upload_result.get('success'):
+            if upload_result.get('rows_failed'):
+                return {'status': 'uploaded', 'error': f"{filename}: {upload_result['message']}: {upload_result['row_errors']}"}
+            return {'status': 'uploaded', 'error': None}
+        return {'status': 'skipped', 'error': f"{filename}: {upload_result.get('message', 'Upload failed')}"}
+    except (ValueError, pl.exceptions.PolarsError) as e:
+        # Malformed CSV content
+        return {'status': 'skipped', 'error': f"{filename}: {str(e)}"}
+    except Exception as e:
+        return {'status': 'failed', 'error': f"{filename}: {str(e)}"}
+
+
+def ingest_new_emails(
+    mail: imaplib.IMAP4,
     supabase: Client,
-    user_email: str,
-    app_password: str,
+    uid_validity: int | None,
+    pool: ThreadPoolExecutor,
     state_table: str = DEFAULT_STATE_TABLE,
     dry_run: bool = False
 ) -> dict[str, Any]:
+    """One pass over the selected mailbox on an open connection: every message after the checkpoint.
 
+    IMAP connection errors propagate so the caller can reconnect. The checkpoint only ever
+    covers batches whose attachments were all processed, and stops below the first email that
+    could not be fetched or uploaded, so the next pass fetches it again (CSVs uploaded in the
+    meantime are skipped by their hash).
+    """
     start_time = datetime.now(timezone.utc)
     summary = {
         'success': True,
@@ -221,55 +345,223 @@ def run_email_ingestor(
         'emails_with_attachments': 0,
         'attachments_uploaded': 0,
         'attachments_skipped': 0,
+        'attachments_failed': 0,
+        'emails_failed': 0,
         'errors': []
     }
     
-    mail = None
-    try:
-        last_run = get_last_run_time(supabase, state_table)
-        mail = connect_imap(user_email, app_password)
-        
-        email_uids = search_emails_with_csv_attachments(mail, last_run)
+    state = get_ingestor_state(supabase, state_table)
+    email_uids = search_new_email_uids(mail, state, uid_validity)
+    last_uid = state.get('last_uid') if state.get('uid_validity') == uid_validity else None
+    seen_hashes = set()
+    failed_uids = set()
+    
+    for i in range(0, len(email_uids), IMAP_FETCH_BATCH_SIZE):
+        batch = email_uids[i:i + IMAP_FETCH_BATCH_SIZE]
+        parts_by_uid = fetch_csv_parts(mail, batch)
         
-        for uid in email_uids:
+        # Download on this thread while the pool validates and uploads earlier attachments
+        futures = []
+        for uid in batch:
             try:
-                message = get_email_message(mail, uid)
-                result = process_email_attachments(mail, supabase, uid, message, dry_run)
                 summary['emails_processed'] += 1
+                parts = parts_by_uid.get(uid)
+                if not parts:
+                    continue
                 
-                if result['attachments_found'] > 0:
+                attachments = get_csv_attachments(mail, uid, parts)
+                if attachments:
                     summary['emails_with_attachments'] += 1
                 
-                summary['attachments_uploaded'] += result['attachments_uploaded']
-                summary['attachments_skipped'] += result['attachments_skipped']
-                
-                if result['errors']:
-                    summary['errors'].extend(result['errors'])
+                for attachment in attachments:
+                    # The same file mailed twice would race itself into uploaded_csvs
+                    csv_hash = calculate_csv_hash(attachment['data'])
+                    if csv_hash in seen_hashes:
+                        summary['attachments_skipped'] += 1
+                        summary['errors'].append(f"{attachment['filename']}: Already processed in this run")
+                        continue
+                    seen_hashes.add(csv_hash)
+                    futures.append((uid, pool.submit(process_attachment, supabase, attachment, dry_run)))
+            except (imaplib.IMAP4.abort, OSError):
+                raise
             except Exception as e:
+                failed_uids.add(uid)
                 summary['errors'].append(f"Error processing email {uid}: {str(e)}")
                 continue
         
-        end_time = datetime.now(timezone.utc)
-        update_last_run_time(supabase, end_time, state_table)
-        summary['end_time'] = end_time.isoformat()
-        summary['duration_seconds'] = (end_time - start_time).total_seconds()
+        for uid, future in futures:
+            result = future.result()
+            if result['status'] == 'uploaded':
+                summary['attachments_uploaded'] += 1
+            elif result['status'] == 'skipped':
+                summary['attachments_skipped'] += 1
+            elif result['status'] == 'failed':
+                summary['attachments_failed'] += 1
+                failed_uids.add(uid)
+            if result['error']:
+                summary['errors'].append(result['error'])
         
+        # Checkpoint per batch, once all its uploads are done, so an interrupted run resumes
+        # after the last finished batch; never past an email that has to be fetched again
+        last_uid = max(min(failed_uids) - 1 if failed_uids else batch[-1], last_uid or 0)
+        if not dry_run:
+            update_ingestor_state(supabase, datetime.now(timezone.utc), uid_validity, last_uid, state_table)
+    
+    summary['emails_failed'] = len(failed_uids)
+    end_time = datetime.now(timezone.utc)
+    if not dry_run:
+        update_ingestor_state(supabase, end_time, uid_validity, last_uid, state_table)
+    summary['end_time'] = end_time.isoformat()
+    summary['duration_seconds'] = (end_time - start_time).total_seconds()
+    return summary
+
+
+def _close_imap(mail: imaplib.IMAP4 | None):
+    if mail:
+        try:
+            mail.close()
+            mail.logout()
+        except Exception:
+            pass  # Best-effort IMAP cleanup
+
+
+def run_email_ingestor(
+    supabase: Client,
+    user_email: str,
+    app_password: str,
+    state_table: str = DEFAULT_STATE_TABLE,
+    dry_run: bool = False
+) -> dict[str, Any]:
+    """Connect, ingest everything new since the checkpoint, and disconnect."""
+    mail = None
+    pool = ThreadPoolExecutor(max_workers=EMAIL_INGEST_WORKERS, thread_name_prefix='email-ingest')
+    try:
+        mail = connect_imap(user_email, app_password)
+        return ingest_new_emails(mail, supabase, get_uid_validity(mail), pool, state_table, dry_run)
     except Exception as e:
-        summary['success'] = False
-        summary['error'] = str(e)
+        return {
+            'success': False,
+            'start_time': datetime.now(timezone.utc).isoformat(),
+            'error': str(e)
+        }
     finally:
-        if mail:
-            try:
-                mail.close()
-                mail.logout()
-            except Exception:
-                pass  # Best-effort IMAP cleanup
+        pool.shutdown(wait=True)
+        _close_imap(mail)
+
+
+def _read_idle_line(mail: imaplib.IMAP4, timeout: float) -> bytes | None:
+    """Next line from the server, or None when nothing arrives within timeout."""
+    mail.sock.settimeout(timeout)
+    try:
+        return mail.readline()
+    except TimeoutError:
+        # A socket file that timed out refuses further reads. Servers write whole lines, so
+        # nothing was half-read and a fresh file over the same socket loses nothing.
+        mail.file = mail.sock.makefile('rb')
+        return None
+    finally:
+        mail.sock.settimeout(None)
+
+
+def _is_new_mail_line(line: bytes) -> bool:
+    return line.startswith(b'* ') and line.rstrip().upper().endswith(b' EXISTS')
+
+
+def take_pending_new_mail(mail: imaplib.IMAP4) -> bool:
+    """Clear buffered EXISTS/RECENT responses; True if any reported mail.
+
+    The server reports new mail in the responses to whatever command comes next, and imaplib
+    buffers those in untagged_responses. IDLE does not repeat them, so they have to be checked
+    before going idle or that mail waits for the IDLE timeout.
+    """
+    exists = mail.untagged_responses.pop('EXISTS', None)
+    recent = mail.untagged_responses.pop('RECENT', None)
+    return bool(exists) or any(int(count or 0) for count in recent or [])
+
+
+def wait_for_new_mail(mail: imaplib.IMAP4, timeout: float = IMAP_IDLE_TIMEOUT_SECONDS) -> bool:
+    """IMAP IDLE (RFC 2177) until the server reports new mail or timeout passes; True on new mail."""
+    tag = mail._new_tag()
+    mail.send(tag + b' IDLE\r\n')
+    line = mail.readline()
+    if not line.startswith(b'+'):
+        raise imaplib.IMAP4.error(f"IDLE rejected: {line.decode(errors='replace').strip()}")
     
-    return summary
+    new_mail = False
+    deadline = time.monotonic() + timeout
+    while not new_mail:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        line = _read_idle_line(mail, remaining)
+        if line is None:
+            break
+        if not line:
+            raise imaplib.IMAP4.abort('Connection closed during IDLE')
+        if line.startswith(b'* BYE'):
+            raise imaplib.IMAP4.abort(f"Server closed IDLE: {line.decode(errors='replace').strip()}")
+        new_mail = _is_new_mail_line(line)
+    
+    mail.send(b'DONE\r\n')
+    while True:
+        line = mail.readline()
+        if not line:
+            raise imaplib.IMAP4.abort('Connection closed while ending IDLE')
+        # Mail that arrives between the timeout and DONE is reported here
+        new_mail = new_mail or _is_new_mail_line(line)
+        if line.startswith(tag + b' '):
+            if not line[len(tag) + 1:].upper().startswith(b'OK'):
+                raise imaplib.IMAP4.error(f"IDLE failed: {line.decode(errors='replace').strip()}")
+            return new_mail
+
+
+def run_email_ingestor_daemon(
+    supabase: Client,
+    user_email: str,
+    app_password: str,
+    state_table: str = DEFAULT_STATE_TABLE,
+    dry_run: bool = False
+):
+    """Keep one IMAP connection open and ingest new mail as soon as IDLE reports it. Never returns.
+
+    Every wake-up (new mail or the IDLE timeout) runs an ingest pass from the checkpoint, so
+    nothing is missed across reconnects. The checkpoint stays below emails that failed, and
+    after such a pass IDLE wakes within EMAIL_RETRY_SECONDS to fetch them again. Lost
+    connections are retried with exponential backoff.
+    """
+    pool = ThreadPoolExecutor(max_workers=EMAIL_INGEST_WORKERS, thread_name_prefix='email-ingest')
+    backoff = 1.0
+    while True:
+        mail = None
+        try:
+            mail = connect_imap(user_email, app_password)
+            uid_validity = get_uid_validity(mail)
+            logger.info('Connected to IMAP as %s, waiting for new mail', user_email)
+            while True:
+                # Anything reported up to here is picked up by this pass's UID SEARCH
+                take_pending_new_mail(mail)
+                summary = ingest_new_emails(mail, supabase, uid_validity, pool, state_table, dry_run)
+                backoff = 1.0
+                if summary['emails_failed']:
+                    logger.warning('%d emails failed, retrying within %ds: %s', summary['emails_failed'], EMAIL_RETRY_SECONDS, summary)
+                elif summary['emails_processed']:
+                    logger.info('Ingested new mail: %s', summary)
+                # NOOP collects updates for mail that arrived during the pass; go again rather than idle on it
+                mail.noop()
+                if take_pending_new_mail(mail):
+                    continue
+                wait_for_new_mail(mail, EMAIL_RETRY_SECONDS if summary['emails_failed'] else IMAP_IDLE_TIMEOUT_SECONDS)
+        except Exception as e:
+            logger.error('Email ingestor connection failed, reconnecting in %.0fs: %s', backoff, e)
+        finally:
+            _close_imap(mail)
+        time.sleep(backoff + random.uniform(0, backoff / 2))
+        backoff = min(backoff * 2, IMAP_RECONNECT_BACKOFF_MAX_SECONDS)
 
 
 if __name__ == '__main__':
     import sys
+    import argparse
     from pathlib import Path
     from supabase.client import create_client
     from dotenv import load_dotenv
@@ -278,6 +570,12 @@ if __name__ == '__main__':
     if str(backend_dir) not in sys.path:
         sys.path.insert(0, str(backend_dir))
     
+    parser = argparse.ArgumentParser(description='Ingest CSV attachments from the Gmail inbox')
+    parser.add_argument('--daemon', action='store_true', help='Stay connected and ingest new mail as it arrives (IMAP IDLE)')
+    parser.add_argument('--dry-run', action='store_true', help='Validate attachments without uploading or advancing the checkpoint')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
     load_dotenv()  # Load .env as base
     app_env = os.getenv('APP_ENV', 'development')
     env_file = Path(__file__).parent / f'.env.{app_env}'
@@ -293,11 +591,19 @@ if __name__ == '__main__':
         sys.exit(1)
         
     supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    if args.daemon:
+        print(f"Running email ingestor daemon for {GMAIL_USER_EMAIL}")
+        run_email_ingestor_daemon(
+            supabase=supabase,
+            user_email=GMAIL_USER_EMAIL,
+            app_password=GMAIL_APP_PASSWORD,
+            dry_run=args.dry_run
+        )
     print(f"Running email ingestor for {GMAIL_USER_EMAIL}")
     result = run_email_ingestor(
         supabase=supabase,
         user_email=GMAIL_USER_EMAIL,
         app_password=GMAIL_APP_PASSWORD,
-        dry_run=False
+        dry_run=args.dry_run
     )
     print(result)
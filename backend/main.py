@@ -1,4 +1,6 @@
 import sys
+import json
+import base64
 import logging
 import pathlib
 
@@ -6,22 +8,37 @@ backend_dir = pathlib.Path(__file__).parent
 if str(backend_dir) not in sys.path:
     sys.path.insert(0, str(backend_dir))
 
-from fastapi import FastAPI, HTTPException, Query, Path, UploadFile, File, Body, Depends
+from fastapi import FastAPI, HTTPException, Query, Path, UploadFile, File, Body, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response
 from fastapi.security import HTTPBearer
+from starlette.formparsers import MultiPartParser
 from datetime import date, datetime, timedelta
 import pytz
 from supabase.client import create_client, Client
 import os
 from dotenv import load_dotenv
 import polars as pl
-from data.schemas.df_schemas import User, GameDataS, AgentS, PlayerS
-from utils.auth_utils import create_get_current_user
+from data.schemas.df_schemas import User
+from utils.auth_utils import create_get_current_user, TokenCache, JwksCache
 from utils.datetime_utils import resolve_date_range, get_last_thursday_12am_texas
-from data.schemas.web_schemas import UpsertAgentRequest, UpsertPlayerRequest, UpsertRealNameRequest, UpsertDealRuleRequest
+from data.schemas.web_schemas import UpsertAgentRequest, UpsertPlayerRequest, UpsertRealNameRequest, UpsertDealRuleRequest, TelegramMessageItem
 from data.csv_upload import upload_csv_to_games
-from utils.audit_log import log_operation
-import tempfile
+from utils.audit_log import AuditLogWriter
+from data.db import run_query, run_sync, gather_queries, shutdown_executor
+from data.reference_cache import ReferenceCache
+from data.ledger import TABLE_LEDGER_TOTALS, fetch_lifetime_profits
+from data.games_stream import iter_games_pages, fetch_all_games, primed, stream_json, stream_ndjson
+from data.games_replica import create_games_replica
+from data.data_version import DataVersion
+from data.report_cache import ReportCache
+from data.ingest_jobs import IngestJobQueue
+from utils.telegram_client import create_telegram_client
+from utils.etags import make_etag, etag_matches
+from utils.response_formats import negotiate_format, frame_response, BINARY_FORMATS, FORMAT_JSON, FORMAT_NDJSON, FORMAT_ARROW, FORMAT_PARQUET
+from contextlib import asynccontextmanager
+import asyncio
+import uuid
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -44,7 +61,36 @@ if env_file.exists():
 
 logger.info(f'Running in {app_env} mode')
 
-app = FastAPI(title='Poker Accounting System', version='1.0.0')
+# Uploaded files stay in memory up to this size and only spill to a temp file above it
+CSV_UPLOAD_SPOOL_MAX_BYTES = int(os.getenv('CSV_UPLOAD_SPOOL_MAX_BYTES', str(16 * 1024 * 1024)))
+MultiPartParser.spool_max_size = CSV_UPLOAD_SPOOL_MAX_BYTES
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    replica_task = None
+    if games_replica is not None:
+        # Bootstrap (or catch up) in the background; reads use PostgREST until the replica is ready
+        replica_task = asyncio.create_task(games_replica.sync())
+    # Load signing keys up front; requests arriving first wait on this same fetch
+    jwks_cache.start()
+    audit_writer.start()
+    ingest_jobs.start()
+    if telegram_client is not None:
+        telegram_client.start()
+    yield
+    if telegram_client is not None:
+        await telegram_client.stop()
+    await ingest_jobs.stop()
+    # After the ingest workers, whose post-upload hooks still log
+    await audit_writer.stop()
+    await jwks_cache.stop()
+    if replica_task is not None and not replica_task.done():
+        replica_task.cancel()
+    shutdown_executor()
+
+
+app = FastAPI(title='Poker Accounting System', version='1.0.0', lifespan=lifespan)
 
 _allowed_origins_raw = os.getenv('ALLOWED_ORIGINS', 'http://localhost:5173,http://localhost:3000')
 _allowed_origins = [o.strip() for o in _allowed_origins_raw.split(',') if o.strip()]
@@ -54,7 +100,8 @@ app.add_middleware(
     allow_origins=_allowed_origins,
     allow_credentials=True,
     allow_methods=['GET', 'POST'],
-    allow_headers=['Authorization', 'Content-Type'],
+    allow_headers=['Authorization', 'Content-Type', 'If-None-Match'],
+    expose_headers=['Content-Disposition', 'X-Row-Count', 'ETag'],
 )
 
 SUPABASE_URL = os.getenv('SUPABASE_URL')
@@ -85,8 +132,16 @@ except Exception as e:
     )
     raise ValueError(error_msg)
 
+reference_cache = ReferenceCache(supabase)
+games_replica = create_games_replica(supabase)
+data_version = DataVersion(supabase)
+report_cache = ReportCache(supabase, data_version)
+audit_writer = AuditLogWriter(supabase)
+
 security = HTTPBearer()
-get_current_user = create_get_current_user(security, SUPABASE_URL, SUPABASE_KEY, SUPABASE_JWT_SECRET)
+jwks_cache = JwksCache(SUPABASE_URL, SUPABASE_KEY)
+token_cache = TokenCache()
+get_current_user = create_get_current_user(security, jwks_cache, SUPABASE_JWT_SECRET, token_cache)
 
 
 def response_to_lazyframe(response_data: list) -> pl.LazyFrame:
@@ -95,6 +150,68 @@ def response_to_lazyframe(response_data: list) -> pl.LazyFrame:
     return pl.DataFrame(response_data).lazy()
 
 
+async def not_modified(request: Request, response: Response, *parts) -> Response | None:
+    """Tag a report response with the current data version; a 304 when the client already holds it."""
+    try:
+        version = await data_version.get()
+    except Exception as e:
+        logger.warning('Data version lookup failed, serving report without ETag: %s', e)
+        return None
+    etag = make_etag(version, request.url.path, *parts)
+    # no-cache: browsers keep the body but revalidate with If-None-Match on every request
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+async def read_games_replica(**filters) -> pl.DataFrame | None:
+    """Games matching fetch_all_games-style filters from the local replica, or None to fall back to PostgREST."""
+    if games_replica is None or not games_replica.ready:
+        return None
+    try:
+        await games_replica.ensure_fresh()
+        return await run_sync(games_replica.scan(**filters).collect)
+    except Exception as e:
+        logger.warning('Games replica read failed, falling back to PostgREST: %s', e)
+        return None
+
+
+async def after_csv_upload(result: dict, filename: str, user: User):
+    """Refresh caches for the uploaded date range and audit-log the upload."""
+    if games_replica is not None:
+        games_replica.request_sync()
+    data_version.invalidate()
+    report_cache.invalidate_range(result.get('date_started_min'), result.get('date_ended_max'))
+    
+    await audit_writer.log(
+        user=user,
+        operation_type='CREATE',
+        table_name=TABLE_GAMES,
+        record_id=None,
+        operation_data={
+            'filename': filename,
+            'rows_processed': result.get('rows_processed', 0),
+            'rows_inserted': result.get('rows_inserted', 0),
+            'rows_skipped': result.get('rows_skipped', 0),
+            'rows_failed': result.get('rows_failed', 0)
+        }
+    )
+
+
+async def after_ingest_job(job: dict, result: dict):
+    await after_csv_upload(result, job['filename'], User(id=job['created_by'], email=job['created_by_email']))
+
+
+ingest_jobs = IngestJobQueue(supabase, on_success=after_ingest_job)
+
+telegram_client = create_telegram_client()
+
+# Upper bound on (agent_id, message) pairs accepted by /send_telegram_messages
+TELEGRAM_BATCH_MAX_MESSAGES = int(os.getenv('TELEGRAM_BATCH_MAX_MESSAGES', '500'))
+
+
 @app.get('/')
 async def root():
     return {'message': 'Tiberius Accounting System API'}
@@ -103,7 +220,7 @@ async def root():
 @app.get('/health')
 async def health_check():
     try:
-        supabase.table('agents').select('agent_id').limit(1).execute()
+        await run_query(supabase.table('agents').select('agent_id').limit(1))
         return {
             'status': 'healthy',
             'supabase': 'connected',
@@ -118,11 +235,27 @@ async def health_check():
         }
 
 
+@app.get('/metrics')
+async def get_metrics(current_user: User = Depends(get_current_user)):
+    """In-process cache and queue counters for this worker."""
+    return {
+        'reference_cache': reference_cache.stats(),
+        'games_replica': games_replica.stats() if games_replica is not None else None,
+        'data_version': data_version.stats(),
+        'report_cache': report_cache.stats(),
+        'ingest_jobs': ingest_jobs.stats(),
+        'telegram': telegram_client.stats() if telegram_client is not None else None,
+        'token_cache': token_cache.stats(),
+        'jwks': jwks_cache.stats(),
+        'audit_log': audit_writer.stats(),
+    }
+
+
 @app.post('/auth/lookup-email')
 async def lookup_email_by_username(username: str = Query(..., description='Username to look up')):
     """Look up email address by username. No authentication required for this endpoint."""
     try:
-        response = supabase.rpc('get_email_by_username', {'username_param': username}).execute()
+        response = await run_query(supabase.rpc('get_email_by_username', {'username_param': username}))
         if not response.data or len(response.data) == 0:
             raise HTTPException(status_code=404, detail='Username not found')
         email_row = response.data[0] if isinstance(response.data[0], dict) else None
@@ -146,18 +279,20 @@ async def create_username(username_data: dict = Body(...), current_user: User =
         if not username:
             raise HTTPException(status_code=400, detail='Username is required')
         
-        existing = supabase.table('user_usernames').select('*').eq('username', username).execute()
+        existing, existing_user = await gather_queries(
+            supabase.table('user_usernames').select('*').eq('username', username),
+            supabase.table('user_usernames').select('*').eq('user_id', current_user.id),
+        )
         if existing.data:
             raise HTTPException(status_code=409, detail='Username already taken')
 
-        existing_user = supabase.table('user_usernames').select('*').eq('user_id', current_user.id).execute()
         if existing_user.data:
-            supabase.table('user_usernames').update({'username': username}).eq('user_id', current_user.id).execute()
+            await run_query(supabase.table('user_usernames').update({'username': username}).eq('user_id', current_user.id))
         else:
-            supabase.table('user_usernames').insert({
+            await run_query(supabase.table('user_usernames').insert({
                 'user_id': current_user.id,
                 'username': username
-            }).execute()
+            }))
         
         return {'message': 'Username created successfully', 'username': username}
     except HTTPException:
@@ -168,20 +303,36 @@ async def create_username(username_data: dict = Body(...), current_user: User =
 
 @app.get('/get_data')
 async def get_data(
+    request: Request,
     start_date: date | None = Query(None, description='Start date for the query'),
     end_date: date | None = Query(None, description='End date for the query'),
     club_code: str | None = Query(None, description='Club code for the query'),
     lookback_days: int | None = Query(None, description='Optional lookback period in days'),
+    format: str | None = Query(None, description="Response format: 'json' (default), 'ndjson', 'arrow' or 'parquet'"),
     current_user: User = Depends(get_current_user),
 ):
+    """Stream games rows page by page; the body is the usual {data, count} JSON unless another format is negotiated."""
     try:
         resolved_start, resolved_end = resolve_date_range(lookback_days, start_date, end_date)
-        query = supabase.table(TABLE_GAMES).select('*').gte(GameDataS.date_started, resolved_start.isoformat()).lte(GameDataS.date_ended, resolved_end.isoformat())
-        if club_code:
-            query = query.eq(GameDataS.club_code, club_code)
-        
-        response = query.execute()
-        return {'data': response.data, 'count': len(response.data)}
+        response_format = negotiate_format(request, format, (FORMAT_JSON, FORMAT_NDJSON, FORMAT_ARROW, FORMAT_PARQUET))
+
+        if response_format in BINARY_FORMATS:
+            games = await read_games_replica(start_date=resolved_start, end_date=resolved_end, club_code=club_code)
+            if games is None:
+                games_data = await fetch_all_games(supabase, start_date=resolved_start, end_date=resolved_end, club_code=club_code)
+                games = pl.DataFrame(games_data, infer_schema_length=None)
+            return await frame_response(games, response_format, 'games')
+
+        pages = await primed(iter_games_pages(
+            supabase,
+            start_date=resolved_start,
+            end_date=resolved_end,
+            club_code=club_code,
+        ))
+
+        if response_format == FORMAT_NDJSON:
+            return StreamingResponse(stream_ndjson(pages), media_type='application/x-ndjson')
+        return StreamingResponse(stream_json(pages), media_type='application/json')
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -190,21 +341,31 @@ async def get_data(
 
 @app.get('/get_aggregated_data')
 async def get_aggregated_data(
+    request: Request,
     start_date: date | None = Query(None, description="Start date for the query"),
     end_date: date | None = Query(None, description="End date for the query"),
     lookback_days: int | None = Query(None, description="Optional lookback period in days"),
     club_code: str | None = Query(None, description="Club code for the query"),
+    format: str | None = Query(None, description="Response format: 'json' (default), 'arrow' or 'parquet'"),
     current_user: User = Depends(get_current_user),
 ):
     try:
         resolved_start, resolved_end = resolve_date_range(lookback_days, start_date, end_date)
+        response_format = negotiate_format(request, format, (FORMAT_JSON, FORMAT_ARROW, FORMAT_PARQUET))
         
-        response = supabase.table(TABLE_GAMES).select('*').gte('date_started', resolved_start.isoformat()).lte('date_ended', resolved_end.isoformat()).execute()
-        
-        if not response.data:
-            return {"data": [], "count": 0}
-
-        df = response_to_lazyframe(response.data)
+        games = await read_games_replica(
+            start_date=resolved_start,
+            end_date=resolved_end,
+            club_code=club_code,
+            columns=['player_id', 'player_name', 'profit', 'tips'],
+        )
+        if games is None:
+            games_data = await fetch_all_games(supabase, start_date=resolved_start, end_date=resolved_end, club_code=club_code)
+            games = pl.DataFrame(games_data, infer_schema_length=None)
+        if games.height == 0:
+            # Typed empty input so an empty binary response still carries the aggregate's columns
+            games = pl.DataFrame(schema={'player_id': pl.Utf8, 'player_name': pl.Utf8, 'profit': pl.Float64, 'tips': pl.Float64})
+        df = games.lazy()
 
         aggregated = (
             df
@@ -224,6 +385,9 @@ async def get_aggregated_data(
             .collect()
         )
 
+        if response_format in BINARY_FORMATS:
+            return await frame_response(aggregated, response_format, 'aggregated_data')
+
         result_data = aggregated.to_dicts()
         return {"data": result_data, "count": len(result_data)}
     except ValueError as e:
@@ -235,8 +399,8 @@ async def get_aggregated_data(
 @app.get('/get_agents')
 async def get_agents(current_user: User = Depends(get_current_user)):
     try:
-        response = supabase.table(TABLE_AGENTS).select('*').execute()
-        return {'data': response.data, 'count': len(response.data)}
+        agents = (await reference_cache.get(TABLE_AGENTS)).rows
+        return {'data': agents, 'count': len(agents)}
     except Exception as e:
         raise _internal_error('Failed to fetch agents', e)
 
@@ -244,17 +408,15 @@ async def get_agents(current_user: User = Depends(get_current_user)):
 @app.get('/get_players')
 async def get_players(current_user: User = Depends(get_current_user)):
     try:
-        players_response = supabase.table(TABLE_PLAYERS).select('*').execute()
-        agents_response = supabase.table(TABLE_AGENTS).select('agent_id, agent_name').execute()
-        agents_map = {agent['agent_id']: agent['agent_name'] for agent in agents_response.data}
-        real_names_response = supabase.table('real_name_mapping').select('player_id, agent_id, real_name').execute()
+        players, agents, real_names = await reference_cache.get_many(TABLE_PLAYERS, TABLE_AGENTS, 'real_name_mapping')
+        agents_map = {agent['agent_id']: agent['agent_name'] for agent in agents.rows}
         real_names_map = {}
-        for rn in real_names_response.data:
+        for rn in real_names.rows:
             key = (str(rn['player_id']), rn['agent_id'])
             real_names_map[key] = rn['real_name']
         
         players_data = []
-        for player in players_response.data:
+        for player in players.rows:
             player_dict = dict(player)
             agent_id = player.get('agent_id')
             player_id = player.get('player_id')
@@ -273,6 +435,8 @@ async def get_players(current_user: User = Depends(get_current_user)):
 
 @app.get('/get_agent_report')
 async def get_agent_report(
+    request: Request,
+    response: Response,
     start_date: date | None = Query(None, description="Start date for the query"),
     end_date: date | None = Query(None, description="End date for the query"),
     lookback_days: int | None = Query(None, description="Optional lookback period in days"),
@@ -280,16 +444,13 @@ async def get_agent_report(
 ):
     try:
         resolved_start, resolved_end = resolve_date_range(lookback_days, start_date, end_date)
+        cached = await not_modified(request, response, resolved_start, resolved_end)
+        if cached is not None:
+            return cached
         
-        response = supabase.rpc(
-            'get_agent_report',
-            {
-                'start_date_param': resolved_start.isoformat(),
-                'end_date_param': resolved_end.isoformat()
-            }
-        ).execute()
+        report = await report_cache.get('get_agent_report', resolved_start, resolved_end)
         
-        return {'data': response.data, 'count': len(response.data)}
+        return {'data': report, 'count': len(report)}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -298,6 +459,8 @@ async def get_agent_report(
 
 @app.get('/get_detailed_agent_report')
 async def get_detailed_agent_report(
+    request: Request,
+    response: Response,
     start_date: date | None = Query(None, description="Start date for the query"),
     end_date: date | None = Query(None, description="End date for the query"),
     lookback_days: int | None = Query(None, description="Optional lookback period in days"),
@@ -306,25 +469,14 @@ async def get_detailed_agent_report(
 ):
     try:
         resolved_start, resolved_end = resolve_date_range(lookback_days, start_date, end_date)
+        cached = await not_modified(request, response, resolved_start, resolved_end, group_by)
+        if cached is not None:
+            return cached
         
-        if group_by == 'real_name':
-            response = supabase.rpc(
-                'get_detailed_agent_report_by_real_name',
-                {
-                    'start_date_param': resolved_start.isoformat(),
-                    'end_date_param': resolved_end.isoformat()
-                }
-            ).execute()
-        else:
-            response = supabase.rpc(
-                'get_detailed_agent_report',
-                {
-                    'start_date_param': resolved_start.isoformat(),
-                    'end_date_param': resolved_end.isoformat()
-                }
-            ).execute()
+        detailed_function = 'get_detailed_agent_report_by_real_name' if group_by == 'real_name' else 'get_detailed_agent_report'
+        report = await report_cache.get(detailed_function, resolved_start, resolved_end, group_by)
         
-        return {'data': response.data, 'count': len(response.data)}
+        return {'data': report, 'count': len(report)}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -333,6 +485,8 @@ async def get_detailed_agent_report(
 
 @app.get('/get_agent_reports')
 async def get_agent_reports(
+    request: Request,
+    response: Response,
     start_date: date | None = Query(None, description="Start date for the query"),
     end_date: date | None = Query(None, description="End date for the query"),
     lookback_days: int | None = Query(None, description="Optional lookback period in days"),
@@ -342,40 +496,24 @@ async def get_agent_reports(
     """Combined endpoint that returns both aggregated and detailed agent reports in one call."""
     try:
         resolved_start, resolved_end = resolve_date_range(lookback_days, start_date, end_date)
+        cached = await not_modified(request, response, resolved_start, resolved_end, group_by)
+        if cached is not None:
+            return cached
         
-        aggregated_response = supabase.rpc(
-            'get_agent_report',
-            {
-                'start_date_param': resolved_start.isoformat(),
-                'end_date_param': resolved_end.isoformat()
-            }
-        ).execute()
-        
-        if group_by == 'real_name':
-            detailed_response = supabase.rpc(
-                'get_detailed_agent_report_by_real_name',
-                {
-                    'start_date_param': resolved_start.isoformat(),
-                    'end_date_param': resolved_end.isoformat()
-                }
-            ).execute()
-        else:
-            detailed_response = supabase.rpc(
-                'get_detailed_agent_report',
-                {
-                    'start_date_param': resolved_start.isoformat(),
-                    'end_date_param': resolved_end.isoformat()
-                }
-            ).execute()
+        detailed_function = 'get_detailed_agent_report_by_real_name' if group_by == 'real_name' else 'get_detailed_agent_report'
+        aggregated, detailed = await asyncio.gather(
+            report_cache.get('get_agent_report', resolved_start, resolved_end),
+            report_cache.get(detailed_function, resolved_start, resolved_end, group_by),
+        )
         
         return {
             'aggregated': {
-                'data': aggregated_response.data,
-                'count': len(aggregated_response.data)
+                'data': aggregated,
+                'count': len(aggregated)
             },
             'detailed': {
-                'data': detailed_response.data,
-                'count': len(detailed_response.data)
+                'data': detailed,
+                'count': len(detailed)
             }
         }
     except ValueError as e:
@@ -389,9 +527,15 @@ async def get_data_errors(
     current_user: User = Depends(get_current_user),
 ):
     try:
-        players_in_games_not_in_players_response = supabase.rpc('get_players_in_games_not_in_players', {}).execute()
-        players_not_mapped_to_agents_response = supabase.rpc('get_players_not_mapped_to_agents', {}).execute()
-        agents_not_mapped_to_deal_rules_response = supabase.rpc('get_agents_not_mapped_to_deal_rules', {}).execute()
+        (
+            players_in_games_not_in_players_response,
+            players_not_mapped_to_agents_response,
+            agents_not_mapped_to_deal_rules_response,
+        ) = await gather_queries(
+            supabase.rpc('get_players_in_games_not_in_players', {}),
+            supabase.rpc('get_players_not_mapped_to_agents', {}),
+            supabase.rpc('get_agents_not_mapped_to_deal_rules', {}),
+        )
         
         return {
             'players_in_games_not_in_players': {
@@ -413,24 +557,39 @@ async def get_data_errors(
 
 @app.get('/get_player_history')
 async def get_player_history(
+    request: Request,
     start_date: date | None = Query(None, description="Start date for the query"),
     end_date: date | None = Query(None, description="End date for the query"),
     player_ids: str = Query(..., description='Comma-separated list of player IDs'),
     lookback_days: int | None = Query(None, description="Optional lookback period in days"),
+    format: str | None = Query(None, description="Response format: 'json' (default), or 'arrow'/'parquet' for the individual records only"),
     current_user: User = Depends(get_current_user),
 ):
     try:
         player_id_list = [pid.strip() for pid in player_ids.split(',')]
+        response_format = negotiate_format(request, format, (FORMAT_JSON, FORMAT_ARROW, FORMAT_PARQUET))
         
-        query = supabase.table(TABLE_GAMES).select('*').in_('player_id', player_id_list)
-        
+        resolved_start, resolved_end = None, None
         if lookback_days is not None or (start_date is not None and end_date is not None):
             resolved_start, resolved_end = resolve_date_range(lookback_days, start_date, end_date)
-            query = query.gte('date_started', resolved_start.isoformat()).lte('date_ended', resolved_end.isoformat())
         
-        games_response = query.execute()
+        # Players and agents don't depend on the games result, so fetch all three at once
+        replica_games, (players, agents) = await asyncio.gather(
+            read_games_replica(start_date=resolved_start, end_date=resolved_end, player_ids=player_id_list),
+            reference_cache.get_many(TABLE_PLAYERS, TABLE_AGENTS),
+        )
+        if response_format in BINARY_FORMATS:
+            if replica_games is None:
+                games_data = await fetch_all_games(supabase, start_date=resolved_start, end_date=resolved_end, player_ids=player_id_list)
+                replica_games = pl.DataFrame(games_data, infer_schema_length=None)
+            return await frame_response(replica_games, response_format, 'player_history')
+
+        if replica_games is not None:
+            games_data = replica_games.to_dicts()
+        else:
+            games_data = await fetch_all_games(supabase, start_date=resolved_start, end_date=resolved_end, player_ids=player_id_list)
         
-        if not games_response.data:
+        if not games_data:
             return {
                 "aggregated": [],
                 "individual_records": [],
@@ -439,23 +598,19 @@ async def get_player_history(
                 "source_csvs": []
             }
         
-        games_df = response_to_lazyframe(games_response.data)
-        players_response = supabase.table(TABLE_PLAYERS).select('player_id, agent_id').execute()
+        games_df = response_to_lazyframe(games_data)
         players_df = None
         agents_df = None
         
-        if players_response.data:
-            players_df = response_to_lazyframe(players_response.data)
+        if players.rows:
+            players_df = players.frame.lazy()
             players_df = players_df.select([
                 pl.col('player_id').cast(pl.Utf8).alias('player_id_str'),
                 pl.col('agent_id')
             ])
             
-            agent_ids = response_to_lazyframe(players_response.data).select('agent_id').unique().filter(pl.col('agent_id').is_not_null()).collect().to_series().to_list()
-            if agent_ids:
-                agents_response = supabase.table(TABLE_AGENTS).select('agent_id, deal_percent').in_('agent_id', agent_ids).execute()
-                if agents_response.data:
-                    agents_df = response_to_lazyframe(agents_response.data)
+            if agents.rows:
+                agents_df = agents.frame.lazy().select(['agent_id', 'deal_percent'])
         
         if players_df is not None:
             games_with_players = games_df.join(
@@ -501,14 +656,14 @@ async def get_player_history(
         )
         
         aggregated_data = aggregated.to_dicts()
-        individual_records = games_response.data
+        individual_records = games_data
 
         # Fetch source CSVs by game_code
-        game_codes = list({row['game_code'] for row in games_response.data if row.get('game_code')})
+        game_codes = list({row['game_code'] for row in games_data if row.get('game_code')})
         source_csvs = []
         if game_codes:
             try:
-                csvs_response = supabase.table('uploaded_csvs').select('id,filename,game_code,row_count,uploaded_at').in_('game_code', game_codes).execute()
+                csvs_response = await run_query(supabase.table('uploaded_csvs').select('id,filename,game_code,row_count,uploaded_at').in_('game_code', game_codes))
                 source_csvs = csvs_response.data or []
             except Exception:
                 pass
@@ -543,16 +698,17 @@ async def upsert_agent(agent_data: UpsertAgentRequest, current_user: User = Depe
         data = {k: v for k, v in data.items() if v is not None or k == 'deal_percent'}
         
         if agent_data.agent_id is not None:
-            check_response = supabase.table(TABLE_AGENTS).select('*').eq('agent_id', agent_data.agent_id).execute()
+            check_response = await run_query(supabase.table(TABLE_AGENTS).select('*').eq('agent_id', agent_data.agent_id))
             if not check_response.data:
                 raise HTTPException(status_code=404, detail=f'Agent with ID {agent_data.agent_id} not found')
             
-            response = supabase.table(TABLE_AGENTS).update(data).eq('agent_id', agent_data.agent_id).execute()
+            response = await run_query(supabase.table(TABLE_AGENTS).update(data).eq('agent_id', agent_data.agent_id))
             if not response.data:
                 raise HTTPException(status_code=500, detail='Failed to update agent')
+            reference_cache.patch(TABLE_AGENTS, response.data[0])
+            data_version.invalidate()
             
-            log_operation(
-                supabase=supabase,
+            await audit_writer.log(
                 user=current_user,
                 operation_type='UPDATE',
                 table_name=TABLE_AGENTS,
@@ -562,13 +718,14 @@ async def upsert_agent(agent_data: UpsertAgentRequest, current_user: User = Depe
             
             return {'data': response.data[0], 'message': 'Agent updated successfully'}
         else:
-            response = supabase.table(TABLE_AGENTS).insert(data).execute()
+            response = await run_query(supabase.table(TABLE_AGENTS).insert(data))
             if not response.data:
                 raise HTTPException(status_code=500, detail='Failed to create agent')
+            reference_cache.patch(TABLE_AGENTS, response.data[0])
+            data_version.invalidate()
             
             created_agent_id = response.data[0].get('agent_id')
-            log_operation(
-                supabase=supabase,
+            await audit_writer.log(
                 user=current_user,
                 operation_type='CREATE',
                 table_name=TABLE_AGENTS,
@@ -590,7 +747,7 @@ async def upsert_player(player_data: UpsertPlayerRequest, current_user: User = D
             raise HTTPException(status_code=400, detail='player_id is required')
         
         if player_data.agent_id is not None:
-            agent_check = supabase.table(TABLE_AGENTS).select('agent_id').eq('agent_id', player_data.agent_id).execute()
+            agent_check = await run_query(supabase.table(TABLE_AGENTS).select('agent_id').eq('agent_id', player_data.agent_id))
             if not agent_check.data:
                 raise HTTPException(status_code=404, detail=f'Agent with ID {player_data.agent_id} not found')
         
@@ -607,15 +764,16 @@ async def upsert_player(player_data: UpsertPlayerRequest, current_user: User = D
         }
         data = {k: v for k, v in data.items() if v is not None or k in ['is_blocked', 'weekly_credit_adjustment', 'player_id']}
         
-        check_response = supabase.table(TABLE_PLAYERS).select('*').eq('player_id', player_data.player_id).execute()
+        check_response = await run_query(supabase.table(TABLE_PLAYERS).select('*').eq('player_id', player_data.player_id))
         
         if check_response.data:
-            response = supabase.table(TABLE_PLAYERS).update(data).eq('player_id', player_data.player_id).execute()
+            response = await run_query(supabase.table(TABLE_PLAYERS).update(data).eq('player_id', player_data.player_id))
             if not response.data:
                 raise HTTPException(status_code=500, detail='Failed to update player')
+            reference_cache.patch(TABLE_PLAYERS, response.data[0])
+            data_version.invalidate()
             
-            log_operation(
-                supabase=supabase,
+            await audit_writer.log(
                 user=current_user,
                 operation_type='UPDATE',
                 table_name=TABLE_PLAYERS,
@@ -625,13 +783,14 @@ async def upsert_player(player_data: UpsertPlayerRequest, current_user: User = D
             
             return {'data': response.data[0], 'message': 'Player updated successfully'}
         else:
-            response = supabase.table(TABLE_PLAYERS).insert(data).execute()
+            response = await run_query(supabase.table(TABLE_PLAYERS).insert(data))
             if not response.data:
                 raise HTTPException(status_code=500, detail='Failed to create player')
+            reference_cache.patch(TABLE_PLAYERS, response.data[0])
+            data_version.invalidate()
             
             created_player_id = response.data[0].get('player_id')
-            log_operation(
-                supabase=supabase,
+            await audit_writer.log(
                 user=current_user,
                 operation_type='CREATE',
                 table_name=TABLE_PLAYERS,
@@ -649,14 +808,12 @@ async def upsert_player(player_data: UpsertPlayerRequest, current_user: User = D
 @app.get('/get_real_names')
 async def get_real_names(current_user: User = Depends(get_current_user)):
     try:
-        real_names_response = supabase.table('real_name_mapping').select('*').execute()
-        agents_response = supabase.table(TABLE_AGENTS).select('agent_id, agent_name').execute()
-        agents_map = {agent['agent_id']: agent['agent_name'] for agent in agents_response.data}
-        players_response = supabase.table(TABLE_PLAYERS).select('player_id, player_name').execute()
-        players_map = {str(player['player_id']): player['player_name'] for player in players_response.data}
+        real_names, agents, players = await reference_cache.get_many('real_name_mapping', TABLE_AGENTS, TABLE_PLAYERS)
+        agents_map = {agent['agent_id']: agent['agent_name'] for agent in agents.rows}
+        players_map = {str(player['player_id']): player['player_name'] for player in players.rows}
 
         data = []
-        for row in real_names_response.data:
+        for row in real_names.rows:
             row_dict = dict(row)
             agent_id = row_dict.get('agent_id')
             player_id = row_dict.get('player_id')
@@ -672,12 +829,11 @@ async def get_real_names(current_user: User = Depends(get_current_user)):
 @app.get('/get_deal_rules')
 async def get_deal_rules(current_user: User = Depends(get_current_user)):
     try:
-        rules_response = supabase.table('agent_deal_percent_rules').select('*').execute()
-        agents_response = supabase.table(TABLE_AGENTS).select('agent_id, agent_name').execute()
-        agents_map = {agent['agent_id']: agent['agent_name'] for agent in agents_response.data}
+        rules, agents = await reference_cache.get_many('agent_deal_percent_rules', TABLE_AGENTS)
+        agents_map = {agent['agent_id']: agent['agent_name'] for agent in agents.rows}
 
         data = []
-        for row in rules_response.data:
+        for row in rules.rows:
             row_dict = dict(row)
             agent_id = row_dict.get('agent_id')
             row_dict['agent_name'] = agents_map.get(agent_id) if agent_id else None
@@ -691,7 +847,7 @@ async def get_deal_rules(current_user: User = Depends(get_current_user)):
 @app.post('/real_names/upsert')
 async def upsert_real_name(real_name_data: UpsertRealNameRequest, current_user: User = Depends(get_current_user)):
     try:
-        agent_check = supabase.table(TABLE_AGENTS).select('agent_id').eq('agent_id', real_name_data.agent_id).execute()
+        agent_check = await run_query(supabase.table(TABLE_AGENTS).select('agent_id').eq('agent_id', real_name_data.agent_id))
         if not agent_check.data:
             raise HTTPException(status_code=404, detail=f'Agent with ID {real_name_data.agent_id} not found')
 
@@ -702,16 +858,17 @@ async def upsert_real_name(real_name_data: UpsertRealNameRequest, current_user:
         }
         
         if real_name_data.id is not None:
-            check_response = supabase.table('real_name_mapping').select('*').eq('id', real_name_data.id).execute()
+            check_response = await run_query(supabase.table('real_name_mapping').select('*').eq('id', real_name_data.id))
             if not check_response.data:
                 raise HTTPException(status_code=404, detail=f'Real name mapping with ID {real_name_data.id} not found')
             
-            response = supabase.table('real_name_mapping').update(data).eq('id', real_name_data.id).execute()
+            response = await run_query(supabase.table('real_name_mapping').update(data).eq('id', real_name_data.id))
             if not response.data:
                 raise HTTPException(status_code=500, detail='Failed to update real name mapping')
+            reference_cache.patch('real_name_mapping', response.data[0])
+            data_version.invalidate()
             
-            log_operation(
-                supabase=supabase,
+            await audit_writer.log(
                 user=current_user,
                 operation_type='UPDATE',
                 table_name='real_name_mapping',
@@ -721,13 +878,14 @@ async def upsert_real_name(real_name_data: UpsertRealNameRequest, current_user:
             
             return {'data': response.data[0], 'message': 'Real name mapping updated successfully'}
         else:
-            response = supabase.table('real_name_mapping').insert(data).execute()
+            response = await run_query(supabase.table('real_name_mapping').insert(data))
             if not response.data:
                 raise HTTPException(status_code=500, detail='Failed to create real name mapping')
+            reference_cache.patch('real_name_mapping', response.data[0])
+            data_version.invalidate()
             
             created_id = response.data[0].get('id')
-            log_operation(
-                supabase=supabase,
+            await audit_writer.log(
                 user=current_user,
                 operation_type='CREATE',
                 table_name='real_name_mapping',
@@ -745,7 +903,7 @@ async def upsert_real_name(real_name_data: UpsertRealNameRequest, current_user:
 @app.post('/deal_rules/upsert')
 async def upsert_deal_rule(deal_rule_data: UpsertDealRuleRequest, current_user: User = Depends(get_current_user)):
     try:
-        agent_check = supabase.table(TABLE_AGENTS).select('agent_id').eq('agent_id', deal_rule_data.agent_id).execute()
+        agent_check = await run_query(supabase.table(TABLE_AGENTS).select('agent_id').eq('agent_id', deal_rule_data.agent_id))
         if not agent_check.data:
             raise HTTPException(status_code=404, detail=f'Agent with ID {deal_rule_data.agent_id} not found')
 
@@ -759,12 +917,12 @@ async def upsert_deal_rule(deal_rule_data: UpsertDealRuleRequest, current_user:
         }
         
         if deal_rule_data.id is not None:
-            check_response = supabase.table('agent_deal_percent_rules').select('*').eq('id', deal_rule_data.id).execute()
+            check_response = await run_query(supabase.table('agent_deal_percent_rules').select('*').eq('id', deal_rule_data.id))
             if not check_response.data:
                 raise HTTPException(status_code=404, detail=f'Deal rule with ID {deal_rule_data.id} not found')
 
             try:
-                response = supabase.table('agent_deal_percent_rules').update(data).eq('id', deal_rule_data.id).execute()
+                response = await run_query(supabase.table('agent_deal_percent_rules').update(data).eq('id', deal_rule_data.id))
             except Exception as update_err:
                 err_str = str(update_err).lower()
                 if 'unique' in err_str or 'duplicate' in err_str or 'unique_agent_player_threshold' in err_str:
@@ -772,9 +930,10 @@ async def upsert_deal_rule(deal_rule_data: UpsertDealRuleRequest, current_user:
                 raise
             if not response.data:
                 raise HTTPException(status_code=500, detail='Failed to update deal rule')
+            reference_cache.patch('agent_deal_percent_rules', response.data[0])
+            data_version.invalidate()
 
-            log_operation(
-                supabase=supabase,
+            await audit_writer.log(
                 user=current_user,
                 operation_type='UPDATE',
                 table_name='agent_deal_percent_rules',
@@ -785,7 +944,7 @@ async def upsert_deal_rule(deal_rule_data: UpsertDealRuleRequest, current_user:
             return {'data': response.data[0], 'message': 'Deal rule updated successfully'}
         else:
             try:
-                response = supabase.table('agent_deal_percent_rules').insert(data).execute()
+                response = await run_query(supabase.table('agent_deal_percent_rules').insert(data))
             except Exception as insert_err:
                 err_str = str(insert_err).lower()
                 if 'unique' in err_str or 'duplicate' in err_str or 'unique_agent_player_threshold' in err_str:
@@ -793,10 +952,11 @@ async def upsert_deal_rule(deal_rule_data: UpsertDealRuleRequest, current_user:
                 raise
             if not response.data:
                 raise HTTPException(status_code=500, detail='Failed to create deal rule')
+            reference_cache.patch('agent_deal_percent_rules', response.data[0])
+            data_version.invalidate()
 
             created_id = response.data[0].get('id')
-            log_operation(
-                supabase=supabase,
+            await audit_writer.log(
                 user=current_user,
                 operation_type='CREATE',
                 table_name='agent_deal_percent_rules',
@@ -811,6 +971,23 @@ async def upsert_deal_rule(deal_rule_data: UpsertDealRuleRequest, current_user:
         raise _internal_error('Failed to upsert deal rule', e)
 
 
+# Default and maximum page size for /get_create_update_history
+AUDIT_HISTORY_PAGE_SIZE = int(os.getenv('AUDIT_HISTORY_PAGE_SIZE', '100'))
+AUDIT_HISTORY_MAX_PAGE_SIZE = int(os.getenv('AUDIT_HISTORY_MAX_PAGE_SIZE', '1000'))
+
+
+def _encode_history_cursor(row: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps([row['created_at'], row['id']]).encode()).decode()
+
+
+def _decode_history_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at).isoformat(), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
 @app.get('/get_create_update_history')
 async def get_create_update_history(
     start_date: date | None = Query(None, description="Start date for the query"),
@@ -818,8 +995,13 @@ async def get_create_update_history(
     lookback_days: int | None = Query(None, description="Optional lookback period in days"),
     table_name: str | None = Query(None, description='Filter by table name'),
     operation_type: str | None = Query(None, description='Filter by operation type (CREATE, UPDATE)'),
+    record_id: str | None = Query(None, description='Filter by record ID'),
+    data_filter: str | None = Query(None, description='JSON object that operation_data must contain, e.g. {"agent_id": 5}'),
+    cursor: str | None = Query(None, description='next_cursor from the previous page'),
+    limit: int = Query(AUDIT_HISTORY_PAGE_SIZE, ge=1, le=AUDIT_HISTORY_MAX_PAGE_SIZE, description='Page size'),
     current_user: User = Depends(get_current_user),
 ):
+    """Audit log entries, newest first, one page at a time; pass next_cursor back to get the next page."""
     try:
         query = supabase.table('audit_logs').select('*')
         
@@ -833,8 +1015,28 @@ async def get_create_update_history(
         if operation_type:
             query = query.eq('operation_type', operation_type.upper())
         
-        response = query.order('created_at', desc=True).execute()
-        return {'data': response.data, 'count': len(response.data)}
+        if record_id:
+            query = query.eq('record_id', record_id)
+        
+        if data_filter:
+            try:
+                contained = json.loads(data_filter)
+            except json.JSONDecodeError as e:
+                raise ValueError('data_filter must be a JSON object') from e
+            if not isinstance(contained, dict):
+                raise ValueError('data_filter must be a JSON object')
+            query = query.contains('operation_data', contained)
+        
+        if cursor:
+            # Keyset on (created_at, id): the lte bound is the index range, the or() only breaks timestamp ties
+            after_created_at, after_id = _decode_history_cursor(cursor)
+            query = query.lte('created_at', after_created_at).or_(f'created_at.lt."{after_created_at}",id.lt.{after_id}')
+        
+        # One extra row tells whether another page follows
+        response = await run_query(query.order('created_at', desc=True).order('id', desc=True).limit(limit + 1))
+        rows = response.data[:limit]
+        next_cursor = _encode_history_cursor(rows[-1]) if len(response.data) > limit else None
+        return {'data': rows, 'count': len(rows), 'next_cursor': next_cursor}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -842,9 +1044,13 @@ async def get_create_update_history(
 
 
 @app.get('/get_dashboard_data')
-async def get_dashboard_data(current_user: User = Depends(get_current_user)):
+async def get_dashboard_data(request: Request, response: Response, current_user: User = Depends(get_current_user)):
     try:
         last_thursday_texas = get_last_thursday_12am_texas()
+        # The dashboard's periods roll over with the accounting week even when no data changes
+        cached = await not_modified(request, response, last_thursday_texas.isoformat())
+        if cached is not None:
+            return cached
         previous_thursday_texas = last_thursday_texas - timedelta(days=7)
 
         last_thursday_utc = last_thursday_texas.astimezone(pytz.UTC)
@@ -852,23 +1058,30 @@ async def get_dashboard_data(current_user: User = Depends(get_current_user)):
         last_thursday_iso = last_thursday_utc.isoformat()
         previous_thursday_iso = previous_thursday_utc.isoformat()
 
-        all_time_tips_response = supabase.table(TABLE_GAMES).select('tips').execute()
+        (
+            ledger_totals_response,
+            replica_games,
+            (players, agents),
+        ) = await asyncio.gather(
+            run_query(supabase.table(TABLE_LEDGER_TOTALS).select('total_tips').eq('id', 1)),
+            read_games_replica(start_date=previous_thursday_utc, columns=['player_id', 'date_started', 'profit', 'tips']),
+            reference_cache.get_many(TABLE_PLAYERS, TABLE_AGENTS),
+        )
+
         total_tips_all_time = 0.0
-        if all_time_tips_response.data:
-            total_tips_all_time = sum(
-                row.get('tips') or 0 for row in all_time_tips_response.data
-            )
+        if ledger_totals_response.data:
+            total_tips_all_time = float(ledger_totals_response.data[0].get('total_tips') or 0)
 
-        recent_games_response = (
-            supabase.table(TABLE_GAMES)
-            .select('*')
-            .gte('date_started', previous_thursday_iso)
-            .execute()
-        )
-        recent_games_df = response_to_lazyframe(recent_games_response.data)
+        if replica_games is not None:
+            has_recent_games = replica_games.height > 0
+            recent_games_df = replica_games.lazy()
+        else:
+            recent_games_data = await fetch_all_games(supabase, start_date=previous_thursday_utc)
+            has_recent_games = bool(recent_games_data)
+            recent_games_df = response_to_lazyframe(recent_games_data)
 
         previous_period_tips = 0.0
-        if recent_games_response.data:
+        if has_recent_games:
             prev_period_result = (
                 recent_games_df
                 .filter(
@@ -883,7 +1096,7 @@ async def get_dashboard_data(current_user: User = Depends(get_current_user)):
 
         since_last_thursday_tips = 0.0
         games_since_thursday_df = None
-        if recent_games_response.data:
+        if has_recent_games:
             games_since_thursday_df = recent_games_df.filter(pl.col('date_started') >= last_thursday_iso)
             since_thursday_result = (
                 games_since_thursday_df
@@ -895,13 +1108,10 @@ async def get_dashboard_data(current_user: User = Depends(get_current_user)):
             else:
                 games_since_thursday_df = None
 
-        players_response = supabase.table(TABLE_PLAYERS).select('*').execute()
-        agents_response = supabase.table(TABLE_AGENTS).select('agent_id, agent_name, deal_percent').execute()
-        
         blocked_players = []
-        if players_response.data and agents_response.data:
-            players_df = response_to_lazyframe(players_response.data)
-            agents_df = response_to_lazyframe(agents_response.data)
+        if players.rows and agents.rows:
+            players_df = players.frame.lazy()
+            agents_df = agents.frame.lazy().select(['agent_id', 'agent_name', 'deal_percent'])
             
             blocked_players_df = (
                 players_df
@@ -935,9 +1145,9 @@ async def get_dashboard_data(current_user: User = Depends(get_current_user)):
         agent_report = []
         over_credit_limit_players = []
         
-        if games_since_thursday_df is not None and players_response.data and agents_response.data:
-            players_df = response_to_lazyframe(players_response.data)
-            agents_df = response_to_lazyframe(agents_response.data)
+        if games_since_thursday_df is not None and players.rows and agents.rows:
+            players_df = players.frame.lazy()
+            agents_df = agents.frame.lazy().select(['agent_id', 'agent_name', 'deal_percent'])
             
             games_agg_period = (
                 games_since_thursday_df
@@ -1000,18 +1210,22 @@ async def get_dashboard_data(current_user: User = Depends(get_current_user)):
                 if item.get('adjusted_credit_limit') is not None:
                     item['adjusted_credit_limit'] = float(item['adjusted_credit_limit'])
         
-        if games_since_thursday_df is not None and players_response.data and agents_response.data:
-            players_df = response_to_lazyframe(players_response.data)
-            agents_df = response_to_lazyframe(agents_response.data)
+        if games_since_thursday_df is not None and players.rows and agents.rows:
+            players_df = players.frame.lazy()
+            agents_df = agents.frame.lazy().select(['agent_id', 'agent_name', 'deal_percent'])
 
-            all_time_games_response = supabase.table(TABLE_GAMES).select('player_id, profit').execute()
-            all_time_games_df = response_to_lazyframe(all_time_games_response.data)
+            period_player_ids = (
+                games_since_thursday_df.select(pl.col('player_id').unique()).collect().to_series().to_list()
+            )
+            ledger_rows = await fetch_lifetime_profits(supabase, period_player_ids)
 
-            if all_time_games_response.data:
+            if ledger_rows:
                 games_agg_all_time = (
-                    all_time_games_df
-                    .group_by('player_id')
-                    .agg([pl.sum('profit').alias('all_time_profit')])
+                    response_to_lazyframe(ledger_rows)
+                    .select([
+                        pl.col('player_id').cast(pl.Utf8),
+                        pl.col('lifetime_profit').cast(pl.Float64).alias('all_time_profit')
+                    ])
                 )
             else:
                 games_agg_all_time = pl.LazyFrame({'player_id': pl.Series([], dtype=pl.Utf8), 'all_time_profit': pl.Series([], dtype=pl.Float64)})
@@ -1175,41 +1389,50 @@ async def upload_csv(file: UploadFile = File(...), current_user: User = Depends(
         
         filename = file.filename
         
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_file_path = tmp_file.name
+        # Hash and parse the spooled upload in place: no copy of the body and no temp file
+        result = await run_sync(upload_csv_to_games, supabase, file.file, filename)
         
-        try:
-            result = upload_csv_to_games(supabase, tmp_file_path, filename)
-            
-            if not result['success']:
-                raise HTTPException(status_code=400, detail=result['message'])
-            
-            log_operation(
-                supabase=supabase,
-                user=current_user,
-                operation_type='CREATE',
-                table_name=TABLE_GAMES,
-                record_id=None,
-                operation_data={
-                    'filename': filename,
-                    'rows_processed': result.get('rows_processed', 0),
-                    'rows_inserted': result.get('rows_inserted', 0),
-                    'rows_skipped': result.get('rows_skipped', 0)
-                }
-            )
-            
-            return result
-        finally:
-            if os.path.exists(tmp_file_path):
-                os.unlink(tmp_file_path)
+        if not result['success']:
+            raise HTTPException(status_code=400, detail=result['message'])
+        
+        await after_csv_upload(result, filename, current_user)
+        
+        return result
     except HTTPException:
         raise
     except Exception as e:
         raise _internal_error('Failed to upload CSV', e)
 
 
+@app.post('/jobs/upload_csv', status_code=202)
+async def submit_upload_csv_job(file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
+    """Queue a CSV for background ingestion; poll /jobs/{job_id} for progress."""
+    try:
+        if not file.filename or not file.filename.endswith('.csv'):
+            raise HTTPException(status_code=400, detail='File must be a CSV file')
+        
+        content = await file.read()
+        if not content:
+            raise HTTPException(status_code=400, detail='CSV file is empty')
+        
+        return await ingest_jobs.submit(content, file.filename, current_user)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise _internal_error('Failed to queue CSV upload', e)
+
+
+@app.get('/jobs/{job_id}')
+async def get_ingest_job(job_id: uuid.UUID = Path(..., description='Job ID returned by /jobs/upload_csv'), current_user: User = Depends(get_current_user)):
+    try:
+        job = await ingest_jobs.get(str(job_id))
+    except Exception as e:
+        raise _internal_error('Failed to fetch job', e)
+    if job is None:
+        raise HTTPException(status_code=404, detail='Job not found')
+    return job
+
+
 @app.post('/send_telegram_message')
 async def send_telegram_message(
     agent_id: int = Body(..., description='Agent ID to send message to'),
@@ -1218,42 +1441,78 @@ async def send_telegram_message(
 ):
     """Send a message to an agent's Telegram chat via bot."""
     try:
-        import requests
-        
-        TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
-        if not TELEGRAM_BOT_TOKEN:
+        if telegram_client is None:
             raise HTTPException(status_code=500, detail='TELEGRAM_BOT_TOKEN not configured')
         
-        mapping_response = supabase.table('agent_telegram_mapping').select('chat_id').eq('agent_id', agent_id).execute()
+        mapping_response = await run_query(supabase.table('agent_telegram_mapping').select('chat_id').eq('agent_id', agent_id))
         
         if not mapping_response.data or len(mapping_response.data) == 0:
             raise HTTPException(status_code=404, detail=f'No Telegram chat_id found for agent_id {agent_id}')
         
         chat_id = mapping_response.data[0]['chat_id']
         
-        telegram_api_url = f'https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage'
-        payload = {
-            'chat_id': chat_id,
-            'text': message,
-            'parse_mode': 'HTML'
-        }
-        
-        response = requests.post(telegram_api_url, json=payload, timeout=10)
-        response.raise_for_status()
+        result = await telegram_client.send_message(chat_id, message)
+        if not result['success']:
+            raise _internal_error('Failed to send Telegram message', RuntimeError(result['error']))
         
         return {
             'success': True,
             'message': 'Message sent successfully',
             'chat_id': chat_id
         }
-    except requests.exceptions.RequestException as e:
-        raise _internal_error('Failed to send Telegram message', e)
     except HTTPException:
         raise
     except Exception as e:
         raise _internal_error('Failed to send Telegram message', e)
 
 
+@app.post('/send_telegram_messages')
+async def send_telegram_messages(
+    messages: list[TelegramMessageItem] = Body(..., embed=True, description='(agent_id, message) pairs to send'),
+    current_user: User = Depends(get_current_user),
+):
+    """Send many messages to agents' Telegram chats in one request; each item gets its own result."""
+    try:
+        if telegram_client is None:
+            raise HTTPException(status_code=500, detail='TELEGRAM_BOT_TOKEN not configured')
+        if len(messages) > TELEGRAM_BATCH_MAX_MESSAGES:
+            raise HTTPException(status_code=400, detail=f'At most {TELEGRAM_BATCH_MAX_MESSAGES} messages per request')
+
+        agent_ids = sorted({item.agent_id for item in messages})
+        chat_ids = {}
+        if agent_ids:
+            mapping_response = await run_query(
+                supabase.table('agent_telegram_mapping').select('agent_id,chat_id').in_('agent_id', agent_ids)
+            )
+            for row in mapping_response.data or []:
+                chat_ids.setdefault(row['agent_id'], row['chat_id'])
+
+        # Queue everything up front so the client's workers send in parallel
+        pending = [
+            telegram_client.enqueue(chat_ids[item.agent_id], item.message) if item.agent_id in chat_ids else None
+            for item in messages
+        ]
+        results = []
+        for item, future in zip(messages, pending):
+            if future is None:
+                results.append({'agent_id': item.agent_id, 'success': False, 'error': 'No Telegram chat_id found'})
+                continue
+            outcome = await future
+            results.append({'agent_id': item.agent_id, 'chat_id': chat_ids[item.agent_id], **outcome})
+
+        sent = sum(1 for r in results if r['success'])
+        return {
+            'success': sent == len(results),
+            'sent': sent,
+            'failed': len(results) - sent,
+            'results': results
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise _internal_error('Failed to send Telegram messages', e)
+
+
 if __name__ == '__main__':
     import uvicorn
     uvicorn.run(app, host='0.0.0.0', port=8000)
@@ -2,10 +2,21 @@
 -- This replaces the 3 separate queries with a single optimized query
 -- Note: games.player_id and players.player_id are both VARCHAR(255)
 -- Updated to use deal_percent_rules table with per-game calculation
+-- Updated to resolve deal_percent tiers set-based: each agent's rules are turned into
+-- [threshold, next threshold) bands once and joined to the games, instead of calling
+-- get_deal_percent() (one ORDER BY ... LIMIT 1 lookup) for every game row.
+-- Parity with the per-row version: supabase_agent_report_parity_check.sql
+-- Updated to take an optional agent_id_param: when set, only that agent's players and
+-- their games are read (players by agent_id, then games by player_id and date), so a
+-- single agent's report costs the size of their book rather than the whole club's.
+
+-- Drop the earlier signature (without agent_id_param) if it exists
+DROP FUNCTION IF EXISTS get_agent_report(TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE);
 
 CREATE OR REPLACE FUNCTION get_agent_report(
     start_date_param TIMESTAMP WITH TIME ZONE,
-    end_date_param TIMESTAMP WITH TIME ZONE
+    end_date_param TIMESTAMP WITH TIME ZONE,
+    agent_id_param INTEGER DEFAULT NULL
 )
 RETURNS TABLE (
     agent_id INTEGER,
@@ -17,25 +28,40 @@ RETURNS TABLE (
 ) AS $$
 BEGIN
     RETURN QUERY
+    WITH tiers AS (
+        -- Highest threshold <= tips wins, so each rule covers tips up to the next threshold
+        SELECT
+            r.agent_id,
+            r.deal_percent,
+            r.threshold AS min_tips,
+            LEAD(r.threshold) OVER (PARTITION BY r.agent_id ORDER BY r.threshold) AS next_threshold
+        FROM agent_deal_percent_rules r
+        WHERE agent_id_param IS NULL OR r.agent_id = agent_id_param
+    )
     SELECT 
         a.agent_id,
         a.agent_name,
         COALESCE(SUM(g.profit), 0)::DECIMAL(10, 2) AS total_profit,
         COALESCE(SUM(g.tips), 0)::DECIMAL(10, 2) AS total_tips,
-        -- Calculate agent_tips per game using rules, then sum
-        -- Handle NULL deal_percent by using COALESCE on the function result
-        COALESCE(SUM(g.tips * COALESCE(get_deal_percent(a.agent_id, g.tips), a.deal_percent, 0)), 0)::DECIMAL(10, 2) AS agent_tips,
+        -- Calculate agent_tips per game using its tier, falling back to the agent default
+        COALESCE(SUM(g.tips * COALESCE(t.deal_percent, a.deal_percent, 0)), 0)::DECIMAL(10, 2) AS agent_tips,
         COUNT(g.*)::BIGINT AS game_count
     FROM agents a
     INNER JOIN players p ON a.agent_id = p.agent_id
     INNER JOIN games g ON g.player_id = p.player_id
+    -- Thresholds are unique per agent, so at most one band matches each game
+    LEFT JOIN tiers t
+        ON t.agent_id = a.agent_id
+       AND g.tips >= t.min_tips
+       AND (t.next_threshold IS NULL OR g.tips < t.next_threshold)
     WHERE g.date_started >= start_date_param
       AND g.date_ended <= end_date_param
       AND p.agent_id IS NOT NULL
+      AND (agent_id_param IS NULL OR a.agent_id = agent_id_param)
     GROUP BY a.agent_id, a.agent_name
     ORDER BY a.agent_id;
 END;
 $$ LANGUAGE plpgsql SECURITY DEFINER;
 
 -- Grant execute permission to authenticated users
-GRANT EXECUTE ON FUNCTION get_agent_report(TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE) TO authenticated;
+GRANT EXECUTE ON FUNCTION get_agent_report(TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE, INTEGER) TO authenticated;
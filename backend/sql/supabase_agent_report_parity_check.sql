@@ -0,0 +1,135 @@
+-- Parity check and benchmark for the set-based get_agent_report
+-- Seeds agents, players, tiered rules and games, compares get_agent_report against the
+-- previous per-row implementation (get_deal_percent() per game) and reports timings.
+-- Everything runs in one transaction that is rolled back, so it is safe to run in the
+-- SQL editor of any environment after supabase_agent_report_function.sql is applied.
+-- Seeded ids start at 900000 / 'parity_' to stay clear of real rows.
+
+BEGIN;
+
+-- The per-row implementation being replaced, kept only for this session
+CREATE FUNCTION pg_temp.get_agent_report_per_row(
+    start_date_param TIMESTAMP WITH TIME ZONE,
+    end_date_param TIMESTAMP WITH TIME ZONE
+)
+RETURNS TABLE (
+    agent_id INTEGER,
+    agent_name VARCHAR(255),
+    total_profit DECIMAL(10, 2),
+    total_tips DECIMAL(10, 2),
+    agent_tips DECIMAL(10, 2),
+    game_count BIGINT
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT 
+        a.agent_id,
+        a.agent_name,
+        COALESCE(SUM(g.profit), 0)::DECIMAL(10, 2) AS total_profit,
+        COALESCE(SUM(g.tips), 0)::DECIMAL(10, 2) AS total_tips,
+        COALESCE(SUM(g.tips * COALESCE(get_deal_percent(a.agent_id, g.tips), a.deal_percent, 0)), 0)::DECIMAL(10, 2) AS agent_tips,
+        COUNT(g.*)::BIGINT AS game_count
+    FROM agents a
+    INNER JOIN players p ON a.agent_id = p.agent_id
+    INNER JOIN games g ON g.player_id = p.player_id
+    WHERE g.date_started >= start_date_param
+      AND g.date_ended <= end_date_param
+      AND p.agent_id IS NOT NULL
+    GROUP BY a.agent_id, a.agent_name
+    ORDER BY a.agent_id;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- 60 agents: every 10th has a zero default deal_percent, every 4th has no rules
+INSERT INTO agents (agent_id, agent_name, deal_percent)
+SELECT 900000 + i, 'parity_agent_' || i, CASE WHEN i % 10 = 0 THEN 0 ELSE round((i % 5) * 0.05 + 0.1, 3) END
+FROM generate_series(1, 60) AS i;
+
+-- Up to 4 tiers per agent; thresholds land on whole tips so exact-boundary games are covered
+INSERT INTO agent_deal_percent_rules (agent_id, threshold, deal_percent)
+SELECT 900000 + i, t * 10, round(0.2 + t * 0.1 + (i % 3) * 0.01, 3)
+FROM generate_series(1, 60) AS i, generate_series(0, 3) AS t
+WHERE i % 4 <> 0 AND t <= i % 5;
+
+-- 3000 players; a few without an agent
+INSERT INTO players (player_id, player_name, agent_id)
+SELECT 'parity_' || i, 'parity player ' || i, CASE WHEN i % 97 = 0 THEN NULL ELSE 900000 + 1 + (i % 60) END
+FROM generate_series(1, 3000) AS i;
+
+-- 300k games over 12 weeks with tips spread across and exactly on tier boundaries
+INSERT INTO games (rank, game_code, club_code, player_id, player_name, date_started, date_ended,
+                   game_type, big_blind, profit, tips, buy_in, total_tips, hands)
+SELECT
+    1,
+    'parity_game_' || i,
+    'PARITY',
+    'parity_' || (1 + i % 3000),
+    'parity player ' || (1 + i % 3000),
+    TIMESTAMP WITH TIME ZONE '2001-01-04 00:00+00' + (i % 2016) * INTERVAL '1 hour',
+    TIMESTAMP WITH TIME ZONE '2001-01-04 02:00+00' + (i % 2016) * INTERVAL '1 hour',
+    'PLO',
+    1,
+    round(((i::BIGINT * 7919) % 20001 - 10000) / 100.0, 2),
+    CASE WHEN i % 11 = 0 THEN (i % 5) * 10 ELSE round(((i::BIGINT * 104729) % 5000) / 100.0, 2) END,
+    0,
+    0,
+    i % 120
+FROM generate_series(1, 300000) AS i;
+
+ANALYZE agents;
+ANALYZE players;
+ANALYZE agent_deal_percent_rules;
+ANALYZE games;
+
+DO $$
+DECLARE
+    v_ranges TSTZRANGE[] := ARRAY[
+        tstzrange('2001-01-04', '2001-01-11'),   -- one accounting week
+        tstzrange('2001-01-04', '2001-02-01'),   -- a month
+        tstzrange('2001-01-01', '2001-04-01'),   -- the whole seeded quarter
+        tstzrange('2001-06-01', '2001-06-08')    -- no games
+    ];
+    v_range TSTZRANGE;
+    v_diff BIGINT;
+    v_rows BIGINT;
+    v_start TIMESTAMP WITH TIME ZONE;
+    v_per_row_ms NUMERIC;
+    v_set_based_ms NUMERIC;
+    v_run INTEGER;
+BEGIN
+    FOREACH v_range IN ARRAY v_ranges LOOP
+        SELECT COUNT(*) INTO v_diff FROM (
+            (SELECT * FROM get_agent_report(lower(v_range), upper(v_range))
+             EXCEPT ALL
+             SELECT * FROM pg_temp.get_agent_report_per_row(lower(v_range), upper(v_range)))
+            UNION ALL
+            (SELECT * FROM pg_temp.get_agent_report_per_row(lower(v_range), upper(v_range))
+             EXCEPT ALL
+             SELECT * FROM get_agent_report(lower(v_range), upper(v_range)))
+        ) d;
+        SELECT COUNT(*) INTO v_rows FROM get_agent_report(lower(v_range), upper(v_range));
+
+        IF v_diff <> 0 THEN
+            RAISE EXCEPTION 'get_agent_report parity FAILED for %: % differing rows', v_range, v_diff;
+        END IF;
+
+        -- Best of 3 runs each, after the parity queries above have warmed the cache
+        v_per_row_ms := NULL;
+        v_set_based_ms := NULL;
+        FOR v_run IN 1..3 LOOP
+            v_start := clock_timestamp();
+            PERFORM * FROM pg_temp.get_agent_report_per_row(lower(v_range), upper(v_range));
+            v_per_row_ms := LEAST(COALESCE(v_per_row_ms, 'Infinity'), EXTRACT(EPOCH FROM clock_timestamp() - v_start) * 1000);
+
+            v_start := clock_timestamp();
+            PERFORM * FROM get_agent_report(lower(v_range), upper(v_range));
+            v_set_based_ms := LEAST(COALESCE(v_set_based_ms, 'Infinity'), EXTRACT(EPOCH FROM clock_timestamp() - v_start) * 1000);
+        END LOOP;
+
+        RAISE NOTICE 'range % : % agents identical | per-row % ms | set-based % ms | %x',
+            v_range, v_rows, round(v_per_row_ms, 1), round(v_set_based_ms, 1),
+            CASE WHEN v_set_based_ms > 0 THEN round(v_per_row_ms / v_set_based_ms, 1) END;
+    END LOOP;
+END $$;
+
+ROLLBACK;
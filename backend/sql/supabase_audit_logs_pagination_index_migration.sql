@@ -0,0 +1,17 @@
+-- Indexes for paging through audit_logs newest first
+-- /get_create_update_history pages on the (created_at, id) keyset, optionally filtered by
+-- table_name, and can look entries up by fields inside operation_data. With these indexes a
+-- page costs the same however long the log grows.
+
+-- Unfiltered pages: walk the log newest first, ties on created_at broken by id
+CREATE INDEX IF NOT EXISTS idx_audit_logs_created_at_id ON audit_logs (created_at DESC, id DESC);
+
+-- Pages filtered by table (the common access pattern)
+CREATE INDEX IF NOT EXISTS idx_audit_logs_table_name_created_at ON audit_logs (table_name, created_at DESC, id DESC);
+
+-- data_filter lookups (operation_data @> '{"agent_id": 5}')
+CREATE INDEX IF NOT EXISTS idx_audit_logs_operation_data ON audit_logs USING GIN (operation_data jsonb_path_ops);
+
+-- Superseded by the composite indexes above
+DROP INDEX IF EXISTS idx_audit_logs_created_at;
+DROP INDEX IF EXISTS idx_audit_logs_table_name;
@@ -0,0 +1,39 @@
+-- SQL function returning a token that changes whenever report inputs change
+-- Combines uploaded_csvs (new or removed uploads), the ledger totals row (touched by every
+-- games write through the ledger triggers) and the reference tables' updated_at/row counts.
+-- The API uses the token as an ETag so unchanged report requests can be answered with 304,
+-- and the upload/reference components to invalidate its report result cache.
+
+-- Drop the earlier TEXT-returning version if it exists (return type changed)
+DROP FUNCTION IF EXISTS get_data_version();
+
+CREATE OR REPLACE FUNCTION get_data_version()
+RETURNS JSONB AS $$
+DECLARE
+    v_uploads_max_id INTEGER;
+    v_uploads_count BIGINT;
+    v_games TEXT;
+    v_reference TEXT;
+BEGIN
+    SELECT COALESCE(MAX(u.id), 0), COUNT(*) INTO v_uploads_max_id, v_uploads_count FROM uploaded_csvs u;
+
+    SELECT COALESCE(MAX(t.updated_at)::TEXT, '') || ':' || COALESCE(MAX(t.game_count), 0) INTO v_games FROM ledger_totals t;
+
+    SELECT md5(array_to_string(ARRAY[
+        (SELECT COALESCE(MAX(a.updated_at)::TEXT, '') || ':' || COUNT(*) FROM agents a),
+        (SELECT COALESCE(MAX(p.updated_at)::TEXT, '') || ':' || COUNT(*) FROM players p),
+        (SELECT COALESCE(MAX(r.updated_at)::TEXT, '') || ':' || COUNT(*) FROM real_name_mapping r),
+        (SELECT COALESCE(MAX(d.updated_at)::TEXT, '') || ':' || COUNT(*) FROM agent_deal_percent_rules d)
+    ], '|')) INTO v_reference;
+
+    RETURN jsonb_build_object(
+        'token', md5(v_uploads_max_id || ':' || v_uploads_count || '|' || v_games || '|' || v_reference),
+        'uploads_max_id', v_uploads_max_id,
+        'uploads_count', v_uploads_count,
+        'reference', v_reference
+    );
+END;
+$$ LANGUAGE plpgsql STABLE SECURITY DEFINER;
+
+-- Grant execute permission to authenticated users
+GRANT EXECUTE ON FUNCTION get_data_version() TO authenticated;
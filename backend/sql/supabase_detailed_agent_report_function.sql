@@ -1,13 +1,15 @@
 -- SQL function to get detailed agent report grouped by agent and player
 -- Returns data for each agent showing all their players with game statistics
 -- Updated to use deal_percent_rules table with per-game calculation
+-- Updated to take an optional agent_id_param that restricts the report to one agent's players
 
--- Drop the existing function first if it exists (required when changing return type)
+-- Drop the existing function first if it exists (required when changing return type or signature)
 DROP FUNCTION IF EXISTS get_detailed_agent_report(TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE);
 
 CREATE OR REPLACE FUNCTION get_detailed_agent_report(
     start_date_param TIMESTAMP WITH TIME ZONE,
-    end_date_param TIMESTAMP WITH TIME ZONE
+    end_date_param TIMESTAMP WITH TIME ZONE,
+    agent_id_param INTEGER DEFAULT NULL
 )
 RETURNS TABLE (
     agent_id INTEGER,
@@ -34,6 +36,7 @@ BEGIN
           AND g.date_ended <= end_date_param
           AND p.agent_id IS NOT NULL
           AND p.player_id IS NOT NULL
+          AND (agent_id_param IS NULL OR a.agent_id = agent_id_param)
         GROUP BY a.agent_id, g.player_id
     ),
     player_deal_percents AS (
@@ -75,10 +78,11 @@ BEGIN
       AND g.date_ended <= end_date_param
       AND p.agent_id IS NOT NULL
       AND p.player_id IS NOT NULL
+      AND (agent_id_param IS NULL OR a.agent_id = agent_id_param)
     GROUP BY a.agent_id, a.agent_name, g.player_id, p.player_name, pdp.deal_percent
     ORDER BY a.agent_id, g.player_id;
 END;
 $$ LANGUAGE plpgsql SECURITY DEFINER;
 
 -- Grant execute permission to authenticated users
-GRANT EXECUTE ON FUNCTION get_detailed_agent_report(TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE) TO authenticated;
+GRANT EXECUTE ON FUNCTION get_detailed_agent_report(TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE, INTEGER) TO authenticated;
@@ -0,0 +1,6 @@
+-- Migration: checkpoint the email ingestor by IMAP UID instead of by run time
+-- last_uid is the highest INBOX UID already processed; it is only meaningful while the
+-- mailbox keeps the same uid_validity, otherwise the ingestor falls back to last_run_time.
+
+ALTER TABLE email_ingestor_state ADD COLUMN IF NOT EXISTS uid_validity BIGINT;
+ALTER TABLE email_ingestor_state ADD COLUMN IF NOT EXISTS last_uid BIGINT;
@@ -0,0 +1,75 @@
+-- SQL function to read the games table one keyset page at a time
+-- Pages are resumed with a row comparison against the last row of the previous page, so
+-- long date ranges are never truncated by PostgREST's max-rows cap.
+-- With start_date_param, pages are ordered by date_started first, so the start date and the
+-- cursor bound an idx_games_date_started range scan (ties are finished by an incremental sort)
+-- and a narrow window reads only its own rows. Without it, pages follow games_pkey and the
+-- remaining filters are applied to the rows the pkey scan reads.
+-- The cursor is the full games_pkey row either way. Pass NULL cursor values to fetch the first page.
+
+-- Drop the earlier signature (without game_codes_param) if it exists
+DROP FUNCTION IF EXISTS get_games_page(
+    TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE, VARCHAR, VARCHAR[],
+    VARCHAR, TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE, VARCHAR,
+    DECIMAL, DECIMAL, DECIMAL, INTEGER
+);
+
+CREATE OR REPLACE FUNCTION get_games_page(
+    start_date_param TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    end_date_param TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    club_code_param VARCHAR(255) DEFAULT NULL,
+    player_ids_param VARCHAR(255)[] DEFAULT NULL,
+    game_codes_param VARCHAR(255)[] DEFAULT NULL,
+    after_game_code VARCHAR(255) DEFAULT NULL,
+    after_date_started TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    after_date_ended TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    after_player_id VARCHAR(255) DEFAULT NULL,
+    after_profit DECIMAL(10, 2) DEFAULT NULL,
+    after_tips DECIMAL(10, 2) DEFAULT NULL,
+    after_total_tips DECIMAL(10, 2) DEFAULT NULL,
+    page_size_param INTEGER DEFAULT 1000
+)
+RETURNS SETOF games AS $$
+BEGIN
+    IF start_date_param IS NOT NULL THEN
+        RETURN QUERY
+        SELECT g.*
+        FROM games g
+        WHERE g.date_started >= start_date_param
+          AND (end_date_param IS NULL OR g.date_ended <= end_date_param)
+          AND (club_code_param IS NULL OR g.club_code = club_code_param)
+          AND (player_ids_param IS NULL OR g.player_id = ANY(player_ids_param))
+          AND (game_codes_param IS NULL OR g.game_code = ANY(game_codes_param))
+          AND (
+              after_game_code IS NULL
+              OR (g.date_started, g.game_code, g.date_ended, g.player_id, g.profit, g.tips, g.total_tips)
+                 > (after_date_started, after_game_code, after_date_ended, after_player_id, after_profit, after_tips, after_total_tips)
+          )
+        ORDER BY g.date_started, g.game_code, g.date_ended, g.player_id, g.profit, g.tips, g.total_tips
+        LIMIT page_size_param;
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    SELECT g.*
+    FROM games g
+    WHERE (end_date_param IS NULL OR g.date_ended <= end_date_param)
+      AND (club_code_param IS NULL OR g.club_code = club_code_param)
+      AND (player_ids_param IS NULL OR g.player_id = ANY(player_ids_param))
+      AND (game_codes_param IS NULL OR g.game_code = ANY(game_codes_param))
+      AND (
+          after_game_code IS NULL
+          OR (g.game_code, g.date_started, g.date_ended, g.player_id, g.profit, g.tips, g.total_tips)
+             > (after_game_code, after_date_started, after_date_ended, after_player_id, after_profit, after_tips, after_total_tips)
+      )
+    ORDER BY g.game_code, g.date_started, g.date_ended, g.player_id, g.profit, g.tips, g.total_tips
+    LIMIT page_size_param;
+END;
+$$ LANGUAGE plpgsql STABLE SECURITY DEFINER;
+
+-- Grant execute permission to authenticated users
+GRANT EXECUTE ON FUNCTION get_games_page(
+    TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE, VARCHAR, VARCHAR[], VARCHAR[],
+    VARCHAR, TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE, VARCHAR,
+    DECIMAL, DECIMAL, DECIMAL, INTEGER
+) TO authenticated;
@@ -0,0 +1,5 @@
+-- Migration: index games by player and start date
+-- Lets agent-scoped reports (agent_id_param) read each of the agent's players' games in
+-- the date range directly, instead of filtering every game a player has ever played.
+
+CREATE INDEX IF NOT EXISTS idx_games_player_id_date_started ON games(player_id, date_started);
@@ -0,0 +1,137 @@
+-- Ingest Jobs Table
+-- Queue for CSV uploads processed in the background by the API's ingest workers.
+-- The CSV bytes live in ingest_job_payloads until the job finishes, so a job interrupted
+-- by a restart is picked up again by the next worker once its lease expires. Keeping them
+-- out of ingest_jobs means claiming and polling jobs never reads the file.
+-- Re-running a job is safe: games inserts are ON CONFLICT DO NOTHING and the
+-- upload is only recorded in uploaded_csvs after its last batch.
+
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    status VARCHAR(20) NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'succeeded', 'failed')),
+    filename VARCHAR(255) NOT NULL,
+    csv_hash VARCHAR(64) NOT NULL,
+    created_by VARCHAR(255) NOT NULL,
+    created_by_email VARCHAR(255),
+    rows_parsed INTEGER,
+    batches_total INTEGER,
+    batches_inserted INTEGER NOT NULL DEFAULT 0,
+    rows_inserted INTEGER NOT NULL DEFAULT 0,
+    rows_skipped INTEGER NOT NULL DEFAULT 0,
+    result JSONB,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMP WITH TIME ZONE,
+    heartbeat_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_ingest_jobs_status_created_at ON ingest_jobs(status, created_at);
+
+-- At most one unfinished job per file, so a double-submitted upload joins the existing job
+CREATE UNIQUE INDEX IF NOT EXISTS idx_ingest_jobs_active_csv_hash
+    ON ingest_jobs(csv_hash)
+    WHERE status IN ('queued', 'running');
+
+-- Uploaded CSV per unfinished job; read only by the worker that claims the job
+CREATE TABLE IF NOT EXISTS ingest_job_payloads (
+    job_id UUID PRIMARY KEY REFERENCES ingest_jobs(id) ON DELETE CASCADE,
+    csv_content BYTEA NOT NULL
+);
+
+-- A finished job's CSV is no longer needed
+CREATE OR REPLACE FUNCTION delete_finished_ingest_job_payload()
+RETURNS TRIGGER AS $$
+BEGIN
+    DELETE FROM ingest_job_payloads WHERE job_id = NEW.id;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS ingest_jobs_delete_finished_payload ON ingest_jobs;
+CREATE TRIGGER ingest_jobs_delete_finished_payload
+    AFTER UPDATE OF status ON ingest_jobs
+    FOR EACH ROW
+    WHEN (NEW.status IN ('succeeded', 'failed'))
+    EXECUTE FUNCTION delete_finished_ingest_job_payload();
+
+-- Queue a job and its CSV in one transaction. The CSV travels as base64 rather than
+-- PostgREST's hex bytea format, which would double its size.
+CREATE OR REPLACE FUNCTION submit_ingest_job(
+    id_param UUID,
+    filename_param VARCHAR(255),
+    csv_hash_param VARCHAR(64),
+    csv_base64_param TEXT,
+    created_by_param VARCHAR(255),
+    created_by_email_param VARCHAR(255)
+)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO ingest_jobs (id, filename, csv_hash, created_by, created_by_email)
+    VALUES (id_param, filename_param, csv_hash_param, created_by_param, created_by_email_param);
+
+    INSERT INTO ingest_job_payloads (job_id, csv_content)
+    VALUES (id_param, decode(csv_base64_param, 'base64'));
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- The job's CSV as base64, or NULL once the job has finished
+CREATE OR REPLACE FUNCTION get_ingest_job_payload(job_id_param UUID)
+RETURNS TEXT AS $$
+    SELECT encode(p.csv_content, 'base64') FROM ingest_job_payloads p WHERE p.job_id = job_id_param;
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+-- Claim the oldest runnable job: a queued one, or a running one whose worker stopped
+-- heartbeating for lease_seconds_param. Jobs that already used max_attempts_param
+-- are failed instead of being retried again. Returns only what the worker needs to run it.
+DROP FUNCTION IF EXISTS claim_ingest_job(INTEGER, INTEGER);
+
+CREATE OR REPLACE FUNCTION claim_ingest_job(
+    lease_seconds_param INTEGER DEFAULT 300,
+    max_attempts_param INTEGER DEFAULT 3
+)
+RETURNS TABLE (
+    id UUID,
+    filename VARCHAR(255),
+    created_by VARCHAR(255),
+    created_by_email VARCHAR(255),
+    attempts INTEGER
+) AS $$
+BEGIN
+    -- Columns are qualified throughout: the output columns are also variables in this body
+    UPDATE ingest_jobs s
+    SET status = 'failed',
+        error = 'Job was interrupted too many times',
+        finished_at = NOW(),
+        updated_at = NOW()
+    WHERE s.status = 'running'
+      AND s.heartbeat_at < NOW() - make_interval(secs => lease_seconds_param)
+      AND s.attempts >= max_attempts_param;
+
+    RETURN QUERY
+    UPDATE ingest_jobs j
+    SET status = 'running',
+        attempts = j.attempts + 1,
+        started_at = COALESCE(j.started_at, NOW()),
+        heartbeat_at = NOW(),
+        updated_at = NOW()
+    WHERE j.id = (
+        SELECT q.id
+        FROM ingest_jobs q
+        WHERE q.status = 'queued'
+           OR (q.status = 'running' AND q.heartbeat_at < NOW() - make_interval(secs => lease_seconds_param))
+        ORDER BY q.created_at, q.id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING j.id, j.filename, j.created_by, j.created_by_email, j.attempts;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Grant execute permission to authenticated users
+GRANT EXECUTE ON FUNCTION claim_ingest_job(INTEGER, INTEGER) TO authenticated;
+GRANT EXECUTE ON FUNCTION submit_ingest_job(UUID, VARCHAR, VARCHAR, TEXT, VARCHAR, VARCHAR) TO authenticated;
+GRANT EXECUTE ON FUNCTION get_ingest_job_payload(UUID) TO authenticated;
@@ -0,0 +1,231 @@
+-- Player Ledger Tables
+-- Running lifetime totals per player and for the whole club, maintained incrementally
+-- so the dashboard reads O(players) rows instead of scanning every game ever uploaded.
+-- Statement-level triggers on games apply each insert/update/delete batch in the same
+-- transaction as the games write, so an upload batch and its ledger delta commit together.
+
+CREATE TABLE IF NOT EXISTS player_ledger (
+    player_id VARCHAR(255) PRIMARY KEY,
+    lifetime_profit DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    lifetime_tips DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    lifetime_hands BIGINT NOT NULL DEFAULT 0,
+    game_count BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS ledger_totals (
+    id INTEGER PRIMARY KEY DEFAULT 1,
+    total_profit DECIMAL(16, 2) NOT NULL DEFAULT 0,
+    total_tips DECIMAL(16, 2) NOT NULL DEFAULT 0,
+    total_hands BIGINT NOT NULL DEFAULT 0,
+    game_count BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    CONSTRAINT single_row CHECK (id = 1)
+);
+
+INSERT INTO ledger_totals (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+
+-- Apply the rows touched by one games statement to the ledger.
+-- Inserted rows count positively, deleted rows negatively, updates as delete + insert.
+CREATE OR REPLACE FUNCTION apply_games_delta_to_ledger()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_delta JSONB;
+BEGIN
+    -- Transition tables only exist for the event that fired, so each branch reads its own
+    IF TG_OP = 'INSERT' THEN
+        SELECT jsonb_agg(d) INTO v_delta FROM (
+            SELECT n.player_id, SUM(n.profit) AS profit, SUM(n.tips) AS tips,
+                   SUM(COALESCE(n.hands, 0)) AS hands, COUNT(*) AS game_count
+            FROM new_rows n
+            GROUP BY n.player_id
+        ) d;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT jsonb_agg(d) INTO v_delta FROM (
+            SELECT o.player_id, -SUM(o.profit) AS profit, -SUM(o.tips) AS tips,
+                   -SUM(COALESCE(o.hands, 0)) AS hands, -COUNT(*) AS game_count
+            FROM old_rows o
+            GROUP BY o.player_id
+        ) d;
+    ELSE
+        SELECT jsonb_agg(d) INTO v_delta FROM (
+            SELECT c.player_id, SUM(c.profit) AS profit, SUM(c.tips) AS tips,
+                   SUM(c.hands) AS hands, SUM(c.game_count) AS game_count
+            FROM (
+                SELECT n.player_id, n.profit, n.tips, COALESCE(n.hands, 0) AS hands, 1 AS game_count FROM new_rows n
+                UNION ALL
+                SELECT o.player_id, -o.profit, -o.tips, -COALESCE(o.hands, 0), -1 FROM old_rows o
+            ) c
+            GROUP BY c.player_id
+        ) d;
+    END IF;
+
+    IF v_delta IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    -- Ordered by player_id so concurrent uploads lock ledger rows in the same order
+    INSERT INTO player_ledger AS pl (player_id, lifetime_profit, lifetime_tips, lifetime_hands, game_count)
+    SELECT d.player_id, d.profit, d.tips, d.hands, d.game_count
+    FROM jsonb_to_recordset(v_delta) AS d(player_id VARCHAR(255), profit DECIMAL(14, 2), tips DECIMAL(14, 2), hands BIGINT, game_count BIGINT)
+    ORDER BY d.player_id
+    ON CONFLICT (player_id) DO UPDATE SET
+        lifetime_profit = pl.lifetime_profit + EXCLUDED.lifetime_profit,
+        lifetime_tips = pl.lifetime_tips + EXCLUDED.lifetime_tips,
+        lifetime_hands = pl.lifetime_hands + EXCLUDED.lifetime_hands,
+        game_count = pl.game_count + EXCLUDED.game_count,
+        updated_at = NOW();
+
+    UPDATE ledger_totals t SET
+        total_profit = t.total_profit + s.profit,
+        total_tips = t.total_tips + s.tips,
+        total_hands = t.total_hands + s.hands,
+        game_count = t.game_count + s.game_count,
+        updated_at = NOW()
+    FROM (
+        SELECT SUM(d.profit) AS profit, SUM(d.tips) AS tips, SUM(d.hands) AS hands, SUM(d.game_count) AS game_count
+        FROM jsonb_to_recordset(v_delta) AS d(profit DECIMAL(14, 2), tips DECIMAL(14, 2), hands BIGINT, game_count BIGINT)
+    ) s
+    WHERE t.id = 1;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Transition tables require one trigger per event
+DROP TRIGGER IF EXISTS games_ledger_insert ON games;
+CREATE TRIGGER games_ledger_insert
+    AFTER INSERT ON games
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_games_delta_to_ledger();
+
+DROP TRIGGER IF EXISTS games_ledger_update ON games;
+CREATE TRIGGER games_ledger_update
+    AFTER UPDATE ON games
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_games_delta_to_ledger();
+
+DROP TRIGGER IF EXISTS games_ledger_delete ON games;
+CREATE TRIGGER games_ledger_delete
+    AFTER DELETE ON games
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_games_delta_to_ledger();
+
+-- Recompute the whole ledger from the games table
+-- Blocks concurrent games writes for the duration so no batch is counted twice or missed
+CREATE OR REPLACE FUNCTION rebuild_player_ledger()
+RETURNS BIGINT AS $$
+DECLARE
+    v_players BIGINT;
+BEGIN
+    LOCK TABLE games IN SHARE MODE;
+
+    DELETE FROM player_ledger WHERE TRUE;
+
+    INSERT INTO player_ledger (player_id, lifetime_profit, lifetime_tips, lifetime_hands, game_count)
+    SELECT g.player_id, SUM(g.profit), SUM(g.tips), SUM(COALESCE(g.hands, 0)), COUNT(*)
+    FROM games g
+    GROUP BY g.player_id;
+
+    GET DIAGNOSTICS v_players = ROW_COUNT;
+
+    INSERT INTO ledger_totals AS t (id, total_profit, total_tips, total_hands, game_count, updated_at)
+    SELECT 1, COALESCE(SUM(g.profit), 0), COALESCE(SUM(g.tips), 0), COALESCE(SUM(COALESCE(g.hands, 0)), 0), COUNT(*), NOW()
+    FROM games g
+    ON CONFLICT (id) DO UPDATE SET
+        total_profit = EXCLUDED.total_profit,
+        total_tips = EXCLUDED.total_tips,
+        total_hands = EXCLUDED.total_hands,
+        game_count = EXCLUDED.game_count,
+        updated_at = NOW();
+
+    RETURN v_players;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Compare the ledger against a fresh aggregate of games and return every disagreement
+-- The club-wide totals row is reported with player_id NULL
+CREATE OR REPLACE FUNCTION verify_player_ledger()
+RETURNS TABLE (
+    player_id VARCHAR(255),
+    ledger_profit DECIMAL(16, 2),
+    actual_profit DECIMAL(16, 2),
+    ledger_tips DECIMAL(16, 2),
+    actual_tips DECIMAL(16, 2),
+    ledger_hands BIGINT,
+    actual_hands BIGINT,
+    ledger_game_count BIGINT,
+    actual_game_count BIGINT
+) AS $$
+BEGIN
+    RETURN QUERY
+    WITH actual AS (
+        SELECT g.player_id, SUM(g.profit) AS profit, SUM(g.tips) AS tips,
+               SUM(COALESCE(g.hands, 0))::BIGINT AS hands, COUNT(*)::BIGINT AS game_count
+        FROM games g
+        GROUP BY g.player_id
+    ),
+    per_player AS (
+        SELECT
+            COALESCE(l.player_id, a.player_id)::VARCHAR(255) AS player_id,
+            COALESCE(l.lifetime_profit, 0)::DECIMAL(16, 2) AS ledger_profit,
+            COALESCE(a.profit, 0)::DECIMAL(16, 2) AS actual_profit,
+            COALESCE(l.lifetime_tips, 0)::DECIMAL(16, 2) AS ledger_tips,
+            COALESCE(a.tips, 0)::DECIMAL(16, 2) AS actual_tips,
+            COALESCE(l.lifetime_hands, 0)::BIGINT AS ledger_hands,
+            COALESCE(a.hands, 0)::BIGINT AS actual_hands,
+            COALESCE(l.game_count, 0)::BIGINT AS ledger_game_count,
+            COALESCE(a.game_count, 0)::BIGINT AS actual_game_count
+        FROM player_ledger l
+        FULL OUTER JOIN actual a ON a.player_id = l.player_id
+    ),
+    totals AS (
+        SELECT
+            NULL::VARCHAR(255) AS player_id,
+            t.total_profit::DECIMAL(16, 2),
+            (SELECT COALESCE(SUM(a.profit), 0) FROM actual a)::DECIMAL(16, 2),
+            t.total_tips::DECIMAL(16, 2),
+            (SELECT COALESCE(SUM(a.tips), 0) FROM actual a)::DECIMAL(16, 2),
+            t.total_hands::BIGINT,
+            (SELECT COALESCE(SUM(a.hands), 0) FROM actual a)::BIGINT,
+            t.game_count::BIGINT,
+            (SELECT COALESCE(SUM(a.game_count), 0) FROM actual a)::BIGINT
+        FROM ledger_totals t
+        WHERE t.id = 1
+    )
+    SELECT * FROM (
+        SELECT * FROM per_player
+        UNION ALL
+        SELECT * FROM totals
+    ) r
+    WHERE r.ledger_profit <> r.actual_profit
+       OR r.ledger_tips <> r.actual_tips
+       OR r.ledger_hands <> r.actual_hands
+       OR r.ledger_game_count <> r.actual_game_count
+    ORDER BY r.player_id NULLS FIRST;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Lifetime profit for the given players. Called over POST with the ids in the body,
+-- so the list is not limited by URL length the way an in.(...) filter is.
+CREATE OR REPLACE FUNCTION get_player_lifetime_profits(player_ids_param TEXT[])
+RETURNS TABLE (
+    player_id VARCHAR(255),
+    lifetime_profit DECIMAL(14, 2)
+) AS $$
+    SELECT l.player_id, l.lifetime_profit
+    FROM player_ledger l
+    WHERE l.player_id = ANY(player_ids_param);
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+-- Backfill from the existing games
+SELECT rebuild_player_ledger();
+
+-- Grant permissions
+GRANT SELECT ON player_ledger TO authenticated;
+GRANT SELECT ON ledger_totals TO authenticated;
+GRANT EXECUTE ON FUNCTION verify_player_ledger() TO authenticated;
+GRANT EXECUTE ON FUNCTION get_player_lifetime_profits(TEXT[]) TO authenticated;
@@ -0,0 +1,47 @@
+-- Unknown Player Counter
+-- Hands out the numbers behind the '#UNKN<n>' player IDs given to 'unknown player' rows.
+-- A single counter row is advanced with one UPDATE ... RETURNING, so each upload reserves
+-- a whole block of numbers in one round trip and concurrent uploads never share a number.
+
+CREATE TABLE IF NOT EXISTS unknown_player_counter (
+    id INTEGER PRIMARY KEY DEFAULT 1,
+    last_value BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    CONSTRAINT single_row CHECK (id = 1)
+);
+
+-- Start after the highest number already in use
+INSERT INTO unknown_player_counter (id, last_value)
+SELECT 1, COALESCE(MAX(substring(g.player_id FROM '^#UNKN([0-9]+)$')::BIGINT), 0)
+FROM games g
+WHERE g.player_id LIKE '#UNKN%'
+ON CONFLICT (id) DO UPDATE
+SET last_value = GREATEST(unknown_player_counter.last_value, EXCLUDED.last_value),
+    updated_at = NOW();
+
+-- Reserve block_size_param consecutive numbers and return the first of them
+CREATE OR REPLACE FUNCTION allocate_unknown_player_ids(block_size_param INTEGER)
+RETURNS BIGINT AS $$
+DECLARE
+    v_last BIGINT;
+BEGIN
+    IF block_size_param IS NULL OR block_size_param < 1 THEN
+        RAISE EXCEPTION 'block_size_param must be a positive integer';
+    END IF;
+
+    UPDATE unknown_player_counter
+    SET last_value = last_value + block_size_param,
+        updated_at = NOW()
+    WHERE id = 1
+    RETURNING last_value INTO v_last;
+
+    IF v_last IS NULL THEN
+        RAISE EXCEPTION 'unknown_player_counter is not initialised';
+    END IF;
+
+    RETURN v_last - block_size_param + 1;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Grant execute permission to authenticated users
+GRANT EXECUTE ON FUNCTION allocate_unknown_player_ids(INTEGER) TO authenticated;
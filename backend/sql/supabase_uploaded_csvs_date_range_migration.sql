@@ -0,0 +1,18 @@
+-- Migration: record the game date range covered by each uploaded CSV
+-- Lets the API invalidate cached reports for exactly the weeks an upload touched,
+-- including uploads made by the email ingestor in another process.
+
+ALTER TABLE uploaded_csvs ADD COLUMN IF NOT EXISTS min_date_started TIMESTAMP WITH TIME ZONE;
+ALTER TABLE uploaded_csvs ADD COLUMN IF NOT EXISTS max_date_ended TIMESTAMP WITH TIME ZONE;
+
+-- Backfill existing uploads from their games
+UPDATE uploaded_csvs u
+SET min_date_started = g.min_date_started,
+    max_date_ended = g.max_date_ended
+FROM (
+    SELECT game_code, MIN(date_started) AS min_date_started, MAX(date_ended) AS max_date_ended
+    FROM games
+    GROUP BY game_code
+) g
+WHERE u.game_code = g.game_code
+  AND u.min_date_started IS NULL;
@@ -1,13 +1,19 @@
 import os
 import sys
+import time
+import asyncio
+import argparse
+from collections import defaultdict
 from pathlib import Path
 from datetime import datetime, timedelta
 import pytz
 from dotenv import load_dotenv
 
 try:
-    from telegram import Update  # type: ignore
+    from telegram import Bot, Update  # type: ignore
+    from telegram.error import RetryAfter, NetworkError, TelegramError  # type: ignore
     from telegram.ext import Application, CommandHandler, ContextTypes  # type: ignore
+    from telegram.request import HTTPXRequest  # type: ignore
 except ImportError as e:
     raise ImportError(
         "Failed to import from 'telegram'. Make sure 'python-telegram-bot==20.7' is installed. "
@@ -20,7 +26,8 @@ backend_dir = Path(__file__).parent
 if str(backend_dir) not in sys.path:
     sys.path.insert(0, str(backend_dir))
 
-from utils.datetime_utils import get_last_thursday_12am_texas
+from utils.datetime_utils import get_last_thursday_12am_texas, get_last_closed_week_texas
+from data.db import run_query, shutdown_executor
 
 load_dotenv()  # Load .env as base
 app_env = os.getenv('APP_ENV', 'development')
@@ -39,6 +46,27 @@ if not SUPABASE_URL or not SUPABASE_KEY:
 
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# At most this many bot queries run against the database at once; a burst of
+# /week at the Thursday rollover waits here instead of piling onto Postgres
+BOT_DB_CONCURRENCY = int(os.getenv('BOT_DB_CONCURRENCY', '4'))
+
+# Weekly broadcast: messages in flight at once, and the overall send rate. Telegram allows
+# about 30 messages per second across chats before it starts answering with RetryAfter.
+BROADCAST_CONCURRENCY = int(os.getenv('BROADCAST_CONCURRENCY', '8'))
+BROADCAST_MESSAGES_PER_SECOND = float(os.getenv('BROADCAST_MESSAGES_PER_SECOND', '25'))
+BROADCAST_MAX_ATTEMPTS = 3
+_db_semaphore = asyncio.Semaphore(BOT_DB_CONCURRENCY)
+
+
+async def _run_bounded(query):
+    async with _db_semaphore:
+        return await run_query(query)
+
+
+async def run_bot_queries(*queries) -> list:
+    """Execute query builders concurrently off the event loop, within the bot's database budget."""
+    return list(await asyncio.gather(*(_run_bounded(q) for q in queries)))
+
 
 def format_number(value):
     if value is None:
@@ -157,7 +185,9 @@ async def get_agent_report_for_period(update: Update, start_date: datetime, end_
     chat_id = str(update.message.chat_id)
     
     try:
-        mapping_response = supabase.table('agent_telegram_mapping').select('agent_id').eq('chat_id', chat_id).execute()
+        [mapping_response] = await run_bot_queries(
+            supabase.table('agent_telegram_mapping').select('agent_id').eq('chat_id', chat_id)
+        )
         
         if not mapping_response.data or len(mapping_response.data) == 0:
             await update.message.reply_text(
@@ -172,31 +202,19 @@ async def get_agent_report_for_period(update: Update, start_date: datetime, end_
 
         processing_msg = await update.message.reply_text("Fetching your report...")
 
-        aggregated_response = supabase.rpc(
-            'get_agent_report',
-            {
-                'start_date_param': start_date_iso,
-                'end_date_param': end_date_iso
-            }
-        ).execute()
-        
-        agent_aggregated_data = [
-            row for row in aggregated_response.data 
-            if row.get('agent_id') == agent_id
-        ]
-        
-        detailed_response = supabase.rpc(
-            'get_detailed_agent_report',
-            {
-                'start_date_param': start_date_iso,
-                'end_date_param': end_date_iso
-            }
-        ).execute()
+        # Scoped to this agent in SQL, so a report reads only their players' games
+        report_params = {
+            'start_date_param': start_date_iso,
+            'end_date_param': end_date_iso,
+            'agent_id_param': agent_id
+        }
         
-        agent_detailed_data = [
-            row for row in detailed_response.data 
-            if row.get('agent_id') == agent_id
-        ]
+        aggregated_response, detailed_response = await run_bot_queries(
+            supabase.rpc('get_agent_report', report_params),
+            supabase.rpc('get_detailed_agent_report', report_params)
+        )
+        agent_aggregated_data = aggregated_response.data or []
+        agent_detailed_data = detailed_response.data or []
         
         if agent_aggregated_data or agent_detailed_data:
             message = format_agent_report_message(agent_aggregated_data, agent_detailed_data, period_label, start_date, end_date)
@@ -237,9 +255,148 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+class _RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across all tasks, and holds them all during a pause."""
+
+    def __init__(self, rate: float):
+        self._interval = 1 / rate
+        self._next = 0.0
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        # Telegram's flood limit is per bot, so one RetryAfter stops every sender
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next, self._paused_until)
+            self._next = start + self._interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+def _retry_after_seconds(error: RetryAfter) -> float:
+    # int in python-telegram-bot 20/21, timedelta when newer versions opt in to it
+    retry_after = error.retry_after
+    return retry_after.total_seconds() if isinstance(retry_after, timedelta) else float(retry_after)
+
+
+async def _send_report(bot: Bot, limiter: _RateLimiter, semaphore: asyncio.Semaphore, chat_id: str, text: str) -> dict:
+    """Send one message, retrying RetryAfter and network errors; returns the per-chat result."""
+    async with semaphore:
+        for attempt in range(1, BROADCAST_MAX_ATTEMPTS + 1):
+            await limiter.wait()
+            try:
+                await bot.send_message(chat_id=chat_id, text=text, parse_mode='HTML')
+                return {'status': 'sent', 'attempts': attempt}
+            except RetryAfter as e:
+                if attempt == BROADCAST_MAX_ATTEMPTS:
+                    return {'status': 'failed', 'attempts': attempt, 'error': str(e)}
+                # The next limiter.wait() sleeps out the pause along with every other sender
+                limiter.pause(_retry_after_seconds(e))
+            except NetworkError as e:
+                # Includes timeouts; BadRequest and Forbidden are not NetworkErrors and fail at once
+                if attempt == BROADCAST_MAX_ATTEMPTS:
+                    return {'status': 'failed', 'attempts': attempt, 'error': str(e)}
+                await asyncio.sleep(2 ** attempt)
+            except TelegramError as e:
+                return {'status': 'failed', 'attempts': attempt, 'error': str(e)}
+
+
+async def broadcast_weekly_reports(dry_run: bool = False) -> dict:
+    """Send every mapped agent their report for the last closed week (Thursday to Thursday).
+
+    Both reports are computed once for the whole club and split per agent, so the database
+    cost does not grow with the number of chats.
+    """
+    started = time.monotonic()
+    start_date, end_date = get_last_closed_week_texas()
+    report_params = {
+        'start_date_param': start_date.isoformat(),
+        'end_date_param': end_date.isoformat()
+    }
+    
+    mapping_response, aggregated_response, detailed_response = await run_bot_queries(
+        supabase.table('agent_telegram_mapping').select('agent_id,chat_id'),
+        supabase.rpc('get_agent_report', report_params),
+        supabase.rpc('get_detailed_agent_report', report_params)
+    )
+    query_seconds = time.monotonic() - started
+    
+    aggregated_by_agent = defaultdict(list)
+    for row in aggregated_response.data or []:
+        aggregated_by_agent[row['agent_id']].append(row)
+    detailed_by_agent = defaultdict(list)
+    for row in detailed_response.data or []:
+        detailed_by_agent[row['agent_id']].append(row)
+    
+    # Shown as the last day of the week rather than the Thursday that closes it
+    display_end = end_date - timedelta(microseconds=1)
+    results = []
+    sends = []
+    for mapping in mapping_response.data or []:
+        agent_id, chat_id = mapping['agent_id'], str(mapping['chat_id'])
+        result = {'agent_id': agent_id, 'chat_id': chat_id}
+        results.append(result)
+        if not aggregated_by_agent.get(agent_id) and not detailed_by_agent.get(agent_id):
+            result.update(status='skipped', error='No games in the period')
+            continue
+        message = format_agent_report_message(
+            aggregated_by_agent[agent_id], detailed_by_agent[agent_id], 'Weekly', start_date, display_end
+        )
+        if dry_run:
+            result.update(status='dry_run', message_length=len(message))
+            continue
+        sends.append((result, chat_id, message))
+    
+    send_started = time.monotonic()
+    if sends:
+        limiter = _RateLimiter(BROADCAST_MESSAGES_PER_SECOND)
+        semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+        request = HTTPXRequest(connection_pool_size=BROADCAST_CONCURRENCY)
+        async with Bot(TELEGRAM_BOT_TOKEN, request=request) as bot:
+            outcomes = await asyncio.gather(*(
+                _send_report(bot, limiter, semaphore, chat_id, message) for _, chat_id, message in sends
+            ))
+        for (result, _, _), outcome in zip(sends, outcomes):
+            result.update(outcome)
+    send_seconds = time.monotonic() - send_started
+    
+    counts = defaultdict(int)
+    for result in results:
+        counts[result['status']] += 1
+    return {
+        'success': counts['failed'] == 0,
+        'dry_run': dry_run,
+        'period_start': start_date.isoformat(),
+        'period_end': end_date.isoformat(),
+        'chats': len(results),
+        'sent': counts['sent'],
+        'failed': counts['failed'],
+        'skipped': counts['skipped'],
+        'query_seconds': round(query_seconds, 3),
+        'send_seconds': round(send_seconds, 3),
+        'messages_per_second': round(counts['sent'] / send_seconds, 2) if counts['sent'] and send_seconds else None,
+        'results': results
+    }
+
+
+async def on_shutdown(application: Application):
+    shutdown_executor()
+
+
 def main():
     print("Starting Telegram bot server...")
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        # Handle chats concurrently; database load is bounded by BOT_DB_CONCURRENCY instead
+        .concurrent_updates(True)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("week", week_command))
     application.add_handler(CommandHandler("month", month_command))
@@ -249,5 +406,17 @@ def main():
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Agent report Telegram bot')
+    parser.add_argument('--broadcast-weekly', action='store_true', help="Send every mapped agent last week's report and exit")
+    parser.add_argument('--dry-run', action='store_true', help='With --broadcast-weekly: build the messages without sending them')
+    args = parser.parse_args()
+    
+    if args.broadcast_weekly:
+        try:
+            result = asyncio.run(broadcast_weekly_reports(dry_run=args.dry_run))
+        finally:
+            shutdown_executor()
+        print(result)
+        sys.exit(0 if result['success'] else 1)
     main()
 
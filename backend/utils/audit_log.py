@@ -1,11 +1,42 @@
+import os
+import asyncio
 import logging
+from datetime import datetime, timezone
 from supabase.client import Client
 from data.schemas.df_schemas import User
+from data.db import run_query
 
 logger = logging.getLogger(__name__)
 
 TABLE_AUDIT_LOGS = 'audit_logs'
 
+# Entries waiting to be written; once full, log() waits up to AUDIT_LOG_ENQUEUE_TIMEOUT_SECONDS and then drops
+AUDIT_LOG_QUEUE_SIZE = int(os.getenv('AUDIT_LOG_QUEUE_SIZE', '10000'))
+AUDIT_LOG_ENQUEUE_TIMEOUT_SECONDS = float(os.getenv('AUDIT_LOG_ENQUEUE_TIMEOUT_SECONDS', '1'))
+
+# A bulk insert goes out when this many entries are waiting or the oldest has waited this long
+AUDIT_LOG_BATCH_SIZE = int(os.getenv('AUDIT_LOG_BATCH_SIZE', '500'))
+AUDIT_LOG_FLUSH_SECONDS = float(os.getenv('AUDIT_LOG_FLUSH_SECONDS', '1'))
+
+AUDIT_LOG_MAX_ATTEMPTS = int(os.getenv('AUDIT_LOG_MAX_ATTEMPTS', '3'))
+
+
+def _log_entry(
+    user: User,
+    operation_type: str,
+    table_name: str,
+    record_id: str | int | None,
+    operation_data: dict | None,
+) -> dict:
+    return {
+        'user_id': user.id,
+        'user_email': user.email,
+        'operation_type': operation_type,
+        'table_name': table_name,
+        'record_id': str(record_id) if record_id is not None else None,
+        'operation_data': operation_data
+    }
+
 def log_operation(
     supabase: Client,
     user: User,
@@ -15,16 +46,134 @@ def log_operation(
     operation_data: dict | None = None
 ):
     try:
-        log_entry = {
-            'user_id': user.id,
-            'user_email': user.email,
-            'operation_type': operation_type,
-            'table_name': table_name,
-            'record_id': str(record_id) if record_id is not None else None,
-            'operation_data': operation_data
-        }
+        log_entry = _log_entry(user, operation_type, table_name, record_id, operation_data)
 
         supabase.table(TABLE_AUDIT_LOGS).insert(log_entry).execute()
     except Exception as e:
         logger.error("Failed to write audit log for operation '%s' on '%s': %s", operation_type, table_name, e)
 
+
+
+class AuditLogWriter:
+    """Buffers audit entries in memory and writes them to audit_logs in bulk inserts off the request path.
+
+    Each entry is stamped with created_at when it is logged, so batching does not shift its
+    time. A failed batch is retried, then written row by row so one bad entry cannot take the
+    rest of the batch with it. stop() drains whatever is still queued.
+    """
+
+    def __init__(
+        self,
+        supabase: Client,
+        queue_size: int = AUDIT_LOG_QUEUE_SIZE,
+        batch_size: int = AUDIT_LOG_BATCH_SIZE,
+        flush_seconds: float = AUDIT_LOG_FLUSH_SECONDS,
+        enqueue_timeout_seconds: float = AUDIT_LOG_ENQUEUE_TIMEOUT_SECONDS,
+        max_attempts: int = AUDIT_LOG_MAX_ATTEMPTS,
+    ):
+        self._supabase = supabase
+        self._queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=queue_size)
+        self._batch_size = batch_size
+        self._flush_seconds = flush_seconds
+        self._enqueue_timeout_seconds = enqueue_timeout_seconds
+        self._max_attempts = max_attempts
+        self._task: asyncio.Task | None = None
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, drain_timeout: float = 10.0):
+        """Write out everything still queued (up to drain_timeout), then stop the writer."""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.error('Dropping %d audit log entries still queued at shutdown', self._queue.qsize())
+            self.dropped += self._queue.qsize()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def log(
+        self,
+        user: User,
+        operation_type: str,
+        table_name: str,
+        record_id: str | int | None = None,
+        operation_data: dict | None = None
+    ):
+        """Queue an entry; waits briefly when the queue is full and drops the entry if it stays full."""
+        entry = _log_entry(user, operation_type, table_name, record_id, operation_data)
+        entry['created_at'] = datetime.now(timezone.utc).isoformat()
+        try:
+            await asyncio.wait_for(self._queue.put(entry), timeout=self._enqueue_timeout_seconds)
+        except asyncio.TimeoutError:
+            self.dropped += 1
+            logger.error("Audit log queue full; dropped entry for operation '%s' on '%s'", operation_type, table_name)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self._flush_seconds
+            while len(batch) < self._batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _insert(self, rows: list[dict]):
+        await run_query(self._supabase.table(TABLE_AUDIT_LOGS).insert(rows, returning='minimal'))
+
+    async def _write(self, batch: list[dict]):
+        for attempt in range(1, self._max_attempts + 1):
+            try:
+                await self._insert(batch)
+                self.written += len(batch)
+                self.batches += 1
+                return
+            except Exception as e:
+                logger.warning('Failed to write %d audit log entries (attempt %d): %s', len(batch), attempt, e)
+                if attempt < self._max_attempts:
+                    self.retries += 1
+                    await asyncio.sleep(2 ** (attempt - 1))
+
+        if len(batch) == 1:
+            self.failed += 1
+            logger.error("Failed to write audit log for operation '%s' on '%s'", batch[0]['operation_type'], batch[0]['table_name'])
+            return
+
+        # Isolate the entries that cannot be written from the ones that can
+        for entry in batch:
+            try:
+                await self._insert([entry])
+                self.written += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error("Failed to write audit log for operation '%s' on '%s': %s", entry['operation_type'], entry['table_name'], e)
+
+    def stats(self) -> dict:
+        return {
+            'queued': self._queue.qsize(),
+            'queue_size': self._queue.maxsize,
+            'written': self.written,
+            'batches': self.batches,
+            'retries': self.retries,
+            'dropped': self.dropped,
+            'failed': self.failed,
+        }
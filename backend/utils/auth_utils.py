@@ -1,16 +1,98 @@
+import os
 import json
+import time
+import asyncio
 import base64
+import hashlib
 import logging
 import urllib.request
+from collections import OrderedDict
 import jwt
 from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jwt.algorithms import ECAlgorithm
 from data.schemas.df_schemas import User
+from data.db import run_sync
 
 logger = logging.getLogger(__name__)
 
-_jwks_cache: dict = {}
+# JWKS is re-fetched this often in the background so rotated keys are picked up before they are used
+JWKS_REFRESH_SECONDS = float(os.getenv('JWKS_REFRESH_SECONDS', '600'))
+
+# A token with an unknown kid triggers at most one JWKS fetch per this many seconds
+JWKS_MIN_REFETCH_SECONDS = float(os.getenv('JWKS_MIN_REFETCH_SECONDS', '30'))
+
+# How long a kid that JWKS does not contain is rejected without asking the auth server again
+JWKS_NEGATIVE_TTL_SECONDS = float(os.getenv('JWKS_NEGATIVE_TTL_SECONDS', '300'))
+JWKS_NEGATIVE_CACHE_MAX_ENTRIES = 1024
+
+# Verified tokens kept in memory; each entry is dropped at the token's exp at the latest
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv('TOKEN_CACHE_MAX_ENTRIES', '1024'))
+
+
+class TokenCache:
+    """Bounded LRU of verified bearer tokens, keyed by the token's sha256, holding the decoded User.
+
+    A hit skips header decoding and signature verification entirely. Entries expire at the
+    token's exp claim; tokens without one are never cached.
+    """
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_MAX_ENTRIES):
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[User, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.verifications = 0
+        self.verify_seconds = 0.0
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, key: str) -> User | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        user, exp = entry
+        if time.time() >= exp:
+            del self._entries[key]
+            self.expired += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return user
+
+    def put(self, key: str, user: User, exp: float | None):
+        if exp is None or time.time() >= exp:
+            return
+        self._entries[key] = (user, exp)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def record_verification(self, seconds: float):
+        self.verifications += 1
+        self.verify_seconds += seconds
+
+    def stats(self) -> dict:
+        avg_verify = self.verify_seconds / self.verifications if self.verifications else 0.0
+        return {
+            'entries': len(self._entries),
+            'max_entries': self._max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'expired': self.expired,
+            'evictions': self.evictions,
+            'verifications': self.verifications,
+            'avg_verify_ms': round(avg_verify * 1000, 3),
+            # Verification time the hits would have cost at the observed average
+            'saved_verify_seconds': round(self.hits * avg_verify, 3),
+        }
 
 
 def _fetch_jwks(jwks_url: str, api_key: str) -> dict:
@@ -22,35 +104,187 @@ def _fetch_jwks(jwks_url: str, api_key: str) -> dict:
     return {k['kid']: k for k in jwks_data.get('keys', []) if 'kid' in k}
 
 
-def get_es256_public_key(supabase_url: str, api_key: str, kid: str):
-    """Return the cached ECAlgorithm public key for kid, fetching JWKS if needed."""
-    global _jwks_cache
+class JwksCache:
+    """Supabase signing keys (kid -> ECAlgorithm public key), loaded at startup and refreshed on a schedule.
+
+    The JWKS fetch always runs on the I/O pool and at most one is in flight; requests that
+    need it wait on that fetch instead of starting their own. A kid that is still missing
+    after a fetch that started after the kid was first seen is remembered as unknown for
+    JWKS_NEGATIVE_TTL_SECONDS. A miss never refetches more often than JWKS_MIN_REFETCH_SECONDS,
+    so bogus tokens cannot hammer the auth server; a miss inside that window is rejected without
+    being remembered and a refetch is scheduled for when the window opens, so a freshly rotated
+    key is picked up then. Each fetch replaces the whole key set, dropping rotated-out keys.
+    """
+
+    def __init__(
+        self,
+        supabase_url: str,
+        api_key: str,
+        refresh_seconds: float = JWKS_REFRESH_SECONDS,
+        min_refetch_seconds: float = JWKS_MIN_REFETCH_SECONDS,
+        negative_ttl_seconds: float = JWKS_NEGATIVE_TTL_SECONDS,
+    ):
+        self._jwks_url = f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json"
+        self._api_key = api_key
+        self._refresh_seconds = refresh_seconds
+        self._min_refetch_seconds = min_refetch_seconds
+        self._negative_ttl_seconds = negative_ttl_seconds
+        self._keys: dict = {}
+        self._unknown: OrderedDict[str, float] = OrderedDict()
+        self._inflight: asyncio.Future | None = None
+        self._task: asyncio.Task | None = None
+        self._refetch_task: asyncio.Task | None = None
+        self._attempted_at: float | None = None
+        self._loaded_at: float | None = None
+        # When the fetch that produced the current key set started
+        self._load_started_at: float | None = None
+        self.refreshes = 0
+        self.failures = 0
+        self.misses = 0
+        self.negative_hits = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
 
-    if kid not in _jwks_cache:
-        jwks_url = f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json"
+    async def stop(self):
+        for task in (self._task, self._refetch_task):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._task = None
+        self._refetch_task = None
+
+    async def _refresh_loop(self):
+        while True:
+            ok = await self.refresh()
+            # Retry a failed load sooner than the regular schedule
+            await asyncio.sleep(self._refresh_seconds if ok else min(self._refresh_seconds, self._min_refetch_seconds))
+
+    async def refresh(self) -> bool:
+        """Fetch JWKS, joining the fetch already in flight if there is one. Returns whether it succeeded."""
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._load())
+            self._inflight.add_done_callback(self._clear_inflight)
+        # Shielded so one cancelled request does not abort the fetch the others are waiting on
+        return await asyncio.shield(self._inflight)
+
+    def _clear_inflight(self, future: asyncio.Future):
+        if self._inflight is future:
+            self._inflight = None
+
+    async def _load(self) -> bool:
+        started_at = self._attempted_at = time.monotonic()
         try:
-            keys = _fetch_jwks(jwks_url, api_key)
+            jwks = await run_sync(_fetch_jwks, self._jwks_url, self._api_key)
         except Exception as e:
-            logger.error("Failed to fetch JWKS from %s: %s", jwks_url, e)
-            raise HTTPException(status_code=503, detail="Authentication service temporarily unavailable")
+            self.failures += 1
+            logger.error("Failed to fetch JWKS from %s: %s", self._jwks_url, e)
+            return False
 
+        keys = {}
+        for kid, key_data in jwks.items():
+            try:
+                keys[kid] = ECAlgorithm.from_jwk(json.dumps(key_data))
+            except Exception as e:
+                logger.warning("Skipping JWKS key %s: %s", kid, e)
         if not keys:
-            logger.error("JWKS response contained no keys from %s", jwks_url)
-            raise HTTPException(status_code=503, detail="Authentication service temporarily unavailable")
+            self.failures += 1
+            logger.error("JWKS response contained no keys from %s", self._jwks_url)
+            return False
+
+        self._keys = keys
+        self._loaded_at = time.monotonic()
+        self._load_started_at = started_at
+        self.refreshes += 1
+        for kid in keys:
+            self._unknown.pop(kid, None)
+        return True
+
+    def _known_unknown(self, kid: str) -> bool:
+        expires_at = self._unknown.get(kid)
+        if expires_at is None:
+            return False
+        if time.monotonic() >= expires_at:
+            del self._unknown[kid]
+            return False
+        return True
 
-        for k_id, key_data in keys.items():
-            _jwks_cache[k_id] = ECAlgorithm.from_jwk(json.dumps(key_data))
+    def _remember_unknown(self, kid: str):
+        self._unknown[kid] = time.monotonic() + self._negative_ttl_seconds
+        self._unknown.move_to_end(kid)
+        while len(self._unknown) > JWKS_NEGATIVE_CACHE_MAX_ENTRIES:
+            self._unknown.popitem(last=False)
 
-    if kid not in _jwks_cache:
+    def _schedule_refetch(self):
+        """Refresh once the min refetch window since the last attempt has passed (one pending at a time)."""
+        if self._refetch_task is not None and not self._refetch_task.done():
+            return
+        delay = max(0.0, self._attempted_at + self._min_refetch_seconds - time.monotonic()) if self._attempted_at is not None else 0.0
+        self._refetch_task = asyncio.create_task(self._refetch_after(delay))
+
+    async def _refetch_after(self, delay: float):
+        await asyncio.sleep(delay)
+        await self.refresh()
+
+    async def get_key(self, kid: str):
+        """Return the public key for kid, refreshing JWKS at most once per miss window."""
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+
+        if self._known_unknown(kid):
+            self.negative_hits += 1
+            raise HTTPException(status_code=401, detail="Invalid token: unknown key ID")
+
+        self.misses += 1
+        seen_at = time.monotonic()
+        recently_attempted = self._attempted_at is not None and time.monotonic() - self._attempted_at < self._min_refetch_seconds
+        if self._inflight is not None or not recently_attempted:
+            await self.refresh()
+
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        if not self._keys:
+            raise HTTPException(status_code=503, detail="Authentication service temporarily unavailable")
+        if self._load_started_at is not None and self._load_started_at >= seen_at:
+            # The key set was fetched after this kid showed up, so it really is unknown
+            self._remember_unknown(kid)
+        else:
+            # Rate-limited, or only joined a fetch that predates the kid: look it up when allowed
+            self._schedule_refetch()
         raise HTTPException(status_code=401, detail="Invalid token: unknown key ID")
 
-    return _jwks_cache[kid]
+    def stats(self) -> dict:
+        return {
+            'keys': len(self._keys),
+            'refreshes': self.refreshes,
+            'failures': self.failures,
+            'misses': self.misses,
+            'negative_hits': self.negative_hits,
+            'unknown_kids': len(self._unknown),
+            'age_seconds': round(time.monotonic() - self._loaded_at, 1) if self._loaded_at is not None else None,
+        }
 
 
-def create_get_current_user(security: HTTPBearer, supabase_url: str, supabase_key: str, supabase_jwt_secret: str | None):
+def create_get_current_user(
+    security: HTTPBearer,
+    jwks_cache: JwksCache,
+    supabase_jwt_secret: str | None,
+    token_cache: TokenCache | None = None,
+):
     async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
         token = credentials.credentials
 
+        cache_key = None
+        if token_cache is not None:
+            cache_key = token_cache.key(token)
+            user = token_cache.get(cache_key)
+            if user is not None:
+                return user
+        started = time.perf_counter()
+
         try:
             token_parts = token.split('.')
             if len(token_parts) != 3:
@@ -63,7 +297,7 @@ def create_get_current_user(security: HTTPBearer, supabase_url: str, supabase_ke
             if alg == 'ES256':
                 if not kid:
                     raise HTTPException(status_code=401, detail="Invalid token: missing key ID")
-                public_key = get_es256_public_key(supabase_url, supabase_key, kid)
+                public_key = await jwks_cache.get_key(kid)
                 try:
                     payload = jwt.decode(
                         token,
@@ -100,7 +334,11 @@ def create_get_current_user(security: HTTPBearer, supabase_url: str, supabase_ke
             if not user_id:
                 raise HTTPException(status_code=401, detail="Invalid token: missing user ID")
             
-            return User(id=user_id, email=email, user_metadata=user_metadata)
+            user = User(id=user_id, email=email, user_metadata=user_metadata)
+            if token_cache is not None:
+                token_cache.record_verification(time.perf_counter() - started)
+                token_cache.put(cache_key, user, payload.get("exp"))
+            return user
             
         except jwt.ExpiredSignatureError:
             raise HTTPException(status_code=401, detail="Token has expired")
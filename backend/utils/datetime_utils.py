@@ -30,6 +30,23 @@ def get_last_thursday_12am_texas():
     return last_thursday
 
 
+def get_last_closed_week_texas():
+    """(start, end) of the most recent full accounting week: the two Thursday midnights, Texas time.
+
+    Unlike get_last_thursday_12am_texas there is no noon rule, so on a Thursday morning the
+    week that closed at the previous midnight is returned.
+    """
+    texas_tz = pytz.timezone('America/Chicago')
+    today_texas = datetime.now(texas_tz).date()
+    week_end = today_texas - timedelta(days=(today_texas.weekday() - 3) % 7)
+    week_start = week_end - timedelta(days=7)
+    # Localize each midnight separately so a DST change inside the week gets the right offset
+    return (
+        texas_tz.localize(datetime.combine(week_start, datetime.min.time())),
+        texas_tz.localize(datetime.combine(week_end, datetime.min.time())),
+    )
+
+
 def get_current_week_range():
     last_thursday_texas = get_last_thursday_12am_texas()
     start_date = last_thursday_texas.date()
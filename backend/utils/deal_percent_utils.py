@@ -1,4 +1,6 @@
+import warnings
 from typing import Optional
+import polars as pl
 from supabase.client import Client
 
 TABLE_DEAL_PERCENT_RULES = 'agent_deal_percent_rules'
@@ -95,50 +97,132 @@ def _fetch_rules_cache(supabase: Client) -> dict:
     return cache
 
 
-def calculate_deal_percent_column(
-    supabase: Client,
-    games_df,
-    players_df
-) -> list[float]:
-    """Calculate deal_percent for each game row based on rules."""
-    import polars as pl
+def _rule_frames(rules: list[dict], agents: list[dict]) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+    """Split rule rows into sorted player-rule and agent-rule frames plus the agent defaults frame."""
+    rules_df = pl.DataFrame(
+        {
+            'agent_id': [r['agent_id'] for r in rules],
+            'rule_player_id': [r.get('player_id') for r in rules],
+            'threshold': [float(r['threshold']) for r in rules],
+            'deal_percent': [float(r['deal_percent']) for r in rules],
+        },
+        schema={'agent_id': pl.Int64, 'rule_player_id': pl.Int64, 'threshold': pl.Float64, 'deal_percent': pl.Float64},
+    )
+    player_rules = (
+        rules_df
+        .filter(pl.col('rule_player_id').is_not_null())
+        .select([
+            pl.col('agent_id'),
+            pl.col('rule_player_id').alias('player_id_int'),
+            pl.col('threshold'),
+            pl.col('deal_percent').alias('player_deal_percent'),
+        ])
+        .sort('threshold')
+    )
+    agent_rules = (
+        rules_df
+        .filter(pl.col('rule_player_id').is_null())
+        .select([
+            pl.col('agent_id'),
+            pl.col('threshold'),
+            pl.col('deal_percent').alias('agent_deal_percent'),
+        ])
+        .sort('threshold')
+    )
+    defaults = pl.DataFrame(
+        {
+            'agent_id': [a['agent_id'] for a in agents],
+            'default_deal_percent': [float(a['deal_percent']) if a.get('deal_percent') is not None else None for a in agents],
+        },
+        schema={'agent_id': pl.Int64, 'default_deal_percent': pl.Float64},
+    ).unique(subset='agent_id', keep='first')
+    return player_rules, agent_rules, defaults
 
-    rules_cache = _fetch_rules_cache(supabase)
 
-    games_with_players = games_df.join(
-        players_df.select([
-            pl.col('player_id').cast(pl.Utf8).alias('player_id'),
-            pl.col('agent_id').cast(pl.Int64).alias('agent_id')
-        ]),
-        on='player_id',
-        how='left'
+def _join_tiers(
+    games_df: pl.DataFrame,
+    players_df: pl.DataFrame,
+    player_rules: pl.DataFrame,
+    agent_rules: pl.DataFrame,
+    defaults: pl.DataFrame,
+) -> pl.DataFrame:
+    return (
+        games_df
+        .select([
+            pl.col('player_id').cast(pl.Utf8),
+            pl.col('tips').cast(pl.Float64).fill_null(0.0),
+        ])
+        .with_columns(pl.int_range(0, games_df.height).alias('_row'))
+        .join(
+            players_df.select([
+                pl.col('player_id').cast(pl.Utf8).alias('player_id'),
+                pl.col('agent_id').cast(pl.Int64).alias('agent_id')
+            ]).unique(subset='player_id', keep='first'),
+            on='player_id',
+            how='left'
+        )
+        .with_columns(pl.col('player_id').cast(pl.Int64, strict=False).alias('player_id_int'))
+        .sort('tips')
+        .join_asof(player_rules, left_on='tips', right_on='threshold', by=['agent_id', 'player_id_int'], strategy='backward')
+        .join_asof(agent_rules, left_on='tips', right_on='threshold', by='agent_id', strategy='backward')
+        .join(defaults, on='agent_id', how='left')
+        .sort('_row')
     )
-    
-    deal_percents = []
-    for row in games_with_players.iter_rows(named=True):
-        agent_id = row.get('agent_id')
-        player_id_str = row.get('player_id')
-        tips = float(row.get('tips', 0))
-        
-        if agent_id is None:
-            deal_percents.append(0.0)
-            continue
-        
-        player_id_int = None
-        if player_id_str:
-            try:
-                player_id_int = int(player_id_str)
-            except (ValueError, TypeError):
-                pass
-        
-        deal_percent = get_deal_percent_for_amount(
-            supabase,
-            int(agent_id),
-            player_id_int,
-            tips,
-            rules_cache
+
+
+def resolve_deal_percents(
+    games_df: pl.DataFrame,
+    players_df: pl.DataFrame,
+    rules: list[dict],
+    agents: list[dict],
+) -> pl.Series:
+    """Resolve deal_percent for every game row at once. Priority: player rules > agent rules > default.
+
+    Each tier is an as-of join on tips >= threshold (highest threshold wins) grouped by
+    agent (and player for player rules), so the cost is a sort plus two joins regardless
+    of how many games or rules there are. The result is aligned with games_df row order.
+    """
+    player_rules, agent_rules, defaults = _rule_frames(rules, agents)
+
+    # Both sides are sorted on the as-of key above; polars can't verify that when 'by' is used
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        frame = _join_tiers(games_df, players_df, player_rules, agent_rules, defaults)
+
+    return frame.select(
+        pl.when(pl.col('agent_id').is_null())
+        .then(0.0)
+        .otherwise(
+            pl.coalesce([
+                pl.col('player_deal_percent'),
+                pl.col('agent_deal_percent'),
+                pl.col('default_deal_percent'),
+                pl.lit(0.0),
+            ])
         )
-        deal_percents.append(deal_percent)
-    
-    return deal_percents
+        .alias('deal_percent')
+    ).to_series()
+
+
+def _fetch_rules_and_agents(supabase: Client) -> tuple[list[dict], list[dict]]:
+    rules = []
+    agents = []
+    try:
+        rules = supabase.table(TABLE_DEAL_PERCENT_RULES).select('*').execute().data or []
+    except Exception as e:
+        pass
+    try:
+        agents = supabase.table(TABLE_AGENTS).select('agent_id, deal_percent').execute().data or []
+    except Exception as e:
+        pass
+    return rules, agents
+
 
+def calculate_deal_percent_column(
+    supabase: Client,
+    games_df: pl.DataFrame,
+    players_df: pl.DataFrame
+) -> pl.Series:
+    """Calculate deal_percent for each game row based on rules."""
+    rules, agents = _fetch_rules_and_agents(supabase)
+    return resolve_deal_percents(games_df, players_df, rules, agents)
@@ -0,0 +1,19 @@
+import hashlib
+from fastapi import Request
+
+
+def make_etag(*parts) -> str:
+    """Weak ETag over the data version plus anything else the response depends on (resolved dates, params)."""
+    digest = hashlib.sha256('|'.join(str(p) for p in parts).encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison of etag against the request's If-None-Match list."""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    wanted = etag.removeprefix('W/')
+    return any(tag.strip().removeprefix('W/') == wanted for tag in header.split(','))
@@ -0,0 +1,65 @@
+import io
+from fastapi import Request
+from fastapi.responses import Response
+import polars as pl
+from data.db import run_sync
+
+FORMAT_JSON = 'json'
+FORMAT_NDJSON = 'ndjson'
+FORMAT_ARROW = 'arrow'
+FORMAT_PARQUET = 'parquet'
+
+MEDIA_TYPES = {
+    FORMAT_JSON: 'application/json',
+    FORMAT_NDJSON: 'application/x-ndjson',
+    FORMAT_ARROW: 'application/vnd.apache.arrow.stream',
+    FORMAT_PARQUET: 'application/vnd.apache.parquet',
+}
+
+# Formats served from a polars frame in one piece rather than as JSON rows
+BINARY_FORMATS = (FORMAT_ARROW, FORMAT_PARQUET)
+
+
+def negotiate_format(request: Request, format: str | None, supported: tuple[str, ...]) -> str:
+    """Pick the response format from the format= param, else the Accept header; JSON by default.
+
+    Raises ValueError for an unsupported format= value so handlers return it as a 400.
+    """
+    if format is not None:
+        fmt = format.lower()
+        if fmt not in supported:
+            raise ValueError(f"Unsupported format '{format}'. Expected one of: {', '.join(supported)}")
+        return fmt
+
+    # First supported media type the client lists wins; q-values are not weighed
+    for item in request.headers.get('accept', '').split(','):
+        media_type = item.split(';', 1)[0].strip().lower()
+        for fmt in supported:
+            if MEDIA_TYPES[fmt] == media_type:
+                return fmt
+    return FORMAT_JSON
+
+
+def _serialize_frame(df: pl.DataFrame, fmt: str) -> tuple[bytes, str]:
+    buffer = io.BytesIO()
+    if fmt == FORMAT_ARROW:
+        # Uncompressed: the JS Arrow reader cannot decode compressed IPC buffers
+        df.write_ipc_stream(buffer)
+        return buffer.getvalue(), 'arrow'
+    if fmt == FORMAT_PARQUET:
+        df.write_parquet(buffer, compression='zstd')
+        return buffer.getvalue(), 'parquet'
+    raise ValueError(f"'{fmt}' is not a binary response format")
+
+
+async def frame_response(df: pl.DataFrame, fmt: str, filename: str) -> Response:
+    """Serialize a frame as an Arrow IPC stream or a Parquet file, on the I/O pool."""
+    content, extension = await run_sync(_serialize_frame, df, fmt)
+    return Response(
+        content=content,
+        media_type=MEDIA_TYPES[fmt],
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}.{extension}"',
+            'X-Row-Count': str(df.height),
+        },
+    )
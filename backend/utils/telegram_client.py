@@ -0,0 +1,202 @@
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+import httpx
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_API_URL = 'https://api.telegram.org'
+
+# Workers draining the outbound queue; each holds at most one request to Telegram
+TELEGRAM_SEND_CONCURRENCY = int(os.getenv('TELEGRAM_SEND_CONCURRENCY', '8'))
+
+# Overall send pace; Telegram allows about 30 messages per second across chats
+TELEGRAM_MESSAGES_PER_SECOND = float(os.getenv('TELEGRAM_MESSAGES_PER_SECOND', '25'))
+
+TELEGRAM_MAX_ATTEMPTS = int(os.getenv('TELEGRAM_MAX_ATTEMPTS', '4'))
+TELEGRAM_TIMEOUT_SECONDS = float(os.getenv('TELEGRAM_TIMEOUT_SECONDS', '10'))
+
+
+@dataclass
+class _Outbound:
+    chat_id: str
+    text: str
+    parse_mode: str | None
+    future: asyncio.Future = field(repr=False)
+
+
+class TelegramClient:
+    """Outbound Telegram Bot API calls over one pooled keep-alive connection set.
+
+    Messages go through a queue drained by a fixed set of workers at a bounded rate. A 429
+    pauses every worker for the retry_after Telegram asks for (the limit is per bot, not per
+    chat); 5xx and network errors are retried with backoff. Callers await a per-message result
+    dict and never block the event loop on Telegram.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        concurrency: int = TELEGRAM_SEND_CONCURRENCY,
+        messages_per_second: float = TELEGRAM_MESSAGES_PER_SECOND,
+        max_attempts: int = TELEGRAM_MAX_ATTEMPTS,
+        timeout_seconds: float = TELEGRAM_TIMEOUT_SECONDS,
+    ):
+        self._base_url = f'{TELEGRAM_API_URL}/bot{token}'
+        self._concurrency = concurrency
+        self._interval = 1 / messages_per_second
+        self._max_attempts = max_attempts
+        self._timeout_seconds = timeout_seconds
+        self._client: httpx.AsyncClient | None = None
+        self._queue: asyncio.Queue[_Outbound] = asyncio.Queue()
+        self._workers: list[asyncio.Task] = []
+        self._pace_lock = asyncio.Lock()
+        self._next_send = 0.0
+        self._paused_until = 0.0
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.rate_limited = 0
+
+    def start(self):
+        if self._workers:
+            return
+        self._client = httpx.AsyncClient(
+            base_url=self._base_url,
+            timeout=self._timeout_seconds,
+            limits=httpx.Limits(max_connections=self._concurrency, max_keepalive_connections=self._concurrency),
+        )
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self._concurrency)]
+
+    async def stop(self, drain_timeout: float = 10.0):
+        """Finish queued messages (up to drain_timeout), then close the connection pool."""
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning('Dropping %d queued Telegram messages on shutdown', self._queue.qsize())
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if not item.future.done():
+                item.future.set_result({'success': False, 'error': 'Telegram client stopped'})
+        await self._client.aclose()
+        self._client = None
+
+    def enqueue(self, chat_id: str | int, text: str, parse_mode: str | None = 'HTML') -> asyncio.Future:
+        """Queue a message; the future resolves to {'success', 'attempts', 'error'?}."""
+        if not self._workers:
+            raise RuntimeError('Telegram client is not started')
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_Outbound(str(chat_id), text, parse_mode, future))
+        return future
+
+    async def send_message(self, chat_id: str | int, text: str, parse_mode: str | None = 'HTML') -> dict:
+        return await self.enqueue(chat_id, text, parse_mode)
+
+    async def _worker(self):
+        while True:
+            item = await self._queue.get()
+            try:
+                result = await self._deliver(item)
+            except Exception as e:
+                logger.error('Unexpected error sending Telegram message to %s: %s', item.chat_id, e, exc_info=True)
+                result = {'success': False, 'error': 'Unexpected error'}
+            if result['success']:
+                self.sent += 1
+            else:
+                self.failed += 1
+            if not item.future.done():
+                item.future.set_result(result)
+            self._queue.task_done()
+
+    async def _wait_turn(self):
+        """Hold the caller until the global pace and any 429 pause allow another request."""
+        async with self._pace_lock:
+            now = time.monotonic()
+            start = max(now, self._next_send, self._paused_until)
+            self._next_send = start + self._interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def _deliver(self, item: _Outbound) -> dict:
+        payload = {'chat_id': item.chat_id, 'text': item.text}
+        if item.parse_mode:
+            payload['parse_mode'] = item.parse_mode
+
+        error = None
+        for attempt in range(1, self._max_attempts + 1):
+            if attempt > 1:
+                self.retries += 1
+            await self._wait_turn()
+            try:
+                response = await self._client.post('/sendMessage', json=payload)
+            except httpx.HTTPError as e:
+                error = f'{type(e).__name__}: {e}'
+                await asyncio.sleep(min(2 ** attempt, 30))
+                continue
+
+            if response.status_code == 200:
+                return {'success': True, 'attempts': attempt}
+
+            description = _description(response)
+            error = f'{response.status_code}: {description}'
+            if response.status_code == 429:
+                self.rate_limited += 1
+                retry_after = _retry_after(response)
+                # Telegram's limit is per bot, so every worker waits it out
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                continue
+            if response.status_code >= 500:
+                await asyncio.sleep(min(2 ** attempt, 30))
+                continue
+            # Other 4xx (bad chat id, bot blocked, malformed HTML) will not succeed on retry
+            return {'success': False, 'attempts': attempt, 'error': error}
+
+        return {'success': False, 'attempts': self._max_attempts, 'error': error}
+
+    def stats(self) -> dict:
+        return {
+            'queued': self._queue.qsize(),
+            'workers': len(self._workers),
+            'sent': self.sent,
+            'failed': self.failed,
+            'retries': self.retries,
+            'rate_limited': self.rate_limited,
+            'paused_seconds': round(max(0.0, self._paused_until - time.monotonic()), 1),
+        }
+
+
+def _description(response: httpx.Response) -> str:
+    try:
+        return response.json().get('description') or response.reason_phrase
+    except ValueError:
+        return response.reason_phrase
+
+
+def _retry_after(response: httpx.Response) -> float:
+    """Seconds Telegram asked us to wait: parameters.retry_after in the body, else Retry-After."""
+    try:
+        retry_after = response.json().get('parameters', {}).get('retry_after')
+        if retry_after is not None:
+            return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        return float(response.headers.get('retry-after', 1))
+    except ValueError:
+        return 1.0
+
+
+def create_telegram_client() -> TelegramClient | None:
+    """TelegramClient for TELEGRAM_BOT_TOKEN, or None when no token is configured."""
+    token = os.getenv('TELEGRAM_BOT_TOKEN')
+    if not token:
+        return None
+    return TelegramClient(token)
@@ -1,4 +1,4 @@
-import { useState, useEffect, useMemo } from 'react';
+import { useState, useEffect, useMemo, useRef } from 'react';
 import { getCreateUpdateHistory } from '../utils/api';
 import DateRangeFilter from '../components/DateRangeFilter';
 import DataTable from '../components/DataTable';
@@ -10,36 +10,71 @@ function CreateUpdateHistory() {
   const [lookbackDays, setLookbackDays] = useState(null);
   const [tableName, setTableName] = useState('');
   const [operationType, setOperationType] = useState('');
+  const [recordId, setRecordId] = useState('');
   const [historyData, setHistoryData] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  // Filters the loaded pages were fetched with; 'Load more' reuses them so every page matches the first
+  const [pageFilters, setPageFilters] = useState(null);
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState(null);
+  const requestSeq = useRef(0);
 
-  const handleFetch = async () => {
-    if (!startDate || !endDate) {
+  // A cursor is only valid for the filters that produced it, so drop the loaded pages when any filter changes
+  useEffect(() => {
+    requestSeq.current += 1;
+    setHistoryData([]);
+    setNextCursor(null);
+    setPageFilters(null);
+    setIsLoading(false);
+  }, [startDate, endDate, tableName, operationType, recordId]);
+
+  const fetchPage = async (cursor = null) => {
+    const filters = cursor ? pageFilters : {
+      startDate,
+      endDate,
+      tableName: tableName || null,
+      operationType: operationType || null,
+      recordId: recordId.trim() || null,
+    };
+    if (!filters?.startDate || !filters?.endDate) {
       setError('Please provide both start date and end date');
       return;
     }
 
+    const seq = ++requestSeq.current;
     setIsLoading(true);
     setError(null);
     try {
       // lookbackDays always null - commented out feature
       const response = await getCreateUpdateHistory(
-        startDate || null,
-        endDate || null,
+        filters.startDate,
+        filters.endDate,
         null,
-        tableName || null,
-        operationType || null
+        filters.tableName,
+        filters.operationType,
+        filters.recordId,
+        cursor
       );
-      setHistoryData(response.data || []);
+      // A filter changed (or a newer fetch started) while this page was loading
+      if (seq !== requestSeq.current) return;
+      const rows = response.data || [];
+      setPageFilters(filters);
+      setHistoryData(previous => (cursor ? [...previous, ...rows] : rows));
+      setNextCursor(response.next_cursor || null);
     } catch (err) {
+      if (seq !== requestSeq.current) return;
       setError(err.response?.data?.detail || err.message || 'Failed to fetch history');
-      setHistoryData([]);
+      if (!cursor) {
+        setHistoryData([]);
+        setNextCursor(null);
+      }
     } finally {
-      setIsLoading(false);
+      if (seq === requestSeq.current) setIsLoading(false);
     }
   };
 
+  const handleFetch = () => fetchPage();
+
   const historyColumns = useMemo(() => [
     {
       accessorKey: 'created_at',
@@ -140,6 +175,17 @@ function CreateUpdateHistory() {
               <option value="UPDATE">Update</option>
             </select>
           </div>
+
+          <div className="filter-group">
+            <label htmlFor="record-id">Record ID</label>
+            <input
+              id="record-id"
+              type="text"
+              value={recordId}
+              placeholder="Any record"
+              onChange={(e) => setRecordId(e.target.value)}
+            />
+          </div>
         </div>
       </div>
 
@@ -147,7 +193,7 @@ function CreateUpdateHistory() {
 
       <div className="data-section">
         <p className="data-count">
-          {historyData.length} {historyData.length === 1 ? 'record' : 'records'}
+          {historyData.length} {historyData.length === 1 ? 'record' : 'records'}{nextCursor ? ' (more available)' : ''}
         </p>
         <DataTable
           data={historyData}
@@ -155,6 +201,16 @@ function CreateUpdateHistory() {
           isLoading={isLoading}
           emptyMessage="No history data available. Adjust filters or perform some operations"
         />
+        {nextCursor && (
+          <button
+            type="button"
+            className="load-more-button"
+            onClick={() => fetchPage(nextCursor)}
+            disabled={isLoading}
+          >
+            {isLoading ? 'Loading...' : 'Load more'}
+          </button>
+        )}
       </div>
     </div>
   );
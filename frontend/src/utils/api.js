@@ -107,13 +107,15 @@ export const getDataErrors = async () => {
   return response.data;
 };
 
-export const getCreateUpdateHistory = async (startDate, endDate, lookbackDays = null, tableName = null, operationType = null) => {
+export const getCreateUpdateHistory = async (startDate, endDate, lookbackDays = null, tableName = null, operationType = null, recordId = null, cursor = null) => {
   const params = {};
   if (startDate) params.start_date = startDate;
   if (endDate) params.end_date = endDate;
   if (lookbackDays) params.lookback_days = lookbackDays;
   if (tableName) params.table_name = tableName;
   if (operationType) params.operation_type = operationType;
+  if (recordId) params.record_id = recordId;
+  if (cursor) params.cursor = cursor;
   const response = await api.get('/get_create_update_history', { params });
   return response.data;
 };